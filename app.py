@@ -1,17 +1,25 @@
 from flask import Flask, redirect, url_for
 from models import db
+import instrumentation
+import payloads
+import slow_queries
+from routes.admin import admin_bp
 from routes.driver import driver_bp
 from routes.vehicle import vehicle_bp
 
 
 app = Flask(__name__)
 app.config.from_object('config.Config')
+app.json = payloads.JSONProvider(app)  # orjson, when installed
 
 db.init_app(app)
+instrumentation.init_app(app)  # SQL timings: Server-Timing header and /metrics
+slow_queries.init_app(app)  # opt-in: SLOW_QUERY_ENABLED
 
 # Register blueprints
 app.register_blueprint(driver_bp, url_prefix='/driver')
 app.register_blueprint(vehicle_bp, url_prefix='/vehicle')
+app.register_blueprint(admin_bp, url_prefix='/admin')
 
 @app.route('/')
 def index():
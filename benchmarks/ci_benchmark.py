@@ -0,0 +1,118 @@
+"""Dashboard benchmark for CI: a fixed dataset against the committed baseline.
+
+Sets up the scratch PostgreSQL database in DATABASE_URL the way
+production runs: db.create_all(), the externally loaded trips_data and
+driver_rating tables, every pending migration, and monthly partitions
+covering the data. It then fills it with generate_data.py at a fixed
+size, seed and end date, ANALYZEs it, and runs dashboard_benchmark.py
+against ci_baseline.json. Every step is idempotent, so a job can reuse
+the database between runs.
+
+Statement counts and rows scanned are compared; latency is not, since it
+depends on the machine (--latency compares it as well). The exit status
+is dashboard_benchmark.py's: 1 when a case regressed. After a change
+that is meant to alter the queries, record the baseline again and commit
+it with the change. Other arguments go to dashboard_benchmark.py.
+
+Usage:
+    DATABASE_URL=postgresql+psycopg2://postgres@localhost/bench python benchmarks/ci_benchmark.py
+    DATABASE_URL=... python benchmarks/ci_benchmark.py --save-baseline
+"""
+import argparse
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(HERE, 'ci_baseline.json')
+
+# The dataset ci_baseline.json was recorded on
+ROWS = 200_000
+SEED = 1
+DAYS = 90
+END_DATE = datetime(2025, 6, 30)
+
+RATING_DDL = """
+    CREATE TABLE IF NOT EXISTS driver_rating (
+        "assetName" varchar, "dateStart" timestamp,
+        distance double precision, cost double precision, "100kmh" double precision,
+        excessivei double precision, speedingtr double precision, brake double precision,
+        accel double precision, corner double precision, gforce double precision
+    )
+"""
+
+
+def months(start, end):
+    """First day of every month from start's to end's."""
+    month = start.replace(day=1)
+    while month <= end:
+        yield month
+        month = (month + timedelta(days=32)).replace(day=1)
+
+
+def prepare(db):
+    """Tables, migrations and partitions for the dataset; safe to repeat."""
+    import migrate
+    from generate_data import TRIPS_DDL
+
+    db.create_all()
+    db.session.execute(db.text(TRIPS_DDL))
+    db.session.execute(db.text(RATING_DDL))
+    db.session.commit()
+    done = migrate.applied_versions()
+    for filename in migrate.migration_files():
+        if filename not in done:
+            print(f"applying {filename}")
+            migrate.apply(filename)
+    # migrations/0003 only creates partitions from this month on
+    for table in ('vehicles', 'drivers'):
+        for month in months(END_DATE - timedelta(days=DAYS - 1), END_DATE):
+            db.session.execute(db.text('SELECT create_event_partition(:fact, :month)'),
+                               {'fact': f'{table}_fact', 'month': month.date()})
+            db.session.commit()
+
+
+def run(script, *args):
+    command = [sys.executable, os.path.join(HERE, script), *args]
+    print('$ ' + ' '.join(command[1:]), flush=True)
+    return subprocess.call(command)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboards on a fixed dataset against "
+                                                 "the committed baseline.")
+    parser.add_argument('--save-baseline', action='store_true', help=f'record {os.path.basename(BASELINE)}')
+    parser.add_argument('--latency', action='store_true', help='compare latency too')
+    parser.add_argument('--repeat', type=int, default=1)
+    args, passthrough = parser.parse_known_args()
+
+    from app import app
+    from models import db
+
+    with app.app_context():
+        if db.engine.dialect.name != 'postgresql':
+            sys.exit("ci_benchmark.py needs DATABASE_URL pointing at a scratch PostgreSQL database")
+        prepare(db)
+        db.session.remove()
+
+    status = run('generate_data.py', '--rows', str(ROWS), '--seed', str(SEED), '--days', str(DAYS),
+                 '--end-date', f'{END_DATE:%Y-%m-%d}')
+    if status:
+        sys.exit(status)
+    with app.app_context():
+        db.session.execute(db.text('ANALYZE'))
+        db.session.commit()
+
+    options = ['--baseline', BASELINE, '--repeat', str(args.repeat)]
+    if args.save_baseline:
+        options += ['--save-baseline', '--anchor', f'{END_DATE:%Y-%m-%d}']
+    elif not args.latency:
+        options.append('--ignore-latency')
+    sys.exit(run('dashboard_benchmark.py', *options, *passthrough))
+
+
+if __name__ == "__main__":
+    main()
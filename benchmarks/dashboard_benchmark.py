@@ -0,0 +1,246 @@
+"""Latency, statement count and rows scanned of the dashboards, against a baseline.
+
+Runs every dashboard route and every panel (aggregation section) of the
+vehicle and driver dashboards in-process, under standard filter
+profiles anchored on the newest event in the database:
+
+    day     the last day
+    week    the last 7 days
+    month   the last 30 days
+    owner   the last 30 days, busiest owner
+    asset   the last 30 days, busiest asset (busiest driver on the
+            driver dashboard)
+
+The result cache is off, so every request does its full work. Each
+case is warmed up once, then timed --repeat times (median reported).
+Statements are counted with a SQLAlchemy cursor hook; on PostgreSQL the
+SELECTs of the last run are re-run under EXPLAIN ANALYZE and the rows
+read by their scan nodes summed (SQLite reports no rows scanned).
+
+With --save-baseline the results are written to --baseline. Otherwise
+they are compared with it and the run fails (exit 1) if a case got
+slower than --latency-tolerance, issues more statements, or scans more
+than --rows-tolerance more rows (--ignore-latency drops the first
+check). The baseline keeps the filters it was recorded with (dates,
+owner, asset), and later runs reuse them. It only compares like with
+like: record one per machine and dataset (see generate_data.py), or
+run ci_benchmark.py, which builds a fixed dataset for the committed
+ci_baseline.json.
+
+Usage:
+    python benchmarks/dashboard_benchmark.py --save-baseline
+    python benchmarks/dashboard_benchmark.py
+    python benchmarks/dashboard_benchmark.py --dashboard driver --profile week --profile owner --repeat 10
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dashboard_baseline.json')
+PROFILES = ['day', 'week', 'month', 'owner', 'asset']
+SCAN_NODES = ('Seq Scan', 'Index Scan', 'Index Only Scan', 'Bitmap Heap Scan')
+
+
+class StatementLog:
+    """Statements sent to the database while enabled (every thread)."""
+
+    def __init__(self):
+        self.statements = []
+        self.enabled = False
+        self._lock = threading.Lock()
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.enabled:
+            with self._lock:
+                self.statements.append((statement, parameters))
+
+    def reset(self):
+        with self._lock:
+            self.statements = []
+
+
+def _plan_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from _plan_nodes(child)
+
+
+def rows_scanned(db, statements):
+    """Rows read by the scan nodes of statements' plans (PostgreSQL), else None."""
+    if db.engine.dialect.name != 'postgresql':
+        return None
+    total = 0
+    with db.engine.connect() as conn:
+        for statement, parameters in statements:
+            if not statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+                continue
+            plan = conn.exec_driver_sql('EXPLAIN (ANALYZE, FORMAT JSON) ' + statement, parameters).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            for node in _plan_nodes(plan[0]['Plan']):
+                if node['Node Type'] in SCAN_NODES:
+                    read = node.get('Actual Rows', 0) + node.get('Rows Removed by Filter', 0)
+                    total += read * node.get('Actual Loops', 1)
+        conn.rollback()
+    return total
+
+
+def profile_params(db, profile, args):
+    """{dashboard: query-string args} for one profile."""
+    from models import VehicleEvent, DriverEvent
+
+    anchor = args.anchor
+    days = {'day': 1, 'week': 7}.get(profile, 30)
+    dates = {'start_date': (anchor - timedelta(days=days - 1)).strftime("%Y-%m-%d"),
+             'end_date': anchor.strftime("%Y-%m-%d")}
+    vehicle, driver = dict(dates), dict(dates)
+    if profile == 'owner':
+        vehicle['owner'] = driver['owner'] = args.owner or busiest(db, VehicleEvent.OwnerName, VehicleEvent, dates)
+    elif profile == 'asset':
+        vehicle['asset_name'] = args.asset or busiest(db, VehicleEvent.AssetName, VehicleEvent, dates)
+        driver['driver_name'] = args.driver or busiest(db, DriverEvent.LinkedName_1, DriverEvent, dates)
+    return {'vehicle': vehicle, 'driver': driver}
+
+
+def busiest(db, column, model, dates):
+    start = datetime.strptime(dates['start_date'], "%Y-%m-%d")
+    end = datetime.strptime(dates['end_date'], "%Y-%m-%d") + timedelta(days=1)
+    return db.session.query(column).filter(model.EventDate >= start, model.EventDate < end, column.isnot(None))\
+        .group_by(column).order_by(db.func.count().desc()).limit(1).scalar()
+
+
+def cases(dashboards, profiles, params):
+    """(name, url) for every route and panel under every profile."""
+    from routes import driver, vehicle
+
+    panels = {'vehicle': vehicle.PANELS, 'driver': driver.PANELS}
+    for profile in profiles:
+        for dashboard in dashboards:
+            query = urlencode(params[profile][dashboard])
+            yield f"{dashboard} dashboard [{profile}]", f"/{dashboard}/dashboard?{query}"
+            yield f"{dashboard} dashboard-data [{profile}]", f"/{dashboard}/api/dashboard-data?{query}"
+            for panel in panels[dashboard]:
+                yield f"{dashboard} panel {panel} [{profile}]", f"/{dashboard}/api/panels/{panel}?{query}"
+
+
+def measure(client, db, log, url, repeat):
+    def get():
+        response = client.get(url)
+        if response.status_code != 200:
+            raise SystemExit(f"{url}: HTTP {response.status_code} {response.get_data(as_text=True)[:200]}")
+
+    get()  # warm-up: connections, dimension snapshot, template compilation
+    timings = []
+    for _ in range(repeat):
+        log.reset()
+        log.enabled = True
+        started = time.perf_counter()
+        get()
+        timings.append((time.perf_counter() - started) * 1000)
+        log.enabled = False
+    return {
+        'latency_ms': round(statistics.median(timings), 2),
+        'statements': len(log.statements),
+        'rows_scanned': rows_scanned(db, log.statements),
+    }
+
+
+def regressions(result, base, args):
+    """Reasons result is worse than its baseline entry."""
+    found = []
+    slower = result['latency_ms'] - base['latency_ms']
+    if not args.ignore_latency and slower > args.min_delta_ms and result['latency_ms'] > base['latency_ms'] * (1 + args.latency_tolerance):
+        found.append(f"latency {base['latency_ms']:.1f} -> {result['latency_ms']:.1f} ms")
+    if result['statements'] > base['statements']:
+        found.append(f"statements {base['statements']} -> {result['statements']}")
+    if result['rows_scanned'] is not None and base.get('rows_scanned') is not None \
+            and result['rows_scanned'] > base['rows_scanned'] * (1 + args.rows_tolerance):
+        found.append(f"rows scanned {base['rows_scanned']:,} -> {result['rows_scanned']:,}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboards against a stored baseline.")
+    parser.add_argument('--dashboard', action='append', choices=['vehicle', 'driver'],
+                        help='repeatable (default: both)')
+    parser.add_argument('--profile', action='append', choices=PROFILES, help='repeatable (default: all)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--anchor', type=lambda s: datetime.strptime(s, "%Y-%m-%d"),
+                        help='last day of the profiles, YYYY-MM-DD (default: the baseline\'s, else the newest '
+                             'vehicle event)')
+    parser.add_argument('--owner', help='owner for the owner profile (default: busiest)')
+    parser.add_argument('--asset', help='asset for the asset profile (default: busiest)')
+    parser.add_argument('--driver', help='driver for the asset profile on the driver dashboard')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--latency-tolerance', type=float, default=0.25, help='allowed slowdown, as a fraction')
+    parser.add_argument('--min-delta-ms', type=float, default=2.0, help='ignore slowdowns smaller than this')
+    parser.add_argument('--ignore-latency', action='store_true',
+                        help='compare statements and rows scanned only (baseline from another machine)')
+    parser.add_argument('--rows-tolerance', type=float, default=0.10, help='allowed growth of rows scanned')
+    args = parser.parse_args()
+
+    from sqlalchemy import event
+    from app import app
+    from models import db, VehicleEvent
+
+    app.config['RESULT_CACHE_BACKEND'] = 'none'
+    app.extensions.pop('result_cache', None)
+    dashboards = args.dashboard or ['vehicle', 'driver']
+    profiles = args.profile or PROFILES
+    log = StatementLog()
+
+    baseline = {}
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+
+    with app.app_context():
+        # Compare under the baseline's filters, even if newer data moved the anchor
+        saved = {} if args.anchor else baseline.get('params', {})
+        params = {p: saved[p] for p in profiles if p in saved}
+        if args.anchor is None and len(params) < len(profiles):
+            newest = db.session.query(db.func.max(VehicleEvent.EventDate)).scalar()
+            if newest is None:
+                sys.exit("no vehicle events; fill the database first (benchmarks/generate_data.py)")
+            args.anchor = newest
+        for profile in profiles:
+            if profile not in params:
+                params[profile] = profile_params(db, profile, args)
+        db.session.remove()
+        event.listen(db.engine, 'before_cursor_execute', log)
+
+        client = app.test_client()
+        results = {}
+        for name, url in cases(dashboards, profiles, params):
+            results[name] = measure(client, db, log, url, args.repeat)
+
+    failures = 0
+    for name, result in results.items():
+        rows = '-' if result['rows_scanned'] is None else f"{result['rows_scanned']:,}"
+        line = f"{name}: {result['latency_ms']:.1f} ms, {result['statements']} statements, {rows} rows scanned"
+        base = baseline.get('cases', {}).get(name)
+        found = regressions(result, base, args) if base else []
+        failures += bool(found)
+        print(f"{'FAIL' if found else 'ok  '}  {line}" + (f"  ({'; '.join(found)})" if found else ''))
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as fh:
+            json.dump({'params': params, 'repeat': args.repeat, 'cases': results}, fh, indent=2, sort_keys=True)
+        print(f"baseline written to {args.baseline}")
+    elif not baseline:
+        print(f"no baseline at {args.baseline}; run with --save-baseline to record one")
+    if failures:
+        sys.exit(f"{failures} case{'' if failures == 1 else 's'} regressed against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Throughput and memory of the streaming event export.
+
+Runs the export endpoint in-process against the configured database and
+reports rows/s, MB/s and the peak Python heap while the body streams.
+
+Usage:
+    python benchmarks/export_benchmark.py --start 2025-06-01 --end 2025-07-01
+    python benchmarks/export_benchmark.py --dashboard driver --format parquet --chunk-rows 20000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def run(app, dashboard, fmt, params):
+    client = app.test_client()
+    url = f"/{dashboard}/export.{fmt}?{urlencode(params)}"
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    response = client.get(url, buffered=False)
+    if response.status_code != 200:
+        raise SystemExit(f"{url}: HTTP {response.status_code} {response.get_data(as_text=True)[:200]}")
+    size = lines = 0
+    for chunk in response.response:
+        size += len(chunk)
+        if fmt == 'csv':
+            lines += chunk.count('\n' if isinstance(chunk, str) else b'\n')
+    response.close()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    rows = max(lines - 1, 0) if fmt == 'csv' else None
+    print(f"{dashboard} {fmt}: {size / 1e6:.1f} MB in {elapsed:.2f}s "
+          f"({size / 1e6 / elapsed:.1f} MB/s"
+          + (f", {rows} rows, {rows / elapsed:,.0f} rows/s" if rows is not None else "")
+          + f"), peak heap {peak / 1e6:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the streaming event export.")
+    parser.add_argument('--dashboard', choices=['vehicle', 'driver'], default='vehicle')
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--start', help='YYYY-MM-DD')
+    parser.add_argument('--end', help='YYYY-MM-DD')
+    parser.add_argument('--owner')
+    parser.add_argument('--event-type')
+    parser.add_argument('--chunk-rows', type=int, help='override EXPORT_CHUNK_ROWS')
+    args = parser.parse_args()
+
+    from app import app
+    if args.chunk_rows:
+        app.config['EXPORT_CHUNK_ROWS'] = args.chunk_rows
+    params = {k: v for k, v in [('start_date', args.start), ('end_date', args.end), ('owner', args.owner),
+                                ('event_type', args.event_type)] if v}
+    run(app, args.dashboard, args.format, params)
+
+
+if __name__ == "__main__":
+    main()
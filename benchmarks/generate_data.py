@@ -0,0 +1,253 @@
+"""Fill drivers, vehicles and trips_data with seeded synthetic data (PostgreSQL).
+
+Shaped like the production feed rather than uniform noise: a handful of
+owners of very different sizes, thousands of assets and drivers whose
+activity follows a Zipf law (a few busy assets, a long tail), event
+types drawn from a Zipf law as well, a day/night profile on EventDate,
+and drivers who mostly stay on one asset. The history ends on
+--end-date (a fixed day, not today), so the same --seed and --end-date
+always give the same rows.
+
+Events go through ingest.load_batch (COPY + merge), so the plain and the
+partitioned fact + dimension layouts are both filled correctly. AlertIds
+are "syn<seed>-<table>-<n>", and trips are merged on (asset, start), so
+re-running with the same arguments adds nothing. Refresh the derived
+tables afterwards (rollup.py refresh, trip_links.py refresh) before
+benchmarking.
+
+Usage:
+    python benchmarks/generate_data.py --rows 1000000 --create-tables
+    python benchmarks/generate_data.py --rows 50000000 --assets 8000 --drivers 6000 --days 365 --end-date 2025-12-31 \
+        --seed 7 --truncate
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from routes.vehicle import BATTERY_DISCONNECT_ALERTS  # noqa: E402
+
+OWNERS = ['Unitrans Kathu', 'Unitrans Sasolburg', 'Unitrans Richards Bay', 'Unitrans Durban',
+          'Unitrans Secunda', 'Unitrans Polokwane', 'Unitrans Rustenburg', 'Unitrans Cape Town']
+EVENT_TYPES = ['Overspeeding', 'Harsh Braking', 'Non Tagging', 'Harsh Acceleration', 'Excessive Idling',
+               'Harsh Cornering', 'Battery Disconnect']
+DRIVER_CLASSES = ['Driver', 'Driver', 'Driver', 'Driver', 'Duty']
+# Share of events per hour of day (night shifts are quieter)
+HOURLY_PROFILE = np.array([2, 1, 1, 1, 2, 4, 6, 7, 7, 6, 6, 6, 6, 6, 6, 6, 7, 7, 6, 5, 4, 3, 3, 2], dtype=float)
+
+TRIPS_DDL = """
+    CREATE TABLE IF NOT EXISTS trips_data (
+        id serial PRIMARY KEY,
+        asset varchar, driver varchar, trip_type varchar,
+        start timestamp, "end" timestamp,
+        distance double precision, max_speed double precision, idle_time double precision,
+        start_coords varchar, end_coords varchar,
+        start_odometer double precision, end_odometer double precision
+    )
+"""
+TRIP_STAGE_DDL = """
+    CREATE TEMPORARY TABLE IF NOT EXISTS trip_stage (
+        asset varchar, driver varchar, trip_type varchar,
+        start timestamp, "end" timestamp,
+        distance double precision, max_speed double precision, idle_time double precision,
+        start_coords varchar, end_coords varchar,
+        start_odometer double precision, end_odometer double precision
+    ) ON COMMIT DELETE ROWS
+"""
+TRIP_COLUMNS = ['asset', 'driver', 'trip_type', 'start', '"end"', 'distance', 'max_speed', 'idle_time',
+                'start_coords', 'end_coords', 'start_odometer', 'end_odometer']
+
+
+def zipf_weights(n, exponent):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+class Fleet:
+    """Owners, assets and drivers, and how often each one shows up."""
+
+    def __init__(self, rng, n_owners, n_assets, n_drivers, exponent):
+        owners = np.array(OWNERS[:n_owners] + [f'Owner {i}' for i in range(len(OWNERS), n_owners)])
+        self.assets = np.array([f'ASSET-{i:05d}' for i in range(n_assets)])
+        self.drivers = np.array([f'DRIVER-{i:05d}' for i in range(n_drivers)])
+        self.asset_ids = np.array([f'a-{i}' for i in range(n_assets)])
+        self.driver_ids = np.array([f'd-{i}' for i in range(n_drivers)])
+        self.asset_p = zipf_weights(n_assets, exponent)
+        self.driver_p = zipf_weights(n_drivers, exponent)
+        self.event_p = zipf_weights(len(EVENT_TYPES), exponent)
+        self.asset_owner = owners[rng.choice(n_owners, n_assets, p=zipf_weights(n_owners, 1.0))]
+        self.primary_driver = rng.integers(0, n_drivers, n_assets)
+        self.home = np.column_stack([rng.uniform(-34, -22, n_assets), rng.uniform(18, 32, n_assets)])
+
+    def pick_assets(self, rng, n):
+        return rng.choice(len(self.assets), n, p=self.asset_p)
+
+    def pick_drivers(self, rng, asset_idx):
+        """Mostly the asset's own driver, sometimes anyone, now and then nobody."""
+        drivers = self.primary_driver[asset_idx].copy()
+        swap = rng.random(len(asset_idx)) < 0.2
+        drivers[swap] = rng.choice(len(self.drivers), swap.sum(), p=self.driver_p)
+        drivers[rng.random(len(asset_idx)) < 0.05] = -1
+        return drivers
+
+
+def event_times(rng, start, days, n):
+    hours = rng.choice(24, n, p=HOURLY_PROFILE / HOURLY_PROFILE.sum())
+    seconds = rng.integers(0, days, n) * 86400 + hours * 3600 + rng.integers(0, 3600, n)
+    return np.datetime64(start, 's') + seconds.astype('timedelta64[s]')
+
+
+def event_rows(rng, fleet, table, seed, first, n, start, days):
+    """n event dicts for ingest.load_batch; AlertIds continue from first."""
+    asset_idx = fleet.pick_assets(rng, n)
+    driver_idx = fleet.pick_drivers(rng, asset_idx)
+    etype_idx = rng.choice(len(EVENT_TYPES), n, p=fleet.event_p)
+    etypes = np.array(EVENT_TYPES)[etype_idx]
+    when = event_times(rng, start, days, n)
+    modified = when + rng.integers(5, 900, n).astype('timedelta64[s]')
+    linked = driver_idx >= 0
+    disconnect = np.array(BATTERY_DISCONNECT_ALERTS)[rng.integers(0, len(BATTERY_DISCONNECT_ALERTS), n)]
+    if table == 'drivers':
+        classes = np.array(DRIVER_CLASSES)[rng.integers(0, len(DRIVER_CLASSES), n)]
+    else:
+        classes = np.full(n, 'Asset')
+
+    overspeed = etypes == 'Overspeeding'
+    limit = rng.choice([60.0, 80.0, 100.0, 120.0], n)
+    idling = rng.integers(300, 3600, n).astype(float)
+    columns = {
+        'OwnerName': fleet.asset_owner[asset_idx],
+        'AlertName': np.where(etypes == 'Battery Disconnect', disconnect, etypes),
+        'EventDate': when.astype(datetime),
+        'CreationDate': modified.astype(datetime),
+        'ModifiedDate': modified.astype(datetime),
+        'EventType': etypes,
+        'LinkedId_1': np.where(linked, fleet.driver_ids[driver_idx], None),
+        'LinkedName_1': np.where(linked, fleet.drivers[driver_idx], None),
+        'Latitude': (fleet.home[asset_idx, 0] + rng.normal(0, 0.3, n)).round(5),
+        'Longitude': (fleet.home[asset_idx, 1] + rng.normal(0, 0.3, n)).round(5),
+        'LocationAddress': np.char.add(np.char.add(fleet.asset_owner[asset_idx], ' route '),
+                                       (asset_idx % 50).astype(str)),
+        'AssetId': fleet.asset_ids[asset_idx],
+        'AssetName': fleet.assets[asset_idx],
+        'LimitValue': np.where(overspeed, limit, None),
+        'CurrentValue': np.where(overspeed, limit + rng.integers(1, 30, n), None),
+        'IdleCounter': np.where(etypes == 'Excessive Idling', idling, None),
+        'BatteryVoltage': rng.normal(12.6, 0.4, n).round(2),
+        'PowerVoltage': rng.normal(27.5, 1.2, n).round(2),
+        'EventTypes': etypes,
+        'Class': classes,
+    }
+    constant = {'AlertType': 'Event', 'EventClass': 'Telematics', 'AssetTypeName': 'Truck Tractor'}
+    keys = list(columns)
+    return [
+        dict(zip(keys, values), AlertId=f'syn{seed}-{table}-{first + i}', **constant)
+        for i, values in enumerate(zip(*[col.tolist() for col in columns.values()]))
+    ]
+
+
+def trip_rows(rng, fleet, n, start, days):
+    asset_idx = fleet.pick_assets(rng, n)
+    driver_idx = fleet.primary_driver[asset_idx]
+    begin = event_times(rng, start, days, n)
+    minutes = rng.integers(5, 240, n)
+    distance = (minutes * rng.uniform(0.3, 1.4, n)).round(1)
+    odometer = rng.uniform(10000, 900000, n).round(1)
+    for i in range(n):
+        a = asset_idx[i]
+        lat, lon = fleet.home[a]
+        yield [fleet.assets[a], fleet.drivers[driver_idx[i]], 'Business',
+               begin[i].astype(datetime), (begin[i] + np.timedelta64(int(minutes[i]), 'm')).astype(datetime),
+               distance[i], round(float(rng.uniform(60, 120)), 1), int(rng.integers(0, minutes[i] * 6)),
+               f'{lat:.5f},{lon:.5f}', f'{lat + rng.normal(0, 0.2):.5f},{lon + rng.normal(0, 0.2):.5f}',
+               odometer[i], round(odometer[i] + distance[i], 1)]
+
+
+def copy_trips(db, rows):
+    """COPY rows into trip_stage and add the ones trips_data lacks. Returns rows inserted.
+
+    trips_data has no natural key; a trip is identified by its asset and
+    start, the pair trip_links.py joins on.
+    """
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    buf.seek(0)
+    conn = db.session.connection()
+    conn.execute(db.text(TRIP_STAGE_DDL))
+    conn.connection.cursor().copy_expert(
+        f'COPY trip_stage ({", ".join(TRIP_COLUMNS)}) FROM STDIN WITH (FORMAT csv)', buf)
+    columns = ', '.join(TRIP_COLUMNS)
+    inserted = conn.execute(db.text(
+        f'INSERT INTO trips_data ({columns}) SELECT DISTINCT ON (s.asset, s.start) {columns} FROM trip_stage s '
+        f'WHERE NOT EXISTS (SELECT 1 FROM trips_data t WHERE t.asset = s.asset AND t.start = s.start) '
+        f'ORDER BY s.asset, s.start'
+    )).rowcount
+    db.session.commit()  # ON COMMIT DELETE ROWS empties trip_stage
+    return inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate seeded synthetic events and trips.")
+    parser.add_argument('--rows', type=int, default=1_000_000, help='events across drivers + vehicles')
+    parser.add_argument('--driver-share', type=float, default=0.4, help='fraction of events in drivers')
+    parser.add_argument('--trips', type=int, help='default: rows / 50')
+    parser.add_argument('--owners', type=int, default=5)
+    parser.add_argument('--assets', type=int, default=3000)
+    parser.add_argument('--drivers', type=int, default=2500)
+    parser.add_argument('--zipf', type=float, default=1.1, help='skew of assets, drivers and event types')
+    parser.add_argument('--days', type=int, default=90, help='history length, ending on --end-date')
+    parser.add_argument('--end-date', type=lambda s: datetime.strptime(s, "%Y-%m-%d"),
+                        default=datetime(2025, 6, 30), help='last day of the history, YYYY-MM-DD')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--batch', type=int, help='rows per COPY (default INGEST_BATCH_ROWS)')
+    parser.add_argument('--create-tables', action='store_true', help='create missing tables first')
+    parser.add_argument('--truncate', action='store_true', help='empty the event and trip tables first')
+    args = parser.parse_args()
+
+    from app import app
+    from models import db, DriverEvent, VehicleEvent
+    import ingest
+    import rollup
+
+    rng = np.random.default_rng(args.seed)
+    fleet = Fleet(rng, args.owners, args.assets, args.drivers, args.zipf)
+    start = args.end_date + timedelta(days=1 - args.days)
+
+    with app.app_context():
+        if db.engine.dialect.name != 'postgresql':
+            sys.exit("generate_data.py loads through COPY and needs PostgreSQL")
+        batch = args.batch or app.config['INGEST_BATCH_ROWS']
+        if args.create_tables:
+            db.create_all()
+            db.session.execute(db.text(TRIPS_DDL))
+            db.session.commit()
+        if args.truncate:
+            tables = [rollup.physical_table(DriverEvent), rollup.physical_table(VehicleEvent), 'trips_data']
+            db.session.execute(db.text(f'TRUNCATE {", ".join(tables)}'))
+            db.session.commit()
+
+        n_drivers = int(args.rows * args.driver_share)
+        for model, total in [(DriverEvent, n_drivers), (VehicleEvent, args.rows - n_drivers)]:
+            table = model.__tablename__
+            started, inserted = time.perf_counter(), 0
+            for first in range(0, total, batch):
+                rows = event_rows(rng, fleet, table, args.seed, first, min(batch, total - first), start, args.days)
+                inserted += ingest.load_batch(model, rows)
+                print(f"\r{table}: {inserted:,} rows", end='', flush=True)
+            print(f"\r{table}: {inserted:,} rows in {time.perf_counter() - started:.0f}s")
+
+        n_trips = args.trips if args.trips is not None else args.rows // 50
+        started, inserted = time.perf_counter(), 0
+        for first in range(0, n_trips, batch):
+            inserted += copy_trips(db, trip_rows(rng, fleet, min(batch, n_trips - first), start, args.days))
+        print(f"trips_data: {inserted:,} rows in {time.perf_counter() - started:.0f}s")
+
+
+if __name__ == "__main__":
+    main()
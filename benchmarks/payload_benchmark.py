@@ -0,0 +1,114 @@
+"""Size and serialization time of the dashboard JSON payloads.
+
+Loads what the browser loads for one dashboard view (every panel, plus
+the per event type drilldowns behind the cards) and serializes it four
+ways:
+
+    rows         the list-of-dicts payloads, stdlib json (as before payloads.py)
+    columnar     payloads.table() form, stdlib json
+    orjson       payloads.table() form, orjson
+    msgpack      payloads.table() form, MessagePack
+
+and reports bytes, gzipped bytes and the median serialization time of
+--repeat runs. The default view is the vehicle dashboard over the last
+30 days up to the newest event; orjson and msgpack are skipped when not
+installed.
+
+Usage:
+    python benchmarks/payload_benchmark.py
+    python benchmarks/payload_benchmark.py --dashboard driver --days 7 --owner "Unitrans Kathu"
+"""
+import argparse
+import gzip
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def view_payloads(client, dashboard, params):
+    """{url: payload} for every panel and event type drilldown of one view."""
+    import payloads
+    from routes import driver, vehicle
+
+    panels = {'vehicle': vehicle.PANELS, 'driver': driver.PANELS}[dashboard]
+    query = urlencode(params)
+    loaded = {}
+    for panel in panels:
+        if panel == 'events':
+            continue  # API only; the dashboard pages do not load it
+        url = f"/{dashboard}/api/panels/{panel}?{query}"
+        loaded[url] = client.get(url).get_json()
+    event_types = payloads.unpack(loaded[f"/{dashboard}/api/panels/event-types?{query}"])['event_types']
+    for row in event_types:
+        loaded[row['drilldown_url']] = client.get(row['drilldown_url']).get_json()
+    return loaded
+
+
+def measure(serialize, values, repeat):
+    """(bytes, gzipped bytes, median ms) of serialize over every value."""
+    bodies = [serialize(v) for v in values]
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for v in values:
+            serialize(v)
+        timings.append((time.perf_counter() - started) * 1000)
+    return (sum(len(b) for b in bodies), sum(len(gzip.compress(b)) for b in bodies), statistics.median(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare dashboard payload encodings.")
+    parser.add_argument('--dashboard', choices=['vehicle', 'driver'], default='vehicle')
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--anchor', type=lambda s: datetime.strptime(s, "%Y-%m-%d"),
+                        help='last day of the view, YYYY-MM-DD (default: the newest vehicle event)')
+    parser.add_argument('--owner')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    import payloads
+    from app import app
+    from models import db, VehicleEvent
+
+    app.config['RESULT_CACHE_BACKEND'] = 'none'
+    app.extensions.pop('result_cache', None)
+    with app.app_context():
+        anchor = args.anchor or db.session.query(db.func.max(VehicleEvent.EventDate)).scalar()
+        if anchor is None:
+            sys.exit("no vehicle events; fill the database first (benchmarks/generate_data.py)")
+        params = {'start_date': (anchor - timedelta(days=args.days - 1)).strftime("%Y-%m-%d"),
+                  'end_date': anchor.strftime("%Y-%m-%d")}
+        if args.owner:
+            params['owner'] = args.owner
+        loaded = view_payloads(app.test_client(), args.dashboard, params)
+
+    packed = list(loaded.values())
+    rows = [payloads.unpack(v) for v in packed]
+
+    def stdlib(v):
+        # What jsonify() wrote with the default provider
+        return json.dumps(v, default=payloads._default, separators=(',', ':'), sort_keys=True).encode()
+
+    encodings = [('rows', stdlib, rows), ('columnar', stdlib, packed)]
+    if payloads.orjson is not None:
+        encodings.append(('orjson', payloads.dumps, packed))
+    if payloads.msgpack is not None:
+        encodings.append(('msgpack', lambda v: payloads.msgpack.packb(v, default=payloads._default), packed))
+
+    print(f"{args.dashboard} view {params}: {len(packed)} payloads")
+    base = None
+    for name, serialize, values in encodings:
+        size, gzipped, ms = measure(serialize, values, args.repeat)
+        base = base or (size, gzipped, ms)
+        print(f"{name:<9} {size:>10,} bytes ({size / base[0]:.0%})  {gzipped:>9,} gzipped ({gzipped / base[1]:.0%})"
+              f"  {ms:8.2f} ms ({ms / base[2]:.0%})")
+
+
+if __name__ == "__main__":
+    main()
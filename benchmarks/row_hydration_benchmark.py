@@ -0,0 +1,80 @@
+"""Hydration time and memory of the event list queries: ORM entities vs row projections.
+
+Loads the same rows both ways, as the events panel and the events pages
+do before and after BaseEvent.rows(), and reports the median load time
+and the peak Python heap of one load.
+
+Usage:
+    python benchmarks/row_hydration_benchmark.py
+    python benchmarks/row_hydration_benchmark.py --dashboard driver --rows 1000 --repeat 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+from sqlalchemy.orm import undefer_group
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def measure(load, repeat):
+    """(median seconds, peak heap bytes) of load()."""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        load()
+        times.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    load()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(times), peak
+
+
+def compare(db, model, columns, rows, repeat):
+    query = model.query.order_by(model.EventDate.desc()).limit(rows)
+
+    def entities():
+        # undefer_group: before this change entity loads fetched every column
+        result = [e.as_dict(columns) for e in query.options(undefer_group('readings')).all()]
+        db.session.expunge_all()  # as at the end of a request
+        return result
+
+    def projected():
+        return [r.as_dict(columns) for r in query.with_entities(model.rows(columns)).all()]
+
+    loaded = len(query.with_entities(model.id).all())
+    print(f"{model.__tablename__}: {loaded} rows, {len(columns)} columns, median of {repeat}")
+    results = {}
+    for name, load in (('entities', entities), ('rows', projected)):
+        seconds, peak = measure(load, repeat)
+        results[name] = seconds, peak
+        print(f"  {name:9s} {seconds * 1000:8.1f} ms  ({seconds / max(loaded, 1) * 1e6:5.1f} us/row)"
+              f"  peak heap {peak / 1e6:6.2f} MB")
+    (t0, m0), (t1, m1) = results['entities'], results['rows']
+    print(f"  speedup {t0 / t1:.1f}x, peak heap {m0 / max(m1, 1):.1f}x smaller")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark event row hydration.")
+    parser.add_argument('--dashboard', choices=['vehicle', 'driver'], default='vehicle')
+    parser.add_argument('--rows', type=int, default=500, help='rows per load (the events panel limit)')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    from app import app
+    from models import db
+    if args.dashboard == 'vehicle':
+        from routes.vehicle import EVENT_COLUMNS, VehicleEvent as model
+    else:
+        from routes.driver import EVENT_COLUMNS, DriverEvent as model
+    with app.app_context():
+        compare(db, model, EVENT_COLUMNS, args.rows, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
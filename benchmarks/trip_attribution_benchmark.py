@@ -0,0 +1,89 @@
+"""Per-trip event counting: the per-trip filter loop vs trip_attribution.
+
+Builds a synthetic day of trips and driver events, counts each trip's
+events by type both ways, checks that the counts agree and reports the
+time of each. No database needed (NumPy + pandas).
+
+Usage:
+    python benchmarks/trip_attribution_benchmark.py
+    python benchmarks/trip_attribution_benchmark.py --trips 20000 --events 2000000 --workers 4 --skip-loop
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from trip_attribution import attribute_events  # noqa: E402
+
+
+def synthetic_day(n_trips, n_events, n_drivers, n_types, seed=0):
+    rng = np.random.default_rng(seed)
+    day = np.datetime64('2025-06-01T00:00:00', 'ns')
+    drivers = np.array([f'Driver {i}' for i in range(n_drivers)])
+    start = day + rng.integers(0, 20 * 3600, n_trips).astype('timedelta64[s]')
+    trips = pd.DataFrame({
+        'id': np.arange(n_trips),
+        'driver': drivers[rng.integers(0, n_drivers, n_trips)],
+        'start': start,
+        'end': start + rng.integers(5 * 60, 4 * 3600, n_trips).astype('timedelta64[s]'),
+    })
+    events = pd.DataFrame({
+        'Event Types': np.array([f'Type {i}' for i in range(n_types)])[rng.integers(0, n_types, n_events)],
+        'EventDate': day + rng.integers(0, 24 * 3600, n_events).astype('timedelta64[s]'),
+        'LinkedName_1': drivers[rng.integers(0, n_drivers, n_events)],
+    })
+    return trips, events
+
+
+def loop_counts(trips_df, events_df):
+    """The original testing.py loop: one filter of all events per trip."""
+    trips_df = trips_df.copy()
+    for et in events_df['Event Types'].unique():
+        trips_df[et] = 0
+    for idx, trip in trips_df.iterrows():
+        driver_events = events_df[
+            (events_df['LinkedName_1'] == trip['driver']) &
+            (events_df['EventDate'] >= trip['start']) &
+            (events_df['EventDate'] <= trip['end'])
+        ]
+        for et, count in driver_events['Event Types'].value_counts().items():
+            trips_df.at[idx, et] = count
+    return trips_df
+
+
+def timed(label, fn):
+    started = time.perf_counter()
+    result = fn()
+    print(f"  {label:18s} {time.perf_counter() - started:8.2f} s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-trip event attribution.")
+    parser.add_argument('--trips', type=int, default=2000)
+    parser.add_argument('--events', type=int, default=200000)
+    parser.add_argument('--drivers', type=int, default=300)
+    parser.add_argument('--types', type=int, default=25)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--skip-loop', action='store_true', help='skip the slow per-trip loop')
+    args = parser.parse_args()
+
+    trips, events = synthetic_day(args.trips, args.events, args.drivers, args.types)
+    print(f"{len(trips)} trips, {len(events)} events, {args.drivers} drivers, {args.types} event types")
+    vectorized = timed('vectorized', lambda: attribute_events(trips, events))
+    sharded = timed(f'{args.workers} workers', lambda: attribute_events(trips, events, workers=args.workers))
+    types = sorted(events['Event Types'].unique())
+    assert vectorized[types].equals(sharded[types])
+    if not args.skip_loop:
+        looped = timed('per-trip loop', lambda: loop_counts(trips, events))
+        assert (looped[types].to_numpy() == vectorized[types].to_numpy()).all(), "counts differ"
+        print("  counts match")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+"""Filter-keyed result cache for the dashboard aggregates.
+
+Entries are tagged with the source table's max(id) when computed and are
+treated as stale once new rows arrive; while the dashboards read the
+rollup cube (ROLLUP_ENABLED), with the cube's refresh watermark instead,
+since a refresh changes the cube without moving max(id). Stale entries
+keep being served (for up to RESULT_CACHE_MAX_STALE seconds) while one
+background refresh recomputes them; concurrent misses for the same key
+share one computation. Edits and late-committing rows move neither tag,
+so every entry is also recomputed after RESULT_CACHE_MAX_AGE seconds.
+
+Backends:
+    lru    - per-process LRU (default)
+    sqlite - one SQLite file shared by every gunicorn worker on the host
+             (RESULT_CACHE_PATH, default <instance folder>/dashboard_cache.sqlite)
+    none   - no caching
+
+The sqlite backend stores values as JSON, never pickle: anything that can
+write the file must not be able to run code in the app. Namedtuples and
+other classes found in cached values are listed with register().
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import copy_current_request_context, current_app, has_request_context
+from sqlalchemy import func
+import rollup
+from models import db, RollupWatermark
+
+Entry = namedtuple('Entry', ['watermark', 'created', 'value'])
+
+
+def make_key(namespace, start_date=None, end_date=None, owner=None, subject=None, event_type=None):
+    """Normalized cache key for a dashboard filter tuple.
+
+    `subject` is the asset name on the vehicle dashboard and the driver
+    name on the driver dashboard.
+    """
+    def norm(v):
+        v = (v or '').strip()
+        return v or None
+
+    def norm_date(v):
+        v = norm(v)
+        return datetime.strptime(v, "%Y-%m-%d").strftime("%Y-%m-%d") if v else None
+
+    return json.dumps([namespace, norm_date(start_date), norm_date(end_date),
+                       norm(owner), norm(subject), norm(event_type)])
+
+
+# --------------------------------------------------------------------
+# SERIALIZATION
+# --------------------------------------------------------------------
+_TYPES = {}
+
+
+def register(cls, encode=list, decode=None):
+    """Let values of cls (a namedtuple by default) be stored by the sqlite backend.
+
+    encode(value) returns something JSON-able once its own parts are
+    encoded; decode() turns that back into a cls. Returns cls.
+    """
+    _TYPES[cls.__name__] = (cls, encode, decode or (lambda v: cls(*v)))
+    return cls
+
+
+register(tuple, list, tuple)
+register(set, list, set)
+register(datetime, datetime.isoformat, datetime.fromisoformat)
+register(date, date.isoformat, date.fromisoformat)
+register(Decimal, str, Decimal)
+
+
+def _encode(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    if type(value) is dict:
+        if all(isinstance(k, str) for k in value) and '__type__' not in value:
+            return {k: _encode(v) for k, v in value.items()}
+        return {'__type__': 'dict', 'value': [[_encode(k), _encode(v)] for k, v in value.items()]}
+    name = type(value).__name__
+    if name not in _TYPES or _TYPES[name][0] is not type(value):
+        raise TypeError(f'{name} is not registered with cache.register()')
+    return {'__type__': name, 'value': _encode(_TYPES[name][1](value))}
+
+
+def _decode(value):
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    if '__type__' not in value:
+        return {k: _decode(v) for k, v in value.items()}
+    if value['__type__'] == 'dict':
+        return {_decode(k): _decode(v) for k, v in value['value']}
+    return _TYPES[value['__type__']][2](_decode(value['value']))
+
+
+def dumps(value):
+    """JSON bytes of a cached value."""
+    return json.dumps(_encode(value), separators=(',', ':')).encode()
+
+
+def loads(blob):
+    return _decode(json.loads(blob))
+
+
+# --------------------------------------------------------------------
+# BACKENDS
+# --------------------------------------------------------------------
+class LRUBackend:
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._leases = set()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def acquire_lease(self, key, ttl):
+        with self._lock:
+            if key in self._leases:
+                return False
+            self._leases.add(key)
+            return True
+
+    def release_lease(self, key):
+        with self._lock:
+            self._leases.discard(key)
+
+
+class SQLiteBackend:
+    """Shared on-disk store. Leases give single-flight across processes."""
+
+    def __init__(self, path, maxsize=1024):
+        self.path = path
+        self.maxsize = maxsize
+        # Owner-only; SQLite gives the -wal / -shm files the same mode
+        os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+        os.chmod(path, 0o600)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS entries ('
+                         'key TEXT PRIMARY KEY, watermark INTEGER, created REAL, used REAL, value BLOB)')
+            conn.execute('CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, expires REAL)')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get(self, key):
+        with self._connect() as conn:
+            row = conn.execute('SELECT watermark, created, value FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute('UPDATE entries SET used = ? WHERE key = ?', (time.time(), key))
+        try:
+            value = loads(row[2])
+        except (ValueError, KeyError, TypeError):
+            return None  # written by an older version (pickle) or an unknown type: a miss
+        return Entry(row[0], row[1], value)
+
+    def set(self, key, entry):
+        blob = dumps(entry.value)
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)',
+                         (key, entry.watermark, entry.created, time.time(), blob))
+            conn.execute('DELETE FROM entries WHERE key NOT IN '
+                         '(SELECT key FROM entries ORDER BY used DESC LIMIT ?)', (self.maxsize,))
+
+    def acquire_lease(self, key, ttl):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('DELETE FROM leases WHERE key = ? AND expires < ?', (key, now))
+            cur = conn.execute('INSERT OR IGNORE INTO leases VALUES (?, ?)', (key, now + ttl))
+            return cur.rowcount == 1
+
+    def release_lease(self, key):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM leases WHERE key = ?', (key,))
+
+
+# --------------------------------------------------------------------
+# CACHE
+# --------------------------------------------------------------------
+class ResultCache:
+    def __init__(self, backend, max_stale=300, watermark_ttl=5, lease_ttl=120, max_age=None):
+        self.backend = backend
+        self.max_stale = max_stale
+        self.max_age = max_age
+        self.watermark_ttl = watermark_ttl
+        self.lease_ttl = lease_ttl
+        self._watermarks = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _memoized(self, key, read):
+        now = time.monotonic()
+        cached = self._watermarks.get(key)
+        if cached and now - cached[1] < self.watermark_ttl:
+            return cached[0]
+        value = read()
+        self._watermarks[key] = (value, now)
+        return value
+
+    def watermark(self, model):
+        """max(id) of the model's table, memoized for watermark_ttl seconds."""
+        return self._memoized(model, lambda: db.session.query(func.max(model.id)).scalar() or 0)
+
+    def version(self, model):
+        """Tag for results computed from model's data: its watermark(), or
+        the cube's (last_id, refreshed_at) while rollup.source_for() reads it."""
+        source = rollup.source_for(model)
+        if source is model:
+            return self.watermark(model)
+        return self._memoized(source, lambda: _rollup_version(model))
+
+    def get_or_compute(self, key, model, compute, max_age=None):
+        """Cached result of compute() for key, invalidated by version(model).
+
+        Entries older than max_age seconds (default: the cache's max_age)
+        are recomputed even when the version has not moved.
+        """
+        if self.backend is None:
+            return compute()
+
+        max_age = self.max_age if max_age is None else max_age
+        watermark = self.version(model)
+        entry = self.backend.get(key)
+        if entry is not None and max_age is not None and time.time() - entry.created >= max_age:
+            entry = None
+        if entry is not None and entry.watermark == watermark:
+            return entry.value
+        if entry is not None and time.time() - entry.created < self.max_stale:
+            self._refresh_in_background(key, watermark, compute)
+            return entry.value
+        return self._single_flight(key, watermark, compute)
+
+    def _compute_and_store(self, key, watermark, compute):
+        value = compute()
+        self.backend.set(key, Entry(watermark, time.time(), value))
+        return value
+
+    def _single_flight(self, key, watermark, compute):
+        # In-process: followers wait on the leader's event.
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = {'done': threading.Event()}
+        if not leader:
+            flight['done'].wait(self.lease_ttl)
+            if 'value' in flight:
+                return flight['value']
+            return compute()
+
+        try:
+            # Across processes: wait for another worker's result while it
+            # holds the lease, then compute ourselves if it never shows up.
+            have_lease = self.backend.acquire_lease(key, self.lease_ttl)
+            deadline = time.time() + self.lease_ttl
+            while not have_lease and time.time() < deadline:
+                time.sleep(0.1)
+                entry = self.backend.get(key)
+                if entry is not None and entry.watermark == watermark:
+                    flight['value'] = entry.value
+                    return entry.value
+                have_lease = self.backend.acquire_lease(key, self.lease_ttl)
+            try:
+                flight['value'] = self._compute_and_store(key, watermark, compute)
+            finally:
+                if have_lease:
+                    self.backend.release_lease(key)
+            return flight['value']
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight['done'].set()
+
+    def _refresh_in_background(self, key, watermark, compute):
+        with self._lock:
+            if key in self._inflight:
+                return
+        if not self.backend.acquire_lease(key, self.lease_ttl):
+            return
+
+        def run():
+            try:
+                self._compute_and_store(key, watermark, compute)
+            finally:
+                self.backend.release_lease(key)
+                db.session.remove()
+
+        if has_request_context():
+            run = copy_current_request_context(run)
+        else:
+            app = current_app._get_current_object()
+            inner = run
+
+            def run():
+                with app.app_context():
+                    inner()
+        threading.Thread(target=run, daemon=True).start()
+
+
+def _rollup_version(model):
+    # Columns, not the mapped object: the session may hold a stale copy
+    row = db.session.query(RollupWatermark.last_id, RollupWatermark.refreshed_at)\
+        .filter(RollupWatermark.table_name == model.__tablename__).first()
+    last_id, refreshed_at = row or (0, None)
+    return f"rollup:{last_id}:{refreshed_at.isoformat() if refreshed_at else ''}"
+
+
+def get_cache():
+    """The app's ResultCache, built from config on first use."""
+    cache = current_app.extensions.get('result_cache')
+    if cache is None:
+        config = current_app.config
+        kind = config.get('RESULT_CACHE_BACKEND', 'lru')
+        if kind == 'sqlite':
+            path = config.get('RESULT_CACHE_PATH')
+            if not path:
+                os.makedirs(current_app.instance_path, exist_ok=True)
+                path = os.path.join(current_app.instance_path, 'dashboard_cache.sqlite')
+            backend = SQLiteBackend(path, config.get('RESULT_CACHE_SIZE', 128))
+        elif kind == 'lru':
+            backend = LRUBackend(config.get('RESULT_CACHE_SIZE', 128))
+        else:
+            backend = None
+        cache = ResultCache(backend,
+                            max_stale=config.get('RESULT_CACHE_MAX_STALE', 300),
+                            watermark_ttl=config.get('RESULT_CACHE_WATERMARK_TTL', 5),
+                            max_age=config.get('RESULT_CACHE_MAX_AGE', 600) or None)
+        current_app.extensions['result_cache'] = cache
+    return cache
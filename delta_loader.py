@@ -0,0 +1,133 @@
+"""In-memory pandas copy of an event table, refreshed incrementally.
+
+DeltaFrame loads a table once, then on refresh() fetches only the rows
+above its watermarks: id > the largest id seen, or ModifiedDate after
+the latest one seen (rows edited in place), as rollup.py refresh does.
+Ids are handed out before their rows commit, so a row can become
+visible below the id watermark after it has passed; each refresh also
+re-fetches the last `rescan` ids under it, and keeps those it does not
+hold yet. Fetched rows replace any earlier copy with the same id.
+
+refresh() only buffers what it fetched. The chunks are folded into the
+frame when `frame` is next read, all at once, so the work per refresh
+follows the number of new or changed rows, not the table size, and a
+frame read less often than it is refreshed is rebuilt less often too.
+
+String columns listed as categorical are kept as pandas categoricals,
+with categories only ever added, so appended chunks share the frame's
+dtype and the names are stored once.
+
+Meant to live in a long-running process (e.g. st.cache_resource in the
+Streamlit tool); refresh() and `frame` are thread-safe.
+"""
+import threading
+import time
+
+import pandas as pd
+from sqlalchemy import DateTime, column, select, table
+
+
+class DeltaFrame:
+    def __init__(self, engine, table_name, columns, categorical=(), dates=(), dropna=(), min_interval=0,
+                 rescan=10000):
+        self.engine = engine
+        self.table = table(table_name, column('id'), column('ModifiedDate', DateTime), *[column(c) for c in columns])
+        self.columns = list(columns)
+        self.categorical = list(categorical)
+        self.dates = list(dates)
+        self.dropna = list(dropna)
+        self.min_interval = min_interval  # seconds between refreshes
+        self.rescan = rescan  # ids below last_id re-fetched by every refresh
+        self.last_id = 0
+        self.last_modified = None
+        self.refreshed_at = 0.0
+        self._frame = None
+        self._pending = []  # (ids fetched, their rows kept) not yet folded into _frame
+        self._categories = {}
+        self._recent = set()  # ids seen in the re-scan window
+        self._lock = threading.Lock()
+
+    @property
+    def frame(self):
+        """The table as a DataFrame indexed by id (None before the first refresh)."""
+        with self._lock:
+            if self._pending:
+                self._fold()
+            return self._frame
+
+    def _query(self):
+        t = self.table
+        cols = [t.c.id, t.c.ModifiedDate] + [t.c[c] for c in self.columns]
+        changed = t.c.id > max(self.last_id - self.rescan, 0)
+        if self.last_modified is not None:
+            changed = changed | (t.c.ModifiedDate > self.last_modified)
+        return select(*cols).where(changed).order_by(t.c.id)
+
+    def _encode(self, chunk):
+        """Cast chunk's categorical columns to the (widened) shared categories."""
+        for col in self.categorical:
+            categories = self._categories.get(col, pd.Index([]))
+            new = pd.Index(chunk[col].dropna().unique()).difference(categories)
+            if len(new):
+                categories = self._categories[col] = categories.append(new)
+            chunk[col] = pd.Categorical(chunk[col], categories=categories)
+        return chunk
+
+    def _fold(self):
+        """Append the buffered chunks to the frame in one concat.
+
+        Edited rows come back with their old id, possibly failing dropna
+        now: every id fetched later drops the copies fetched before it.
+        """
+        chunks, replaced = [], pd.Index([], dtype='int64')
+        for ids, chunk in reversed(self._pending):
+            if len(replaced):
+                chunk = chunk[~chunk.index.isin(replaced)]
+            chunks.append(chunk)
+            replaced = replaced.union(ids)
+        frame = self._frame
+        if frame is not None:
+            stale = frame.index.isin(replaced)
+            frame = frame[~stale] if stale.any() else frame
+            chunks.append(frame)
+        for part in chunks:
+            for col in self.categorical:
+                # Categories only grow at the end, so the codes stay valid
+                if len(part[col].cat.categories) < len(self._categories[col]):
+                    part[col] = part[col].cat.set_categories(self._categories[col])
+        self._frame = pd.concat(chunks[::-1]) if len(chunks) > 1 else chunks[0]
+        self._pending = []
+
+    def refresh(self, force=False):
+        """Fetch new and changed rows; returns how many will be applied."""
+        with self._lock:
+            if not force and time.monotonic() - self.refreshed_at < self.min_interval:
+                return 0
+            with self.engine.connect() as conn:
+                chunk = pd.read_sql(self._query(), conn, index_col='id')
+            self.refreshed_at = time.monotonic()
+
+            # Re-scanned rows are kept only if they are new to us or edited
+            ids = chunk.index.to_numpy()
+            keep = ids > self.last_id
+            if self.last_modified is not None:
+                modified = pd.to_datetime(chunk['ModifiedDate'], errors='coerce')
+                keep |= (modified > self.last_modified).to_numpy()
+            keep |= ~chunk.index.isin(self._recent)
+            chunk = chunk[keep]
+
+            self.last_id = max(self.last_id, int(ids.max()) if len(ids) else 0)
+            floor = self.last_id - self.rescan
+            self._recent = {i for i in self._recent if i > floor}.union(ids[ids > floor].tolist())
+            modified = pd.to_datetime(chunk['ModifiedDate'], errors='coerce').max()
+            if pd.notna(modified) and (self.last_modified is None or modified > self.last_modified):
+                self.last_modified = modified.to_pydatetime()
+            if chunk.empty and self._frame is not None:
+                return 0
+
+            applied, fetched = len(chunk), chunk.index
+            for col in self.dates:
+                chunk[col] = pd.to_datetime(chunk[col], errors='coerce')
+            chunk = self._encode(chunk.dropna(subset=self.dropna).drop(columns='ModifiedDate'))
+            self._pending.append((fetched, chunk))
+            return applied
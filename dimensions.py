@@ -0,0 +1,184 @@
+"""Dimension service for the dashboard filter dropdowns.
+
+Keeps the distinct owners, assets, drivers and event types of a table,
+plus owner -> assets and owner -> drivers indexes, so populating the
+dropdowns is a dictionary lookup instead of a SELECT DISTINCT scan.
+
+A snapshot is reloaded in full every DIMENSION_TTL seconds and topped up
+with the rows above its max(id) watermark whenever new rows arrive.
+Snapshots are also written to the result cache backend, so with the
+sqlite backend every gunicorn worker shares one copy.
+"""
+import copy
+import threading
+import time
+from collections import defaultdict
+
+from flask import current_app
+from sqlalchemy import func
+from models import db, DimAsset, DimClass, DimDriver, DimEventType, DimOwner, RollupWatermark
+import cache
+import rollup
+
+
+def _sorted(values):
+    # Same order as ORDER BY: NULLs last
+    return sorted(values, key=lambda v: (v is None, v or ''))
+
+
+class DimensionSnapshot:
+    def __init__(self, watermark=0):
+        self.watermark = watermark
+        self.loaded_at = time.time()
+        self._owners = set()
+        self._event_types = set()
+        self.assets_by_owner = defaultdict(set)
+        self.drivers_by_owner = defaultdict(set)
+        self.reindex()
+
+    def add(self, owner, asset, driver, event_type, is_driver):
+        self._owners.add(owner)
+        self._event_types.add(event_type)
+        self.assets_by_owner[owner].add(asset)
+        if is_driver:
+            self.drivers_by_owner[owner].add(driver)
+
+    def reindex(self):
+        """Rebuild the sorted lists handed to the templates."""
+        self.owners = _sorted(self._owners)
+        self.event_types = _sorted(self._event_types)
+        self.assets = _sorted(set().union(*self.assets_by_owner.values()))
+        self.drivers = _sorted(set().union(*self.drivers_by_owner.values()))
+
+    def has_owner(self, owner):
+        return owner in self._owners
+
+    def assets_for(self, owner_search=None):
+        """Assets of the owner, or of owners matching a case-insensitive substring.
+
+        Mirrors filters.owner_clause: a known owner name matches exactly.
+        """
+        if not owner_search:
+            return self.assets
+        if self.has_owner(owner_search):
+            return _sorted(self.assets_by_owner[owner_search])
+        needle = owner_search.lower()
+        matched = set()
+        for owner, assets in self.assets_by_owner.items():
+            if owner and needle in owner.lower():
+                matched |= assets
+        return _sorted(matched)
+
+    def drivers_for(self, owner=None):
+        if not owner:
+            return self.drivers
+        return _sorted(self.drivers_by_owner.get(owner, ()))
+
+    def to_state(self):
+        """Plain values for the result cache backend (see cache.register)."""
+        return {'watermark': self.watermark, 'loaded_at': self.loaded_at,
+                'owners': self._owners, 'event_types': self._event_types,
+                'assets_by_owner': dict(self.assets_by_owner), 'drivers_by_owner': dict(self.drivers_by_owner)}
+
+    @classmethod
+    def from_state(cls, state):
+        snapshot = cls(state['watermark'])
+        snapshot.loaded_at = state['loaded_at']
+        snapshot._owners = state['owners']
+        snapshot._event_types = state['event_types']
+        snapshot.assets_by_owner.update(state['assets_by_owner'])
+        snapshot.drivers_by_owner.update(state['drivers_by_owner'])
+        snapshot.reindex()
+        return snapshot
+
+
+cache.register(DimensionSnapshot, DimensionSnapshot.to_state, DimensionSnapshot.from_state)
+
+
+def _dimension_query(source, *criteria):
+    """(owner, asset, driver, is driver, event type) names of the distinct
+    key tuples of source's rows matching criteria."""
+    keys = (
+        db.session.query(source.owner_id, source.asset_id, source.driver_id,
+                         (source.class_id == DimClass.key_of('Driver')).label('is_driver'),
+                         source.event_type_id)
+        .filter(*criteria)
+        .distinct()
+        .subquery()
+    )
+    return (
+        db.session.query(DimOwner.name, DimAsset.name, DimDriver.name, keys.c.is_driver, DimEventType.name)
+        .select_from(keys)
+        .outerjoin(DimOwner, DimOwner.id == keys.c.owner_id)
+        .outerjoin(DimAsset, DimAsset.id == keys.c.asset_id)
+        .outerjoin(DimDriver, DimDriver.id == keys.c.driver_id)
+        .outerjoin(DimEventType, DimEventType.id == keys.c.event_type_id)
+    )
+
+
+def load(model):
+    """Full snapshot of model's dimensions, read from the rollup when enabled."""
+    source = rollup.source_for(model)
+    if source is model:
+        watermark = db.session.query(func.max(model.id)).scalar() or 0
+    else:
+        # The cube only covers rows up to its own watermark; the rest are
+        # picked up by the incremental pass in get_dimensions().
+        wm = db.session.get(RollupWatermark, model.__tablename__)
+        watermark = wm.last_id if wm else 0
+    snapshot = DimensionSnapshot(watermark)
+    for owner, asset, driver, is_driver, etype in _dimension_query(source):
+        snapshot.add(owner, asset, driver, etype, bool(is_driver))
+    snapshot.reindex()
+    return snapshot
+
+
+def extend(model, snapshot, watermark):
+    """Copy of snapshot with the rows in (snapshot.watermark, watermark] merged in."""
+    fresh = copy.deepcopy(snapshot)
+    query = _dimension_query(model, model.id > snapshot.watermark, model.id <= watermark)
+    for owner, asset, driver, is_driver, etype in query:
+        fresh.add(owner, asset, driver, etype, bool(is_driver))
+    fresh.reindex()
+    fresh.watermark = watermark
+    return fresh
+
+
+_lock = threading.Lock()
+
+
+def get_dimensions(model):
+    """Current DimensionSnapshot for model's table.
+
+    Costs a dictionary lookup while the snapshot is younger than
+    DIMENSION_TTL and the table's max(id) (memoized by the result cache)
+    has not moved.
+    """
+    store = current_app.extensions.setdefault('dimensions', {})
+    ttl = current_app.config.get('DIMENSION_TTL', 600)
+    result_cache = cache.get_cache()
+    backend = result_cache.backend
+    key = f'dimensions:{model.__tablename__}'
+
+    watermark = result_cache.watermark(model)
+    snapshot = store.get(key)
+    if snapshot is not None and snapshot.watermark >= watermark and time.time() - snapshot.loaded_at < ttl:
+        return snapshot
+
+    with _lock:
+        snapshot = store.get(key)
+        changed = False
+        if snapshot is None or time.time() - snapshot.loaded_at >= ttl:
+            shared = backend.get(key) if backend else None
+            if shared is not None and time.time() - shared.created < ttl:
+                snapshot = shared.value
+            else:
+                snapshot = load(model)
+                changed = True
+        if snapshot.watermark < watermark:
+            snapshot = extend(model, snapshot, watermark)
+            changed = True
+        if changed and backend:
+            backend.set(key, cache.Entry(snapshot.watermark, snapshot.loaded_at, snapshot))
+        store[key] = snapshot
+    return snapshot
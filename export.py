@@ -0,0 +1,128 @@
+"""Streaming CSV / Parquet export of filtered events.
+
+Rows are read through a server-side cursor (yield_per, which turns on
+stream_results) in EXPORT_CHUNK_ROWS batches and written out as each batch
+arrives, so worker memory stays flat however many rows match. Parquet
+needs the optional pyarrow package; each batch becomes one row group.
+"""
+import csv
+import io
+from datetime import datetime
+
+from flask import Response, current_app, stream_with_context
+from models import db, ENCODED
+
+# Dimension keys (models.ENCODED): internal, and they differ between databases
+KEY_ATTRS = {key_attr for _, key_attr, _ in ENCODED}
+
+
+def export_columns(model):
+    """id plus every BaseEvent column except the dimension keys, in declaration order."""
+    return [model.id] + [getattr(model, c.key) for c in model.__mapper__.column_attrs
+                         if c.key != 'id' and c.key not in KEY_ATTRS]
+
+
+def iter_batches(query, columns, chunk_rows):
+    """Lists of row tuples for query, fetched chunk_rows at a time."""
+    stmt = query.with_entities(*columns).order_by(None).order_by(columns[0]).statement
+    result = db.session.execute(stmt.execution_options(yield_per=chunk_rows))
+    try:
+        for batch in result.partitions():
+            yield batch
+    finally:
+        result.close()
+
+
+def _csv_stream(batches, header):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(header)
+    for batch in batches:
+        writer.writerows(batch)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back to the generator."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _arrow_schema(pa, columns):
+    types = {db.Integer: pa.int64(), db.Float: pa.float64(), db.DateTime: pa.timestamp('us')}
+    fields = []
+    for col in columns:
+        col_type = next((t for sa_type, t in types.items() if isinstance(col.type, sa_type)), pa.string())
+        fields.append(pa.field(col.key, col_type))
+    return pa.schema(fields)
+
+
+def _parquet_stream(batches, columns):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(pa, columns)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    try:
+        for batch in batches:
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*batch), schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+FORMATS = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def export_response(query, model, fmt, name):
+    """Chunked download of query's rows as csv or parquet."""
+    columns = export_columns(model)
+    batches = iter_batches(query, columns, current_app.config.get('EXPORT_CHUNK_ROWS', 5000))
+    if fmt == 'parquet':
+        body = _parquet_stream(batches, columns)
+    else:
+        body = _csv_stream(batches, [c.key for c in columns])
+
+    filename = f"{name}_{datetime.utcnow():%Y%m%d_%H%M%S}.{fmt}"
+    return Response(stream_with_context(body), mimetype=FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
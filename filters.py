@@ -0,0 +1,58 @@
+"""Sargable predicates for the dashboard and event-page filters.
+
+Every filter input is compiled to a comparison on a bare, indexed column:
+dates and ISO weeks become half-open [start, end) EventDate ranges, and
+names become their dimension keys (models.BaseDimension.key_of), looked
+up in the same statement. An owner is matched on its key when it is a
+known owner name, falling back to an ILIKE substring search over
+dim_owner (served by its pg_trgm index from migrations/0002) otherwise.
+Wrapping the column in to_char / extract / date_trunc instead would hide
+it from every index on the table.
+"""
+from datetime import datetime, timedelta
+
+from models import DimOwner
+
+DAY = timedelta(days=1)
+WEEK = timedelta(days=7)
+
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d")
+
+
+def date_range(start_date=None, end_date=None):
+    """[start, end) for YYYY-MM-DD inputs. end_date covers its whole day."""
+    start = parse_date(start_date) if start_date else None
+    end = parse_date(end_date) + DAY if end_date else None
+    return start, end
+
+
+def week_range(week):
+    """[Monday, next Monday) of an ISO week written 'IYYY-IW', as to_char formats it.
+
+    Raises ValueError for anything else.
+    """
+    start = datetime.strptime(f"{week}-1", "%G-%V-%u")
+    return start, start + WEEK
+
+
+def filter_range(query, column, start=None, end=None):
+    """query restricted to start <= column < end (either bound optional)."""
+    if start is not None:
+        query = query.filter(column >= start)
+    if end is not None:
+        query = query.filter(column < end)
+    return query
+
+
+def filter_dates(query, column, start_date=None, end_date=None):
+    return filter_range(query, column, *date_range(start_date, end_date))
+
+
+def owner_clause(column, owner, exact):
+    """Predicate on an owner_id column: = the key of a known owner name,
+    keys of the owners matching a case-insensitive substring otherwise."""
+    if exact:
+        return column == DimOwner.key_of(owner)
+    return column.in_(DimOwner.keys_like(owner))
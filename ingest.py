@@ -0,0 +1,283 @@
+"""Bulk loader for vendor alert exports (PostgreSQL).
+
+Streams CSV or JSON-lines files and reads JSON files of up to
+INGEST_JSON_MAX_MB (a .json file is parsed whole; convert bigger exports
+to JSON lines). Maps each record's fields onto the
+BaseEvent columns and routes it to drivers (Class in INGEST_DRIVER_CLASSES)
+or vehicles. Rows are collected into batches of INGEST_BATCH_ROWS per
+table and each batch is:
+
+    1. COPYed into a temporary staging table,
+    2. merged with one INSERT ... SELECT that keeps the newest record per
+       AlertId and skips AlertIds the table already has,
+
+in its own transaction, under a per-table advisory lock so concurrent
+loaders cannot insert the same AlertId twice. On the dictionary-encoded
+layout (migrations/0002) new names are added to the dim_* tables and the
+fact table is written directly, set-based, instead of row by row through
+the view triggers.
+
+Usage:
+    python ingest.py alerts_2025-06-01.csv more_alerts.jsonl
+    python ingest.py export.json --table vehicles --batch-rows 20000
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateTable
+from models import db, canonical_name, DriverEvent, ENCODED, VehicleEvent
+import rollup
+
+STAGE = 'ingest_stage'
+
+# Name columns stored in the dim_* tables by migrations/0002: (dimension, key column)
+DIMENSIONS = {name_attr: (dim.__tablename__, key_attr) for name_attr, key_attr, dim in ENCODED}
+
+# (attribute key, column name, type) of every loaded column, in table order.
+# The dimension keys are looked up by the merge, not loaded.
+COLUMNS = [(attr.key, attr.columns[0].name, attr.columns[0].type)
+           for attr in inspect(VehicleEvent).column_attrs
+           if attr.key != 'id' and attr.key not in {key for _, key in DIMENSIONS.values()}]
+
+# Vendor field names that do not normalize to a column name
+FIELD_ALIASES = {
+    'drivername': 'LinkedName_1',
+    'driver': 'LinkedName_1',
+    'lat': 'Latitude',
+    'lon': 'Longitude',
+    'lng': 'Longitude',
+}
+
+DATE_FORMATS = ['%Y/%m/%d %H:%M:%S', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M']
+
+
+def _normalize(name):
+    return re.sub(r'[^a-z0-9]', '', name.lower())
+
+
+FIELD_MAP = dict(FIELD_ALIASES)
+for _key, _name, _ in COLUMNS:
+    FIELD_MAP[_normalize(_key)] = _key
+    FIELD_MAP[_normalize(_name)] = _key
+
+
+# --------------------------------------------------------------------
+# PARSING
+# --------------------------------------------------------------------
+def parse_datetime(value):
+    """Naive datetime; a UTC offset is dropped, as PostgreSQL does for timestamp columns."""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        for fmt in DATE_FORMATS:
+            try:
+                return datetime.strptime(value, fmt)
+            except ValueError:
+                pass
+        raise
+    return parsed.replace(tzinfo=None)
+
+
+def _converter(key, col_type):
+    if key in DIMENSIONS:
+        # JSON records can hold numbers or booleans where a name is expected
+        return lambda value: canonical_name(str(value))
+    if isinstance(col_type, db.Float):
+        return float
+    if isinstance(col_type, db.DateTime):
+        return parse_datetime
+    return str
+
+
+CONVERTERS = {key: _converter(key, col_type) for key, _, col_type in COLUMNS}
+
+
+def to_row(record):
+    """Record dict -> {attribute key: value}. Raises ValueError on a bad value."""
+    row = {}
+    for field, value in record.items():
+        key = FIELD_MAP.get(_normalize(field))
+        if key is None:
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+        row[key] = None if value in (None, '') else CONVERTERS[key](value)
+    return row
+
+
+def file_format(path, fmt=None):
+    return fmt or os.path.splitext(path)[1].lstrip('.').lower()
+
+
+def check_size(path, fmt=None, json_max_bytes=None):
+    """Raise ValueError for a .json file over json_max_bytes (None: no limit)."""
+    if file_format(path, fmt) != 'json' or json_max_bytes is None:
+        return
+    size = os.path.getsize(path)
+    if size > json_max_bytes:
+        raise ValueError(f"{path}: {size / 2**20:,.0f} MB of JSON would be parsed whole "
+                         f"(limit INGEST_JSON_MAX_MB = {json_max_bytes / 2**20:,.0f}); "
+                         f"convert it to JSON lines (.jsonl), one record per line, which is streamed")
+
+
+def read_records(path, fmt=None, json_max_bytes=None):
+    """Dicts from a .csv, .jsonl/.ndjson or .json file.
+
+    CSV and JSON-lines are streamed; a .json file is parsed whole (a list of
+    records, or an object whose first list value holds them), so one over
+    json_max_bytes is refused with a ValueError before it is read.
+    """
+    fmt = file_format(path, fmt)
+    check_size(path, fmt, json_max_bytes)
+    with open(path, newline='', encoding='utf-8-sig') as fh:
+        if fmt == 'csv':
+            yield from csv.DictReader(fh)
+        elif fmt in ('jsonl', 'ndjson'):
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+        elif fmt == 'json':
+            data = json.load(fh)
+            if isinstance(data, dict):
+                data = next((v for v in data.values() if isinstance(v, list)), [])
+            yield from data
+        else:
+            raise ValueError(f"{path}: unsupported format {fmt!r} (csv, jsonl, ndjson, json)")
+
+
+# --------------------------------------------------------------------
+# STAGING + MERGE
+# --------------------------------------------------------------------
+def _q(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _stage_table():
+    cols = [db.Column(name, col_type) for _, name, col_type in COLUMNS]
+    return db.Table(STAGE, db.MetaData(), *cols, prefixes=['TEMPORARY'], postgresql_on_commit='DELETE ROWS')
+
+
+def _merge_sql(model):
+    """Statements merging the staging table into model's table."""
+    table = model.__tablename__
+    names = {key: name for key, name, _ in COLUMNS}
+    newest = 'ORDER BY s."AlertId", s."ModifiedDate" DESC NULLS LAST'
+    new_only = f'NOT EXISTS (SELECT 1 FROM {table} t WHERE t."AlertId" = s."AlertId")'
+
+    statements = [
+        f'INSERT INTO {dim} (name) SELECT DISTINCT s.{_q(names[key])} FROM {STAGE} s '
+        f'WHERE s.{_q(names[key])} IS NOT NULL ON CONFLICT (name) DO NOTHING'
+        for key, (dim, _) in DIMENSIONS.items()
+    ]
+    fact = rollup.physical_table(model)
+    if fact == table:
+        # A db.create_all() table keeps the names alongside their keys
+        plain = list(names.values())
+    else:
+        plain = [name for key, name in names.items() if key not in DIMENSIONS]
+    cols = [_q(name) for name in plain] + [key_col for _, key_col in DIMENSIONS.values()]
+    select = [f's.{_q(name)}' for name in plain] + [f'd{i}.id' for i in range(len(DIMENSIONS))]
+    joins = ' '.join(f'LEFT JOIN {dim} d{i} ON d{i}.name = s.{_q(names[key])}'
+                     for i, (key, (dim, _)) in enumerate(DIMENSIONS.items()))
+    statements.append(f'INSERT INTO {fact} ({", ".join(cols)}) SELECT DISTINCT ON (s."AlertId") '
+                      f'{", ".join(select)} FROM {STAGE} s {joins} WHERE {new_only} {newest}')
+    return statements
+
+
+def load_batch(model, rows):
+    """COPY rows into staging and merge them into model's table. Returns rows inserted."""
+    conn = db.session.connection()
+    conn.execute(CreateTable(_stage_table(), if_not_exists=True))
+    conn.execute(text('SELECT pg_advisory_xact_lock(hashtext(:k))'), {'k': f'ingest:{model.__tablename__}'})
+
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    keys = [key for key, _, _ in COLUMNS]
+    writer.writerows([row.get(key) for key in keys] for row in rows)
+    buf.seek(0)
+    cursor = conn.connection.cursor()
+    cursor.copy_expert(f'COPY {STAGE} ({", ".join(_q(name) for _, name, _ in COLUMNS)}) '
+                       f'FROM STDIN WITH (FORMAT csv)', buf)
+
+    inserted = 0
+    for statement in _merge_sql(model):
+        inserted = conn.execute(text(statement)).rowcount  # the last statement inserts the events
+    db.session.commit()  # ON COMMIT DELETE ROWS empties the staging table
+    return inserted
+
+
+def ingest(paths, fmt=None, table=None, batch_rows=None):
+    """Load every file; returns a Counter of read / rejected / inserted / duplicate rows."""
+    config = current_app.config
+    batch_rows = batch_rows or config.get('INGEST_BATCH_ROWS', 50000)
+    json_max_bytes = config.get('INGEST_JSON_MAX_MB', 256) * 2**20
+    driver_classes = {c.strip() for c in config.get('INGEST_DRIVER_CLASSES', ['Driver'])}
+    forced = {'drivers': DriverEvent, 'vehicles': VehicleEvent}.get(table)
+
+    stats = Counter()
+    batches = {DriverEvent: [], VehicleEvent: []}
+
+    def flush(model):
+        rows = batches[model]
+        if rows:
+            inserted = load_batch(model, rows)
+            stats[f'inserted_{model.__tablename__}'] += inserted
+            stats['duplicates'] += len(rows) - inserted
+            batches[model] = []
+
+    for path in paths:
+        check_size(path, fmt, json_max_bytes)  # before anything is loaded
+    for path in paths:
+        for record in read_records(path, fmt, json_max_bytes):
+            stats['read'] += 1
+            try:
+                row = to_row(record)
+            except (TypeError, ValueError):
+                stats['rejected'] += 1
+                continue
+            if not row.get('AlertId'):
+                stats['rejected'] += 1
+                continue
+            model = forced or (DriverEvent if row.get('Class') in driver_classes else VehicleEvent)
+            batches[model].append(row)
+            if len(batches[model]) >= batch_rows:
+                flush(model)
+    for model in batches:
+        flush(model)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load alert exports into drivers / vehicles.")
+    parser.add_argument('paths', nargs='+', metavar='FILE')
+    parser.add_argument('--format', choices=['csv', 'jsonl', 'ndjson', 'json'],
+                        help='default: from each file extension')
+    parser.add_argument('--table', choices=['drivers', 'vehicles'], help='load everything into one table')
+    parser.add_argument('--batch-rows', type=int, help='override INGEST_BATCH_ROWS')
+    args = parser.parse_args()
+
+    from app import app
+    with app.app_context():
+        started = time.perf_counter()
+        try:
+            stats = ingest(args.paths, args.format, args.table, args.batch_rows)
+        except ValueError as exc:
+            sys.exit(str(exc))
+        elapsed = time.perf_counter() - started
+    print(f"read {stats['read']} rows in {elapsed:.1f}s ({stats['read'] / max(elapsed, 1e-9):,.0f} rows/s): "
+          f"{stats['inserted_vehicles']} into vehicles, {stats['inserted_drivers']} into drivers, "
+          f"{stats['duplicates']} duplicate AlertIds skipped, {stats['rejected']} rejected")
+
+
+if __name__ == "__main__":
+    main()
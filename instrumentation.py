@@ -0,0 +1,245 @@
+"""Per-request SQL timings, a Server-Timing header and Prometheus /metrics.
+
+Cursor hooks on every engine count the statements of the current
+request and time them, attributed to the dashboard section running them
+(sections.run_sections enters section() around each one). At the end of
+the request the totals go out as a Server-Timing header, readable in the
+browser's network panel:
+
+    total;dur=412.0, db;dur=388.1;desc="9 statements", db-slowest;dur=201.4,
+    section-weekly;dur=230.2, db-weekly;dur=221.7;desc="1 statements", ...
+
+and are added to in-process counters and histograms, labelled by route
+(the endpoint) and section, that /metrics serves in the Prometheus text
+format. The hooks only read a clock and update a few numbers, so they
+stay on in production. Metrics are per process: scrape each worker, or
+run one.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import Response, current_app, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+ENVIRON_KEY = 'dashboard.request_stats'
+NO_SECTION = 'none'
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_section = ContextVar('dashboard_section', default=None)
+
+
+class RequestStats:
+    """SQL totals of one request; section threads share it through the request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.slowest = (0.0, None)  # (seconds, statement)
+        self.sections = defaultdict(lambda: [0, 0.0, 0.0])  # name: [statements, db seconds, wall seconds]
+        self._lock = threading.Lock()
+
+    def add_statement(self, section, seconds, statement):
+        with self._lock:
+            self.statements += 1
+            self.db_seconds += seconds
+            if seconds > self.slowest[0]:
+                self.slowest = (seconds, statement)
+            totals = self.sections[section or NO_SECTION]
+            totals[0] += 1
+            totals[1] += seconds
+
+    def add_section_time(self, section, seconds):
+        with self._lock:
+            self.sections[section][2] += seconds
+
+
+def current_stats():
+    """The RequestStats of the active request, or None."""
+    if not has_request_context():
+        return None
+    return request.environ.get(ENVIRON_KEY)
+
+
+@contextmanager
+def section(name):
+    """Attribute the statements run inside to dashboard section name."""
+    token = _section.set(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _section.reset(token)
+        stats = current_stats()
+        if stats is not None:
+            stats.add_section_time(name, time.perf_counter() - started)
+
+
+# --------------------------------------------------------------------
+# CURSOR HOOKS
+# --------------------------------------------------------------------
+_statement_listeners = []
+
+
+def on_statement(listener):
+    """Call listener(seconds, statement, parameters, section) after every request statement."""
+    if listener not in _statement_listeners:
+        _statement_listeners.append(listener)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    stats = current_stats()
+    if stats is not None:
+        section_name = _section.get()
+        stats.add_statement(section_name, elapsed, statement)
+        for listener in _statement_listeners:
+            listener(elapsed, statement, parameters, section_name)
+
+
+def _handle_error(exception_context):
+    starts = exception_context.connection.info.get('query_start') if exception_context.connection else None
+    if starts:
+        starts.pop()
+
+
+# --------------------------------------------------------------------
+# METRICS
+# --------------------------------------------------------------------
+METRICS = {
+    'dashboard_requests_total': ('counter', 'Requests served.'),
+    'dashboard_request_seconds': ('histogram', 'Request wall time.'),
+    'dashboard_request_db_seconds': ('histogram', 'Database time per request.'),
+    'dashboard_db_statements_total': ('counter', 'SQL statements executed.'),
+    'dashboard_db_seconds_total': ('counter', 'Time spent in SQL statements.'),
+    'dashboard_section_seconds': ('histogram', 'Dashboard section wall time.'),
+}
+
+_lock = threading.Lock()
+_counters = defaultdict(float)  # (name, labels): value
+_histograms = {}  # (name, labels): [bucket counts..., +Inf count], sum
+
+
+def _inc(name, labels, value=1.0):
+    _counters[(name, labels)] += value
+
+
+def _observe(name, labels, value):
+    entry = _histograms.get((name, labels))
+    if entry is None:
+        entry = _histograms[(name, labels)] = [[0] * (len(BUCKETS) + 1), 0.0]
+    entry[0][bisect_left(BUCKETS, value)] += 1
+    entry[1] += value
+
+
+def record(route, stats, request_seconds):
+    """Add one finished request to the process metrics."""
+    route_label = (('route', route),)
+    with _lock:
+        _inc('dashboard_requests_total', route_label)
+        _observe('dashboard_request_seconds', route_label, request_seconds)
+        _observe('dashboard_request_db_seconds', route_label, stats.db_seconds)
+        for name, (statements, db_seconds, wall_seconds) in stats.sections.items():
+            labels = route_label + (('section', name),)
+            if statements:
+                _inc('dashboard_db_statements_total', labels, statements)
+                _inc('dashboard_db_seconds_total', labels, db_seconds)
+            if name != NO_SECTION:
+                _observe('dashboard_section_seconds', labels, wall_seconds)
+
+
+def _label_text(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def render_metrics():
+    """Every metric in the Prometheus text exposition format."""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: (list(counts), total) for key, (counts, total) in _histograms.items()}
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        if kind == 'counter':
+            lines += [f'{name}{_label_text(labels)} {value}'
+                      for (metric, labels), value in sorted(counters.items()) if metric == name]
+            continue
+        for (metric, labels), (counts, total) in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{_label_text(labels, [("le", bound)])} {cumulative}')
+            lines += [f'{name}_sum{_label_text(labels)} {total}', f'{name}_count{_label_text(labels)} {cumulative}']
+    return '\n'.join(lines) + '\n'
+
+
+# --------------------------------------------------------------------
+# FLASK WIRING
+# --------------------------------------------------------------------
+def server_timing(stats, request_seconds):
+    parts = [f'total;dur={request_seconds * 1000:.1f}',
+             f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.statements} statements"']
+    if stats.statements:
+        parts.append(f'db-slowest;dur={stats.slowest[0] * 1000:.1f}')
+    for name, (statements, db_seconds, wall_seconds) in stats.sections.items():
+        if name == NO_SECTION:
+            continue
+        parts.append(f'section-{name};dur={wall_seconds * 1000:.1f}')
+        parts.append(f'db-{name};dur={db_seconds * 1000:.1f};desc="{statements} statements"')
+    return ', '.join(parts)
+
+
+def _start_request():
+    request.environ[ENVIRON_KEY] = RequestStats()
+
+
+def _finish_request(response):
+    stats = request.environ.get(ENVIRON_KEY)
+    if stats is None or request.endpoint == 'metrics':
+        return response
+    elapsed = time.perf_counter() - stats.started
+    record(request.endpoint or 'unknown', stats, elapsed)
+    if stats.statements:
+        current_app.logger.debug('%s: %d statements, %.1f ms in the database, slowest %.1f ms: %s',
+                                 request.endpoint, stats.statements, stats.db_seconds * 1000,
+                                 stats.slowest[0] * 1000, stats.slowest[1])
+    if current_app.config.get('SERVER_TIMING_ENABLED', True):
+        response.headers['Server-Timing'] = server_timing(stats, elapsed)
+    return response
+
+
+def metrics():
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+_hooks_installed = False
+
+
+def init_app(app):
+    """Install the cursor hooks and request timing, and serve /metrics."""
+    global _hooks_installed
+    if not app.config.get('INSTRUMENTATION_ENABLED', True):
+        return
+    if not _hooks_installed:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+        _hooks_installed = True
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.add_url_rule('/metrics', 'metrics', metrics)
@@ -0,0 +1,98 @@
+"""Apply the files in migrations/ in name order.
+
+Applied versions are recorded in schema_migrations, so re-running only
+applies new files. A .sql file whose first line is
+`-- migrate: no-transaction` is run one statement at a time in autocommit
+mode (needed for CREATE INDEX CONCURRENTLY). Other .sql files run as a
+single transaction. A .py file's upgrade(conn) is called with an
+autocommit connection, for steps that depend on what is in the database
+(e.g. one CONCURRENTLY build per partition).
+
+Usage:
+    python migrate.py            # apply pending migrations
+    python migrate.py status     # list applied and pending migrations
+"""
+import argparse
+import importlib.util
+import os
+from datetime import datetime
+
+from sqlalchemy import text
+from models import db
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+NO_TRANSACTION = '-- migrate: no-transaction'
+
+
+def migration_files():
+    return sorted(f for f in os.listdir(MIGRATIONS_DIR) if f.endswith(('.sql', '.py')))
+
+
+def applied_versions():
+    db.session.execute(text(
+        'CREATE TABLE IF NOT EXISTS schema_migrations ('
+        'version VARCHAR PRIMARY KEY, applied_at TIMESTAMP NOT NULL)'
+    ))
+    db.session.commit()
+    return {v for (v,) in db.session.execute(text('SELECT version FROM schema_migrations'))}
+
+
+def _statements(sql):
+    """Split a no-transaction file on semicolons ending a line (no $$ bodies there)."""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith('--')]
+    return [s.strip() for s in '\n'.join(lines).split(';\n') if s.strip().rstrip(';')]
+
+
+def _run_sql(conn, sql):
+    # no_parameters: psycopg2 would otherwise read the % in format() calls as placeholders
+    conn.execution_options(no_parameters=True).exec_driver_sql(sql)
+
+
+def apply(filename):
+    path = os.path.join(MIGRATIONS_DIR, filename)
+    record = text('INSERT INTO schema_migrations (version, applied_at) VALUES (:v, :t)')
+    params = {'v': filename, 't': datetime.utcnow()}
+
+    if filename.endswith('.py'):
+        spec = importlib.util.spec_from_file_location(f'migration_{filename[:-3]}', path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            module.upgrade(conn)
+            conn.execute(record, params)
+        return
+
+    with open(path) as fh:
+        sql = fh.read()
+    if sql.lstrip().startswith(NO_TRANSACTION):
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            for statement in _statements(sql):
+                _run_sql(conn, statement.rstrip(';'))
+            conn.execute(record, params)
+    else:
+        with db.engine.begin() as conn:
+            _run_sql(conn, sql)
+            conn.execute(record, params)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply SQL migrations.")
+    parser.add_argument('command', nargs='?', choices=['up', 'status'], default='up')
+    args = parser.parse_args()
+
+    from app import app
+    with app.app_context():
+        done = applied_versions()
+        pending = [f for f in migration_files() if f not in done]
+        if args.command == 'status':
+            for f in migration_files():
+                print(f"{'applied' if f in done else 'pending'}  {f}")
+            return
+        for f in pending:
+            print(f"applying {f}")
+            apply(f)
+        print(f"{len(pending)} migration(s) applied")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+-- migrate: no-transaction
+-- Composite indexes matched to the predicates compiled by filters.py,
+-- plus a trigram index for the vehicle dashboard's owner substring search.
+-- migrations/0002 re-keys them on the dimension keys (as models.BaseEvent
+-- declares them) and moves the trigram index to dim_owner.
+-- CONCURRENTLY keeps the tables writable while the indexes build, which
+-- is why this file runs outside a transaction.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Dashboard slice: EventDate range, then exact owner / event type.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_vehicles_date_owner_type ON vehicles ("EventDate", "OwnerName", "Event Types");
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_drivers_date_owner_type ON drivers ("EventDate", "OwnerName", "Event Types");
+
+-- Event pages: one driver or asset, week range, keyset order (EventDate DESC, id DESC).
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_vehicles_driver_date ON vehicles ("LinkedName_1", "EventDate", id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_vehicles_asset_date ON vehicles ("AssetName", "EventDate", id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_drivers_driver_date ON drivers ("LinkedName_1", "EventDate", id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_drivers_asset_date ON drivers ("AssetName", "EventDate", id);
+
+-- OwnerName ILIKE '%x%' when x is not a known owner.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_vehicles_owner_trgm ON vehicles USING gin ("OwnerName" gin_trgm_ops);
+
+ANALYZE vehicles;
+ANALYZE drivers;
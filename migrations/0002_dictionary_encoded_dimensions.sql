@@ -0,0 +1,185 @@
+-- Dictionary-encode the wide, repetitive string columns of vehicles and
+-- drivers. Each one moves to a small dim_* table with an integer key:
+--
+--     OwnerName -> dim_owner       AssetName     -> dim_asset
+--     LinkedName_1 -> dim_driver   "Event Types" -> dim_event_type
+--     AlertName -> dim_alert_name  Class         -> dim_class
+--     AssetTypeName -> dim_asset_type
+--
+-- The tables become vehicles_fact / drivers_fact holding the keys, and
+-- `vehicles` / `drivers` are recreated as views with the original column
+-- names plus the keys, so external loaders are unchanged. The app filters
+-- and groups on the keys (models.BaseEvent's *_id columns) and reads the
+-- names only for the rows it returns. Writes through the views go through
+-- INSTEAD OF triggers that canonicalize each name (trim, collapse inner
+-- whitespace, '' -> NULL) and look up or create its key.
+--
+-- Also runs on tables made by db.create_all(), which already have the
+-- dim_* tables, the key columns and their indexes.
+--
+-- Rewrites every row. Reclaim the freed space afterwards with
+-- VACUUM FULL (or pg_repack) on both *_fact tables.
+
+CREATE FUNCTION canonical_name(value text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE
+    AS $$ SELECT NULLIF(btrim(regexp_replace(value, '\s+', ' ', 'g')), '') $$;
+
+CREATE TABLE IF NOT EXISTS dim_owner      (id serial PRIMARY KEY, name varchar NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS dim_asset      (id serial PRIMARY KEY, name varchar NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS dim_driver     (id serial PRIMARY KEY, name varchar NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS dim_event_type (id serial PRIMARY KEY, name varchar NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS dim_alert_name (id serial PRIMARY KEY, name varchar NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS dim_class      (id serial PRIMARY KEY, name varchar NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS dim_asset_type (id serial PRIMARY KEY, name varchar NOT NULL UNIQUE);
+
+-- Owner substring search (filters.owner_clause): name ILIKE '%x%' here,
+-- then owner_id IN (...) on the facts. Replaces 0001's trigram index on
+-- vehicles."OwnerName", which goes with the column below.
+CREATE INDEX IF NOT EXISTS ix_dim_owner_name_trgm ON dim_owner USING gin (name gin_trgm_ops);
+
+-- Key of a name in dimension table dim, created on first sight. NULL for
+-- NULL / blank names.
+CREATE FUNCTION dim_key(dim text, value text) RETURNS integer
+    LANGUAGE plpgsql
+    AS $$
+DECLARE
+    canon text := canonical_name(value);
+    dim_id integer;
+BEGIN
+    IF canon IS NULL THEN
+        RETURN NULL;
+    END IF;
+    EXECUTE format('SELECT id FROM %I WHERE name = $1', dim) INTO dim_id USING canon;
+    IF dim_id IS NULL THEN
+        EXECUTE format('INSERT INTO %I (name) VALUES ($1) ON CONFLICT (name) DO NOTHING RETURNING id', dim)
+            INTO dim_id USING canon;
+        IF dim_id IS NULL THEN  -- lost a race with a concurrent insert
+            EXECUTE format('SELECT id FROM %I WHERE name = $1', dim) INTO dim_id USING canon;
+        END IF;
+    END IF;
+    RETURN dim_id;
+END $$;
+
+-- INSTEAD OF trigger for the vehicles / drivers views.
+CREATE FUNCTION event_view_write() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+DECLARE
+    fact text := TG_TABLE_NAME || '_fact';
+    cols text := 'id, "AlertId", "AlertType", "EventDate", "CreationDate", "ModifiedDate", "EventClass", '
+                 '"EventType", "LinkedId_0", "LinkedName_0", "LinkedId_1", "Longitude", "Latitude", '
+                 '"LocationAddress", "AssetId", "AssetTypeId", "InputId", "InputName", "LimitValue", '
+                 '"CurrentValue", "IdleCounter", "BatteryVoltage", "PowerVoltage", "Alert Classification", '
+                 'owner_id, asset_id, driver_id, event_type_id, alert_name_id, class_id, asset_type_id';
+    vals text := '($1).id, ($1)."AlertId", ($1)."AlertType", ($1)."EventDate", ($1)."CreationDate", '
+                 '($1)."ModifiedDate", ($1)."EventClass", ($1)."EventType", ($1)."LinkedId_0", '
+                 '($1)."LinkedName_0", ($1)."LinkedId_1", ($1)."Longitude", ($1)."Latitude", '
+                 '($1)."LocationAddress", ($1)."AssetId", ($1)."AssetTypeId", ($1)."InputId", ($1)."InputName", '
+                 '($1)."LimitValue", ($1)."CurrentValue", ($1)."IdleCounter", ($1)."BatteryVoltage", '
+                 '($1)."PowerVoltage", ($1)."Alert Classification", '
+                 'dim_key(''dim_owner'', ($1)."OwnerName"), dim_key(''dim_asset'', ($1)."AssetName"), '
+                 'dim_key(''dim_driver'', ($1)."LinkedName_1"), dim_key(''dim_event_type'', ($1)."Event Types"), '
+                 'dim_key(''dim_alert_name'', ($1)."AlertName"), dim_key(''dim_class'', ($1)."Class"), '
+                 'dim_key(''dim_asset_type'', ($1)."AssetTypeName")';
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        EXECUTE format('DELETE FROM %I WHERE id = $1', fact) USING OLD.id;
+        RETURN OLD;
+    ELSIF TG_OP = 'UPDATE' THEN
+        EXECUTE format('UPDATE %I SET (%s) = (SELECT %s) WHERE id = $2', fact, cols, vals) USING NEW, OLD.id;
+    ELSE
+        EXECUTE format('INSERT INTO %I (%s) SELECT %s', fact, cols, vals) USING NEW;
+    END IF;
+    RETURN NEW;
+END $$;
+
+DO $$
+DECLARE
+    t text;
+BEGIN
+    FOR t IN SELECT unnest(ARRAY['vehicles', 'drivers']) LOOP
+        EXECUTE format($sql$
+            INSERT INTO dim_owner (name)
+                SELECT DISTINCT canonical_name("OwnerName") FROM %1$I WHERE canonical_name("OwnerName") IS NOT NULL
+                ON CONFLICT DO NOTHING;
+            INSERT INTO dim_asset (name)
+                SELECT DISTINCT canonical_name("AssetName") FROM %1$I WHERE canonical_name("AssetName") IS NOT NULL
+                ON CONFLICT DO NOTHING;
+            INSERT INTO dim_driver (name)
+                SELECT DISTINCT canonical_name("LinkedName_1") FROM %1$I WHERE canonical_name("LinkedName_1") IS NOT NULL
+                ON CONFLICT DO NOTHING;
+            INSERT INTO dim_event_type (name)
+                SELECT DISTINCT canonical_name("Event Types") FROM %1$I WHERE canonical_name("Event Types") IS NOT NULL
+                ON CONFLICT DO NOTHING;
+            INSERT INTO dim_alert_name (name)
+                SELECT DISTINCT canonical_name("AlertName") FROM %1$I WHERE canonical_name("AlertName") IS NOT NULL
+                ON CONFLICT DO NOTHING;
+            INSERT INTO dim_class (name)
+                SELECT DISTINCT canonical_name("Class") FROM %1$I WHERE canonical_name("Class") IS NOT NULL
+                ON CONFLICT DO NOTHING;
+            INSERT INTO dim_asset_type (name)
+                SELECT DISTINCT canonical_name("AssetTypeName") FROM %1$I WHERE canonical_name("AssetTypeName") IS NOT NULL
+                ON CONFLICT DO NOTHING;
+
+            ALTER TABLE %1$I RENAME TO %2$I;
+            ALTER TABLE %2$I
+                ADD COLUMN IF NOT EXISTS owner_id integer REFERENCES dim_owner (id),
+                ADD COLUMN IF NOT EXISTS asset_id integer REFERENCES dim_asset (id),
+                ADD COLUMN IF NOT EXISTS driver_id integer REFERENCES dim_driver (id),
+                ADD COLUMN IF NOT EXISTS event_type_id integer REFERENCES dim_event_type (id),
+                ADD COLUMN IF NOT EXISTS alert_name_id integer REFERENCES dim_alert_name (id),
+                ADD COLUMN IF NOT EXISTS class_id integer REFERENCES dim_class (id),
+                ADD COLUMN IF NOT EXISTS asset_type_id integer REFERENCES dim_asset_type (id);
+
+            -- One pass over the table; each key is a unique-index probe.
+            UPDATE %2$I f SET
+                owner_id = (SELECT id FROM dim_owner WHERE name = canonical_name(f."OwnerName")),
+                asset_id = (SELECT id FROM dim_asset WHERE name = canonical_name(f."AssetName")),
+                driver_id = (SELECT id FROM dim_driver WHERE name = canonical_name(f."LinkedName_1")),
+                event_type_id = (SELECT id FROM dim_event_type WHERE name = canonical_name(f."Event Types")),
+                alert_name_id = (SELECT id FROM dim_alert_name WHERE name = canonical_name(f."AlertName")),
+                class_id = (SELECT id FROM dim_class WHERE name = canonical_name(f."Class")),
+                asset_type_id = (SELECT id FROM dim_asset_type WHERE name = canonical_name(f."AssetTypeName"));
+
+            -- Drops the string indexes (including migrations/0001's) with them;
+            -- the owner trigram index now lives on dim_owner (above).
+            ALTER TABLE %2$I
+                DROP COLUMN "OwnerName", DROP COLUMN "AssetName", DROP COLUMN "LinkedName_1",
+                DROP COLUMN "Event Types", DROP COLUMN "AlertName", DROP COLUMN "Class",
+                DROP COLUMN "AssetTypeName";
+
+            CREATE INDEX IF NOT EXISTS ix_%1$s_date_owner_type ON %2$I ("EventDate", owner_id, event_type_id);
+            CREATE INDEX IF NOT EXISTS ix_%1$s_driver_date ON %2$I (driver_id, "EventDate", id);
+            CREATE INDEX IF NOT EXISTS ix_%1$s_asset_date ON %2$I (asset_id, "EventDate", id);
+            CREATE INDEX IF NOT EXISTS ix_%1$s_class ON %2$I (class_id);
+
+            -- LEFT JOINs on unique keys: the planner drops every join whose
+            -- name the query does not reference.
+            CREATE VIEW %1$I AS
+            SELECT f.id, o.name AS "OwnerName", f."AlertId", an.name AS "AlertName", f."AlertType",
+                   f."EventDate", f."CreationDate", f."ModifiedDate", f."EventClass", f."EventType",
+                   f."LinkedId_0", f."LinkedName_0", f."LinkedId_1", d.name AS "LinkedName_1",
+                   f."Longitude", f."Latitude", f."LocationAddress", f."AssetId", a.name AS "AssetName",
+                   f."AssetTypeId", at.name AS "AssetTypeName", f."InputId", f."InputName", f."LimitValue",
+                   f."CurrentValue", f."IdleCounter", f."BatteryVoltage", f."PowerVoltage",
+                   et.name AS "Event Types", f."Alert Classification", c.name AS "Class",
+                   f.owner_id, f.asset_id, f.driver_id, f.event_type_id, f.alert_name_id, f.class_id,
+                   f.asset_type_id
+            FROM %2$I f
+            LEFT JOIN dim_owner o ON o.id = f.owner_id
+            LEFT JOIN dim_asset a ON a.id = f.asset_id
+            LEFT JOIN dim_driver d ON d.id = f.driver_id
+            LEFT JOIN dim_event_type et ON et.id = f.event_type_id
+            LEFT JOIN dim_alert_name an ON an.id = f.alert_name_id
+            LEFT JOIN dim_class c ON c.id = f.class_id
+            LEFT JOIN dim_asset_type at ON at.id = f.asset_type_id;
+
+            ALTER VIEW %1$I ALTER COLUMN id SET DEFAULT nextval(%3$L::regclass);
+            CREATE TRIGGER %1$s_write INSTEAD OF INSERT OR UPDATE OR DELETE ON %1$I
+                FOR EACH ROW EXECUTE FUNCTION event_view_write();
+        $sql$, t, t || '_fact', pg_get_serial_sequence(t, 'id'));
+    END LOOP;
+END $$;
+
+ANALYZE vehicles_fact;
+ANALYZE drivers_fact;
@@ -0,0 +1,165 @@
+-- Monthly range partitioning of vehicles_fact / drivers_fact on EventDate.
+--
+-- Nothing is copied here, so this runs in seconds. Each *_fact table is
+-- renamed to *_fact_legacy and a partitioned *_fact takes its place, with
+-- partitions for this month and the next three plus a default partition
+-- for rows without an EventDate. While the legacy table exists the
+-- vehicles / drivers views read both tables (UNION ALL) and every write
+-- lands in the partitioned one, so
+--
+--     python partitions.py migrate
+--
+-- can move the old rows over one month per transaction, with no downtime,
+-- and drop the legacy table when it is empty. See partitions.py for
+-- creating future partitions and for retention.
+--
+-- The views keep their columns, so date filters from apply_filters prune
+-- partitions without any change to the routes.
+
+-- Partition of fact for the month containing `month`, created unless it
+-- exists. Rows for that month that ended up in the default partition are
+-- moved into it (they would otherwise block the partition's creation).
+CREATE FUNCTION create_event_partition(fact text, month date) RETURNS text
+    LANGUAGE plpgsql
+    AS $$
+DECLARE
+    lo timestamp := date_trunc('month', month::timestamp);
+    hi timestamp := lo + interval '1 month';
+    part text := fact || to_char(lo, '"_y"YYYY"m"MM');
+BEGIN
+    IF to_regclass(part) IS NOT NULL THEN
+        RETURN NULL;
+    END IF;
+    EXECUTE format('CREATE TEMP TABLE event_partition_parked (LIKE %I)', fact);
+    EXECUTE format('WITH moved AS (DELETE FROM %I WHERE "EventDate" >= $1 AND "EventDate" < $2 RETURNING *) '
+                   'INSERT INTO event_partition_parked SELECT * FROM moved', fact || '_default') USING lo, hi;
+    EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)', part, fact, lo, hi);
+    EXECUTE format('INSERT INTO %I SELECT * FROM event_partition_parked', fact);
+    DROP TABLE event_partition_parked;
+    RETURN part;
+END $$;
+
+-- (Re)create the vehicles / drivers view over t_fact, and over
+-- t_fact_legacy as well while include_legacy.
+CREATE FUNCTION define_event_view(t text, include_legacy boolean) RETURNS void
+    LANGUAGE plpgsql
+    AS $$
+DECLARE
+    fact text := t || '_fact';
+    source text := format('%I', fact);
+BEGIN
+    IF include_legacy THEN
+        source := format('(SELECT * FROM %I UNION ALL SELECT * FROM %I)', fact, fact || '_legacy');
+    END IF;
+    EXECUTE format($sql$
+        CREATE OR REPLACE VIEW %1$I AS
+        SELECT f.id, o.name AS "OwnerName", f."AlertId", an.name AS "AlertName", f."AlertType",
+               f."EventDate", f."CreationDate", f."ModifiedDate", f."EventClass", f."EventType",
+               f."LinkedId_0", f."LinkedName_0", f."LinkedId_1", d.name AS "LinkedName_1",
+               f."Longitude", f."Latitude", f."LocationAddress", f."AssetId", a.name AS "AssetName",
+               f."AssetTypeId", at.name AS "AssetTypeName", f."InputId", f."InputName", f."LimitValue",
+               f."CurrentValue", f."IdleCounter", f."BatteryVoltage", f."PowerVoltage",
+               et.name AS "Event Types", f."Alert Classification", c.name AS "Class",
+               f.owner_id, f.asset_id, f.driver_id, f.event_type_id, f.alert_name_id, f.class_id,
+               f.asset_type_id
+        FROM %2$s f
+        LEFT JOIN dim_owner o ON o.id = f.owner_id
+        LEFT JOIN dim_asset a ON a.id = f.asset_id
+        LEFT JOIN dim_driver d ON d.id = f.driver_id
+        LEFT JOIN dim_event_type et ON et.id = f.event_type_id
+        LEFT JOIN dim_alert_name an ON an.id = f.alert_name_id
+        LEFT JOIN dim_class c ON c.id = f.class_id
+        LEFT JOIN dim_asset_type at ON at.id = f.asset_type_id;
+        ALTER VIEW %1$I ALTER COLUMN id SET DEFAULT nextval(%3$L::regclass);
+    $sql$, t, source, pg_get_serial_sequence(fact, 'id'));
+END $$;
+
+-- Same as 0002's, except that while a legacy table exists an UPDATE first
+-- moves the row into the partitioned table and a DELETE covers both.
+CREATE OR REPLACE FUNCTION event_view_write() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+DECLARE
+    fact text := TG_TABLE_NAME || '_fact';
+    legacy regclass := to_regclass(TG_TABLE_NAME || '_fact_legacy');
+    cols text := 'id, "AlertId", "AlertType", "EventDate", "CreationDate", "ModifiedDate", "EventClass", '
+                 '"EventType", "LinkedId_0", "LinkedName_0", "LinkedId_1", "Longitude", "Latitude", '
+                 '"LocationAddress", "AssetId", "AssetTypeId", "InputId", "InputName", "LimitValue", '
+                 '"CurrentValue", "IdleCounter", "BatteryVoltage", "PowerVoltage", "Alert Classification", '
+                 'owner_id, asset_id, driver_id, event_type_id, alert_name_id, class_id, asset_type_id';
+    vals text := '($1).id, ($1)."AlertId", ($1)."AlertType", ($1)."EventDate", ($1)."CreationDate", '
+                 '($1)."ModifiedDate", ($1)."EventClass", ($1)."EventType", ($1)."LinkedId_0", '
+                 '($1)."LinkedName_0", ($1)."LinkedId_1", ($1)."Longitude", ($1)."Latitude", '
+                 '($1)."LocationAddress", ($1)."AssetId", ($1)."AssetTypeId", ($1)."InputId", ($1)."InputName", '
+                 '($1)."LimitValue", ($1)."CurrentValue", ($1)."IdleCounter", ($1)."BatteryVoltage", '
+                 '($1)."PowerVoltage", ($1)."Alert Classification", '
+                 'dim_key(''dim_owner'', ($1)."OwnerName"), dim_key(''dim_asset'', ($1)."AssetName"), '
+                 'dim_key(''dim_driver'', ($1)."LinkedName_1"), dim_key(''dim_event_type'', ($1)."Event Types"), '
+                 'dim_key(''dim_alert_name'', ($1)."AlertName"), dim_key(''dim_class'', ($1)."Class"), '
+                 'dim_key(''dim_asset_type'', ($1)."AssetTypeName")';
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        EXECUTE format('DELETE FROM %I WHERE id = $1', fact) USING OLD.id;
+        IF legacy IS NOT NULL THEN
+            EXECUTE format('DELETE FROM %s WHERE id = $1', legacy) USING OLD.id;
+        END IF;
+        RETURN OLD;
+    ELSIF TG_OP = 'UPDATE' THEN
+        IF legacy IS NOT NULL THEN
+            EXECUTE format('WITH moved AS (DELETE FROM %s WHERE id = $1 RETURNING *) '
+                           'INSERT INTO %I SELECT * FROM moved', legacy, fact) USING OLD.id;
+        END IF;
+        EXECUTE format('UPDATE %I SET (%s) = (SELECT %s) WHERE id = $2', fact, cols, vals) USING NEW, OLD.id;
+    ELSE
+        EXECUTE format('INSERT INTO %I (%s) SELECT %s', fact, cols, vals) USING NEW;
+    END IF;
+    RETURN NEW;
+END $$;
+
+DO $$
+DECLARE
+    t text;
+    fact text;
+    legacy text;
+    idx text;
+    month date;
+BEGIN
+    FOR t IN SELECT unnest(ARRAY['vehicles', 'drivers']) LOOP
+        fact := t || '_fact';
+        legacy := fact || '_legacy';
+
+        EXECUTE format('ALTER TABLE %I RENAME TO %I', fact, legacy);
+        FOR idx IN SELECT indexname FROM pg_indexes WHERE tablename = legacy LOOP
+            EXECUTE format('ALTER INDEX %I RENAME TO %I', idx, idx || '_legacy');
+        END LOOP;
+
+        -- A unique key on a partitioned table must include the partition
+        -- key; ids stay unique through the shared sequence.
+        EXECUTE format($sql$
+            CREATE TABLE %1$I (LIKE %2$I INCLUDING DEFAULTS) PARTITION BY RANGE ("EventDate");
+            ALTER SEQUENCE %3$s OWNED BY %1$I.id;
+            ALTER TABLE %1$I
+                ADD CONSTRAINT %1$s_id_date_key UNIQUE (id, "EventDate"),
+                ADD FOREIGN KEY (owner_id) REFERENCES dim_owner (id),
+                ADD FOREIGN KEY (asset_id) REFERENCES dim_asset (id),
+                ADD FOREIGN KEY (driver_id) REFERENCES dim_driver (id),
+                ADD FOREIGN KEY (event_type_id) REFERENCES dim_event_type (id),
+                ADD FOREIGN KEY (alert_name_id) REFERENCES dim_alert_name (id),
+                ADD FOREIGN KEY (class_id) REFERENCES dim_class (id),
+                ADD FOREIGN KEY (asset_type_id) REFERENCES dim_asset_type (id);
+            CREATE INDEX ix_%4$s_date_owner_type ON %1$I ("EventDate", owner_id, event_type_id);
+            CREATE INDEX ix_%4$s_driver_date ON %1$I (driver_id, "EventDate", id);
+            CREATE INDEX ix_%4$s_asset_date ON %1$I (asset_id, "EventDate", id);
+            CREATE INDEX ix_%4$s_class ON %1$I (class_id);
+            CREATE INDEX "ix_%4$s_ModifiedDate" ON %1$I ("ModifiedDate");
+            CREATE TABLE %5$I PARTITION OF %1$I DEFAULT;
+        $sql$, fact, legacy, pg_get_serial_sequence(legacy, 'id'), t, fact || '_default');
+
+        FOR month IN SELECT generate_series(date_trunc('month', now()), date_trunc('month', now()) + interval '3 months',
+                                            interval '1 month')::date LOOP
+            PERFORM create_event_partition(fact, month);
+        END LOOP;
+
+        PERFORM define_event_view(t, true);
+    END LOOP;
+END $$;
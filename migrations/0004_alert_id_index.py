@@ -0,0 +1,56 @@
+"""Index AlertId on the event fact tables without blocking ingest.
+
+ingest.py skips every staged alert whose AlertId is already loaded, one
+probe per staged row. A plain CREATE INDEX on the parent would lock out
+writes for the whole build, so instead:
+
+    1. the index is declared on the partitioned parent alone (ON ONLY:
+       instant, and not valid yet),
+    2. each partition gets its own, built CONCURRENTLY, which is then
+       attached to the parent; with every partition attached the parent
+       index turns valid and partitions created later inherit it,
+    3. the legacy table, while it exists, gets its own, also CONCURRENTLY.
+
+Every step is skipped when already done, so an interrupted run can simply
+be repeated (a build interrupted half way leaves an invalid index, which
+is dropped and rebuilt). This replaces 0004_alert_id_index.sql; on
+databases that ran that file it finds everything in place.
+"""
+
+PARTITIONS = '''
+    SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = to_regclass(%(fact)s) ORDER BY c.relname
+'''
+
+# Is there an index on the partition already attached to the parent index?
+ATTACHED = '''
+    SELECT 1 FROM pg_inherits i JOIN pg_index x ON x.indexrelid = i.inhrelid
+    WHERE i.inhparent = to_regclass(%(parent)s) AND x.indrelid = to_regclass(%(part)s)
+'''
+
+
+def _q(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _build_concurrently(conn, index, table):
+    valid = conn.exec_driver_sql('SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%(index)s)',
+                                 {'index': _q(index)}).scalar()
+    if valid is False:
+        conn.exec_driver_sql(f'DROP INDEX CONCURRENTLY {_q(index)}')
+    conn.exec_driver_sql(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {_q(index)} ON {_q(table)} ("AlertId")')
+
+
+def upgrade(conn):
+    for t in ('vehicles', 'drivers'):
+        fact, parent = f'{t}_fact', f'ix_{t}_AlertId'
+        conn.exec_driver_sql(f'CREATE INDEX IF NOT EXISTS {_q(parent)} ON ONLY {_q(fact)} ("AlertId")')
+        for (part,) in conn.exec_driver_sql(PARTITIONS, {'fact': fact}).all():
+            if conn.exec_driver_sql(ATTACHED, {'parent': _q(parent), 'part': _q(part)}).first():
+                continue
+            index = f'ix_{part}_AlertId'
+            _build_concurrently(conn, index, part)
+            conn.exec_driver_sql(f'ALTER INDEX {_q(parent)} ATTACH PARTITION {_q(index)}')
+        legacy = f'{fact}_legacy'
+        if conn.exec_driver_sql('SELECT to_regclass(%(t)s)', {'t': legacy}).scalar() is not None:
+            _build_concurrently(conn, f'ix_{t}_AlertId_legacy', legacy)
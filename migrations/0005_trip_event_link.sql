@@ -0,0 +1,40 @@
+-- Typed trip periods and a precomputed vehicle event -> trip link table.
+--
+-- trips_data kept start / "end" as text, so every join to the events had
+-- to cast them and could not use an index. They become timestamps, and
+-- `period` (a generated tsrange, both bounds inclusive) is indexed with
+-- the asset under GiST, so "trips of this asset covering this instant"
+-- is one index probe.
+--
+-- trip_event_link holds one row per (vehicle event, trip) pair whose
+-- AssetName matches the trip's asset and whose EventDate lies in its
+-- period. It starts empty; `python trip_links.py refresh` fills it and
+-- then keeps it current (run it from cron like rollup.py refresh).
+-- EventDate and the asset are copied in so the trip_events listing can
+-- be read in index order and filtered by asset without touching the
+-- events first.
+
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+ALTER TABLE trips_data
+    ALTER COLUMN start TYPE timestamp USING NULLIF(btrim(start::text), '')::timestamp,
+    ALTER COLUMN "end" TYPE timestamp USING NULLIF(btrim("end"::text), '')::timestamp;
+
+-- NULL for trips with a missing or reversed period (tsrange would raise)
+ALTER TABLE trips_data
+    ADD COLUMN period tsrange GENERATED ALWAYS AS (
+        CASE WHEN start <= "end" THEN tsrange(start, "end", '[]') END
+    ) STORED;
+
+CREATE INDEX ix_trips_data_asset_period ON trips_data USING gist (asset, period);
+
+CREATE TABLE trip_event_link (
+    event_id integer NOT NULL,
+    trip_id integer NOT NULL,
+    "EventDate" timestamp NOT NULL,
+    asset varchar,
+    PRIMARY KEY (event_id, trip_id)
+);
+CREATE INDEX ix_trip_event_link_date ON trip_event_link ("EventDate", event_id);
+CREATE INDEX ix_trip_event_link_asset_date ON trip_event_link (asset, "EventDate", event_id);
+CREATE INDEX ix_trip_event_link_trip ON trip_event_link (trip_id);
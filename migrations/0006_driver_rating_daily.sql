@@ -0,0 +1,83 @@
+-- Daily per-asset totals and score of driver_rating, kept incrementally.
+--
+-- driver_rating_daily holds one row per (assetName, day): the summed
+-- metrics and score = distance / cost (0 when cost is 0). Statement
+-- triggers record every day whose driver_rating rows are inserted,
+-- updated or deleted in driver_rating_dirty_days, and
+--
+--     python rating_summary.py refresh
+--
+-- (also called by run.py) recomputes only those days. Every existing day
+-- starts dirty, so the first refresh builds the whole summary.
+--
+-- The triggers upsert (DO UPDATE, not DO NOTHING) so that the writer holds
+-- a row lock on each of its days' queue entries until it commits. refresh
+-- claims with SKIP LOCKED, so it cannot take a day, recompute it without
+-- the writer's rows (not yet visible) and delete the entry that was the
+-- only record of them.
+--
+-- A loader that drops and recreates driver_rating (pandas to_sql with
+-- if_exists='replace') drops the triggers with it; use append, or run
+-- `rating_summary.py rebuild` after such a load.
+
+-- Day ranges need a real timestamp; older loads stored dateStart as text.
+DO $$
+BEGIN
+    IF (SELECT data_type FROM information_schema.columns
+        WHERE table_name = 'driver_rating' AND column_name = 'dateStart') IN ('text', 'character varying') THEN
+        ALTER TABLE driver_rating
+            ALTER COLUMN "dateStart" TYPE timestamp USING NULLIF(btrim("dateStart"), '')::timestamp;
+    END IF;
+END $$;
+
+CREATE INDEX "ix_driver_rating_dateStart" ON driver_rating ("dateStart");
+
+CREATE TABLE driver_rating_daily (
+    "assetName" varchar NOT NULL,
+    date date NOT NULL,
+    distance double precision NOT NULL,
+    cost double precision NOT NULL,
+    "100kmh" double precision NOT NULL,
+    excessivei double precision NOT NULL,
+    speedingtr double precision NOT NULL,
+    brake double precision NOT NULL,
+    accel double precision NOT NULL,
+    corner double precision NOT NULL,
+    gforce double precision NOT NULL,
+    score double precision NOT NULL,
+    PRIMARY KEY ("assetName", date)
+);
+CREATE INDEX ix_driver_rating_daily_date ON driver_rating_daily (date);
+
+CREATE TABLE driver_rating_dirty_days (day date PRIMARY KEY);
+
+CREATE FUNCTION driver_rating_mark_days() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO driver_rating_dirty_days (day)
+            SELECT DISTINCT "dateStart"::date FROM new_rows WHERE "dateStart" IS NOT NULL
+            ON CONFLICT (day) DO UPDATE SET day = EXCLUDED.day;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO driver_rating_dirty_days (day)
+            SELECT DISTINCT "dateStart"::date FROM old_rows WHERE "dateStart" IS NOT NULL
+            ON CONFLICT (day) DO UPDATE SET day = EXCLUDED.day;
+    END IF;
+    RETURN NULL;
+END $$;
+
+-- Transition tables allow one event per trigger
+CREATE TRIGGER driver_rating_days_insert AFTER INSERT ON driver_rating
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION driver_rating_mark_days();
+CREATE TRIGGER driver_rating_days_update AFTER UPDATE ON driver_rating
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION driver_rating_mark_days();
+CREATE TRIGGER driver_rating_days_delete AFTER DELETE ON driver_rating
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION driver_rating_mark_days();
+
+INSERT INTO driver_rating_dirty_days (day)
+    SELECT DISTINCT "dateStart"::date FROM driver_rating WHERE "dateStart" IS NOT NULL;
@@ -0,0 +1,53 @@
+-- Queue the rollup hour buckets that edits and deletes leave stale.
+--
+-- rollup.py refresh finds new rows by id, but an UPDATE or DELETE of an
+-- existing row changes the count of the bucket the row was in (and, if
+-- EventDate moved, of the one it is in now) without a new id, and the
+-- vendor ModifiedDate cannot be trusted to move forward. Statement
+-- triggers on vehicles_fact / drivers_fact record both buckets in
+-- rollup_dirty_buckets, and refresh claims and rebuilds them.
+--
+-- The upsert takes a row lock on the queue entry that is held until the
+-- writer commits; refresh claims with SKIP LOCKED, so it never rebuilds a
+-- bucket from before an edit still in flight and then forgets it. Rows
+-- still in *_fact_legacy (see 0003) are not covered: deleting one there
+-- needs `rollup.py backfill` over its dates.
+
+CREATE TABLE rollup_dirty_buckets (
+    table_name varchar NOT NULL,
+    bucket timestamp NOT NULL,
+    PRIMARY KEY (table_name, bucket)
+);
+
+CREATE FUNCTION rollup_mark_buckets() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        INSERT INTO rollup_dirty_buckets (table_name, bucket)
+            SELECT DISTINCT TG_ARGV[0], date_trunc('hour', "EventDate")
+            FROM (SELECT "EventDate" FROM old_rows UNION ALL SELECT "EventDate" FROM new_rows) r
+            WHERE "EventDate" IS NOT NULL
+            ON CONFLICT (table_name, bucket) DO UPDATE SET bucket = EXCLUDED.bucket;
+    ELSE
+        INSERT INTO rollup_dirty_buckets (table_name, bucket)
+            SELECT DISTINCT TG_ARGV[0], date_trunc('hour', "EventDate") FROM old_rows
+            WHERE "EventDate" IS NOT NULL
+            ON CONFLICT (table_name, bucket) DO UPDATE SET bucket = EXCLUDED.bucket;
+    END IF;
+    RETURN NULL;
+END $$;
+
+-- Inserts are found by id; transition tables allow one event per trigger
+CREATE TRIGGER vehicles_rollup_update AFTER UPDATE ON vehicles_fact
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_mark_buckets('vehicles');
+CREATE TRIGGER vehicles_rollup_delete AFTER DELETE ON vehicles_fact
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_mark_buckets('vehicles');
+CREATE TRIGGER drivers_rollup_update AFTER UPDATE ON drivers_fact
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_mark_buckets('drivers');
+CREATE TRIGGER drivers_rollup_delete AFTER DELETE ON drivers_fact
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_mark_buckets('drivers');
@@ -1,13 +1,97 @@
+from collections import namedtuple
+from functools import lru_cache
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, select
+from sqlalchemy.orm import Bundle, declared_attr
 
 db = SQLAlchemy()
 
-# Common base class with shared columns
+
+# Dictionary-encoded names (migrations/0002): one row per distinct,
+# canonicalized name. Keys are never reused or renamed.
+class BaseDimension(db.Model):
+    __abstract__ = True
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    name = db.Column(db.String, nullable=False, unique=True)
+
+    @classmethod
+    def key_of(cls, name):
+        """Scalar subquery for the key of name. NULL for an unknown name,
+        so `key_column == Dim.key_of(name)` matches no rows."""
+        return select(cls.id).where(cls.name == canonical_name(name)).scalar_subquery()
+
+    @classmethod
+    def keys_of(cls, names):
+        """Subquery of the keys of names, for key_column.in_()."""
+        return select(cls.id).where(cls.name.in_([canonical_name(n) for n in names]))
+
+    @classmethod
+    def name_of(cls, key_column):
+        """Correlated scalar subquery for the name of key_column's key."""
+        return select(cls.name).where(cls.id == key_column).scalar_subquery()
+
+    @classmethod
+    def keys_like(cls, fragment):
+        """Subquery of the keys of names containing fragment, case-insensitively."""
+        return select(cls.id).where(cls.name.ilike(f"%{fragment}%"))
+
+
+class DimOwner(BaseDimension):
+    __tablename__ = 'dim_owner'
+
+
+class DimAsset(BaseDimension):
+    __tablename__ = 'dim_asset'
+
+
+class DimDriver(BaseDimension):
+    __tablename__ = 'dim_driver'
+
+
+class DimEventType(BaseDimension):
+    __tablename__ = 'dim_event_type'
+
+
+class DimAlertName(BaseDimension):
+    __tablename__ = 'dim_alert_name'
+
+
+class DimClass(BaseDimension):
+    __tablename__ = 'dim_class'
+
+
+class DimAssetType(BaseDimension):
+    __tablename__ = 'dim_asset_type'
+
+
+def canonical_name(value):
+    """Python twin of migrations/0002's canonical_name(): trimmed, inner
+    whitespace collapsed, blank -> None."""
+    if value is None:
+        return None
+    return ' '.join(value.split()) or None
+
+
+# Common base class with shared columns.
+# On PostgreSQL, migrations/0002 turns `vehicles` and `drivers` into views
+# over dictionary-encoded *_fact tables: each name column is stored as an
+# integer key into its dim_* table (the *_id columns below) and joined back
+# by the view, and writes are canonicalized by INSTEAD OF triggers;
+# migrations/0003 partitions the fact tables by month of EventDate (see
+# partitions.py). Queries filter and group on the keys and only read the
+# names of the rows they return.
+#
+# db.create_all() builds a plain table with both the names and the keys
+# (for tests and throwaway databases); _fill_keys keeps the keys in step
+# on ORM writes. Production databases get the fact + view layout from the
+# migrations.
 class BaseEvent(db.Model):
     __abstract__ = True
 
-    OwnerName = db.Column(db.String, index=True)
-    AlertId = db.Column(db.String)
+    OwnerName = db.Column(db.String)
+    AlertId = db.Column(db.String, index=True)  # ingest.py de-duplicates on it
     AlertName = db.Column(db.String)
     AlertType = db.Column(db.String)
     EventDate = db.Column(db.DateTime, index=True)
@@ -18,24 +102,87 @@ class BaseEvent(db.Model):
     LinkedId_0 = db.Column(db.String)
     LinkedName_0 = db.Column(db.String)
     LinkedId_1 = db.Column(db.String, index=True)
-    LinkedName_1 = db.Column(db.String, index=True)
+    LinkedName_1 = db.Column(db.String)
     Longitude = db.Column(db.Float)
     Latitude = db.Column(db.Float)
     LocationAddress = db.Column(db.String)
     AssetId = db.Column(db.String, index=True)
-    AssetName = db.Column(db.String, index=True)
+    AssetName = db.Column(db.String)
     AssetTypeId = db.Column(db.String)
     AssetTypeName = db.Column(db.String)
-    InputId = db.Column(db.String)
-    InputName = db.Column(db.String)
-    LimitValue = db.Column(db.Float)
-    CurrentValue = db.Column(db.Float)
-    IdleCounter = db.Column(db.Float)
+    # Input readings: only the driver events page shows them, so entity
+    # loads skip them and fetch the group in one query on first access.
+    InputId = db.mapped_column(db.String, deferred=True, deferred_group='readings')
+    InputName = db.mapped_column(db.String, deferred=True, deferred_group='readings')
+    LimitValue = db.mapped_column(db.Float, deferred=True, deferred_group='readings')
+    CurrentValue = db.mapped_column(db.Float, deferred=True, deferred_group='readings')
+    IdleCounter = db.mapped_column(db.Float, deferred=True, deferred_group='readings')
     BatteryVoltage = db.Column(db.Float)
     PowerVoltage = db.Column(db.Float)
-    EventTypes = db.Column("Event Types", db.String, index=True)
+    EventTypes = db.Column("Event Types", db.String)
     AlertClassification = db.Column("Alert Classification", db.String)
-    Class = db.Column(db.String, index=True)
+    Class = db.Column(db.String)
+
+    # Dimension keys of the name columns above (see ENCODED)
+    owner_id = db.Column(db.Integer, db.ForeignKey('dim_owner.id'))
+    asset_id = db.Column(db.Integer, db.ForeignKey('dim_asset.id'))
+    driver_id = db.Column(db.Integer, db.ForeignKey('dim_driver.id'))
+    event_type_id = db.Column(db.Integer, db.ForeignKey('dim_event_type.id'))
+    alert_name_id = db.Column(db.Integer, db.ForeignKey('dim_alert_name.id'))
+    class_id = db.Column(db.Integer, db.ForeignKey('dim_class.id'))
+    asset_type_id = db.Column(db.Integer, db.ForeignKey('dim_asset_type.id'))
+
+    # Composite indexes for the predicate shapes compiled by filters.py,
+    # the same set migrations/0002 builds on the fact tables. Trailing id
+    # serves the keyset page order.
+    @declared_attr
+    def __table_args__(cls):
+        name = cls.__tablename__
+        return (
+            db.Index(f'ix_{name}_date_owner_type', 'EventDate', 'owner_id', 'event_type_id'),
+            db.Index(f'ix_{name}_driver_date', 'driver_id', 'EventDate', 'id'),
+            db.Index(f'ix_{name}_asset_date', 'asset_id', 'EventDate', 'id'),
+            db.Index(f'ix_{name}_class', 'class_id'),
+        )
+
+    def as_dict(self, columns):
+        """JSON-ready dict of the given attribute names (datetimes as ISO strings)."""
+        out = {}
+        for col in columns:
+            value = getattr(self, col)
+            out[col] = value.isoformat() if hasattr(value, 'isoformat') else value
+        return out
+
+    @classmethod
+    def rows(cls, columns):
+        """Projection of `columns` for list views, loaded as namedtuples.
+
+        query.with_entities(Model.rows([...])) returns one tuple per row,
+        with attribute access and as_dict(), and skips the identity map and
+        per-instance state of full entities.
+        """
+        return EventRows(cls, columns)
+
+
+@lru_cache(maxsize=None)
+def _row_type(name, columns):
+    base = namedtuple(name, columns)
+    return type(name, (base,), {'__slots__': (), 'as_dict': BaseEvent.as_dict})
+
+
+class EventRows(Bundle):
+    """Bundle building a namedtuple straight from each result row."""
+
+    def __init__(self, model, columns):
+        self.row_type = _row_type(f'{model.__name__}Row', tuple(columns))
+        super().__init__(self.row_type.__name__, *[getattr(model, c) for c in columns], single_entity=True)
+
+    def create_row_processor(self, query, procs, labels):
+        make = self.row_type._make
+
+        def proc(row):
+            return make([p(row) for p in procs])
+        return proc
 
 
 class DriverEvent(BaseEvent):
@@ -46,3 +193,87 @@ class DriverEvent(BaseEvent):
 class VehicleEvent(BaseEvent):
     __tablename__ = 'vehicles'
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+
+
+# (name attribute, key attribute, dimension) of every encoded column
+ENCODED = [
+    ('OwnerName', 'owner_id', DimOwner),
+    ('AssetName', 'asset_id', DimAsset),
+    ('LinkedName_1', 'driver_id', DimDriver),
+    ('EventTypes', 'event_type_id', DimEventType),
+    ('AlertName', 'alert_name_id', DimAlertName),
+    ('Class', 'class_id', DimClass),
+    ('AssetTypeName', 'asset_type_id', DimAssetType),
+]
+
+
+@event.listens_for(BaseEvent, 'before_insert', propagate=True)
+@event.listens_for(BaseEvent, 'before_update', propagate=True)
+def _fill_keys(mapper, connection, target):
+    """Canonicalize the names of an event written through the ORM and set
+    their keys, adding new names to the dimensions. (On the migrated views
+    the INSTEAD OF trigger does the same in the database.)"""
+    for name_attr, key_attr, dim in ENCODED:
+        name = canonical_name(getattr(target, name_attr))
+        key = None
+        if name is not None:
+            table = dim.__table__
+            key = connection.execute(select(table.c.id).where(table.c.name == name)).scalar()
+            if key is None:
+                key = connection.execute(table.insert().values(name=name)).inserted_primary_key[0]
+        setattr(target, name_attr, name)
+        setattr(target, key_attr, key)
+
+
+# Hourly rollup cube: one row per (hour bucket, owner, asset, driver,
+# event type, class, alert group), keyed on the dimension keys. Maintained
+# by rollup.py. Column names mirror BaseEvent so the route filters work
+# against either table.
+class BaseHourlyRollup(db.Model):
+    __abstract__ = True
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    EventDate = db.Column(db.DateTime, nullable=False, index=True)  # start of the hour bucket
+    owner_id = db.Column(db.Integer, index=True)
+    asset_id = db.Column(db.Integer)
+    driver_id = db.Column(db.Integer)
+    event_type_id = db.Column(db.Integer)
+    class_id = db.Column(db.Integer)
+    AlertGroup = db.Column(db.String)
+    event_count = db.Column(db.Integer, nullable=False)
+
+
+class DriverEventHourly(BaseHourlyRollup):
+    __tablename__ = 'drivers_hourly'
+
+
+class VehicleEventHourly(BaseHourlyRollup):
+    __tablename__ = 'vehicles_hourly'
+
+
+class RollupWatermark(db.Model):
+    __tablename__ = 'rollup_watermarks'
+    table_name = db.Column(db.String, primary_key=True)
+    last_id = db.Column(db.Integer, nullable=False, default=0)
+    last_modified = db.Column(db.DateTime)
+    refreshed_at = db.Column(db.DateTime)
+
+
+# Daily per-driver scores, one set per scoring.CONFIG_VERSION so history
+# survives a change of EVENT_SCORING. Maintained by score_snapshots.py.
+class DriverScoreDaily(db.Model):
+    __tablename__ = 'driver_score_daily'
+    __table_args__ = (
+        db.UniqueConstraint('config_version', 'driver', 'day'),  # trend lookups
+        db.Index('ix_driver_score_daily_version_day', 'config_version', 'day'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    config_version = db.Column(db.String, nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    driver = db.Column(db.String, nullable=False)
+    events = db.Column(db.Integer, nullable=False)
+    penalty = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Integer, nullable=False)
+    counts = db.Column(db.JSON, nullable=False)  # {event type: count}
+    computed_at = db.Column(db.DateTime)
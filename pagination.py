@@ -0,0 +1,102 @@
+"""Keyset (cursor) pagination for the event listings.
+
+Pages are ordered by (EventDate DESC, id DESC), NULL dates first (the
+PostgreSQL default for DESC, so a plain btree index still serves the
+order). The next page starts strictly after the last row's key, so the
+cost of a page does not grow with its depth and memory per request is
+bounded by the page size. Cursors are opaque url-safe base64 tokens.
+"""
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime
+
+from flask import abort, current_app, request
+from sqlalchemy import and_, or_, tuple_
+from models import db
+
+
+Page = namedtuple('Page', ['rows', 'next_cursor', 'page_size', 'total', 'total_is_estimate'])
+
+
+def encode_cursor(event_date, row_id):
+    payload = json.dumps([event_date.isoformat() if event_date else None, row_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """(event_date, id) from a cursor token. Raises ValueError if malformed."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        event_date, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return (datetime.fromisoformat(event_date) if event_date else None), int(row_id)
+    except (TypeError, ValueError, json.JSONDecodeError) as exc:
+        raise ValueError(f'invalid cursor: {token!r}') from exc
+
+
+def page_size_arg(args):
+    """page_size query argument, clamped to [1, EVENTS_MAX_PAGE_SIZE]."""
+    default = current_app.config.get('EVENTS_PAGE_SIZE', 100)
+    size = args.get('page_size', default, type=int) or default
+    return max(1, min(size, current_app.config.get('EVENTS_MAX_PAGE_SIZE', 1000)))
+
+
+def keyset_page(query, model, cursor=None, page_size=100):
+    """One page of query's rows and the cursor for the next (None at the end)."""
+    if cursor:
+        event_date, row_id = decode_cursor(cursor)
+        if event_date is None:
+            query = query.filter(or_(
+                and_(model.EventDate.is_(None), model.id < row_id),
+                model.EventDate.isnot(None),
+            ))
+        else:
+            query = query.filter(tuple_(model.EventDate, model.id) < tuple_(event_date, row_id))
+    rows = (
+        query.order_by(model.EventDate.desc().nulls_first(), model.id.desc())
+        .limit(page_size + 1)
+        .all()
+    )
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, encode_cursor(rows[-1].EventDate, rows[-1].id)
+
+
+def total_count(query, exact=False):
+    """(count, is_estimate) for query's rows.
+
+    The estimate is the planner's row count from EXPLAIN, which costs no
+    scan. Only PostgreSQL has one; other backends always count exactly.
+    """
+    query = query.order_by(None)
+    if not exact and db.engine.dialect.name == 'postgresql':
+        compiled = query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'render_postcompile': True})
+        plan = db.session.connection().exec_driver_sql(
+            'EXPLAIN (FORMAT JSON) ' + str(compiled), compiled.params
+        ).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows']), True
+    return query.count(), False
+
+
+def page_from_request(query, model):
+    """Page of query selected by the cursor, page_size and count arguments.
+
+    The total is only computed for the first page, or when `count` is
+    given: count=exact forces an exact COUNT(*), anything else accepts the
+    planner estimate. A malformed cursor is a 400.
+    """
+    page_size = page_size_arg(request.args)
+    cursor = request.args.get('cursor')
+    try:
+        rows, next_cursor = keyset_page(query, model, cursor, page_size)
+    except ValueError:
+        abort(400, description='Invalid cursor')
+
+    total = is_estimate = None
+    count = request.args.get('count')
+    if not cursor or count:
+        total, is_estimate = total_count(query, exact=count == 'exact')
+    return Page(rows, next_cursor, page_size, total, is_estimate)
@@ -0,0 +1,177 @@
+"""Monthly partitions of the vehicles / drivers fact tables (PostgreSQL).
+
+migrations/0003 turns vehicles_fact and drivers_fact into tables
+partitioned by month on EventDate. This script keeps them that way:
+
+    ensure   create partitions up to PARTITION_MONTHS_AHEAD months ahead
+             (run daily from cron; idempotent)
+    migrate  move the pre-partitioning rows out of *_fact_legacy, one
+             month per transaction, then drop the legacy table
+    retain   detach partitions older than EVENT_RETENTION_MONTHS and move
+             them to the EVENT_ARCHIVE_SCHEMA schema (or drop them)
+    status   list partitions with their estimated row counts
+
+Usage:
+    python partitions.py ensure [--months-ahead 3]
+    python partitions.py migrate [--table vehicles|drivers]
+    python partitions.py retain [--keep-months 24] [--drop]
+    python partitions.py status
+"""
+import argparse
+import re
+from datetime import date
+
+from flask import current_app
+from sqlalchemy import text
+from models import db
+
+TABLES = ['vehicles', 'drivers']
+
+PARTITION_NAME = re.compile(r'_y(\d{4})m(\d{2})$')
+
+
+def _add_months(month, n):
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _exists(name):
+    return db.session.execute(text('SELECT to_regclass(:name)'), {'name': name}).scalar() is not None
+
+
+def partitions(fact):
+    """[(name, first day of month or None for the default partition, estimated rows)]"""
+    rows = db.session.execute(text(
+        'SELECT c.relname, c.reltuples FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+        'WHERE i.inhparent = CAST(:fact AS regclass) ORDER BY c.relname'
+    ), {'fact': fact})
+    out = []
+    for name, estimate in rows:
+        match = PARTITION_NAME.search(name)
+        month = date(int(match.group(1)), int(match.group(2)), 1) if match else None
+        out.append((name, month, max(int(estimate), 0)))
+    return out
+
+
+# --------------------------------------------------------------------
+# MAINTENANCE
+# --------------------------------------------------------------------
+def ensure(months_ahead):
+    """Create any missing partition from this month to months_ahead ahead."""
+    created = []
+    this_month = date.today().replace(day=1)
+    for table in TABLES:
+        for n in range(months_ahead + 1):
+            name = db.session.execute(text('SELECT create_event_partition(:fact, :month)'),
+                                      {'fact': f'{table}_fact', 'month': _add_months(this_month, n)}).scalar()
+            db.session.commit()
+            if name:
+                created.append(name)
+    return created
+
+
+def migrate_legacy(table):
+    """Move table's legacy rows into the partitioned table, oldest month first.
+
+    Each month moves in a single DELETE ... RETURNING / INSERT statement, so
+    the view (which reads both tables until the end) never shows a row
+    twice or loses one. Returns the number of rows moved.
+    """
+    fact, legacy = f'{table}_fact', f'{table}_fact_legacy'
+    if not _exists(legacy):
+        return 0
+    move = f'WITH moved AS (DELETE FROM {legacy} WHERE {{where}} RETURNING *) INSERT INTO {fact} SELECT * FROM moved'
+
+    moved = 0
+    lo, hi = db.session.execute(text(f'SELECT min("EventDate"), max("EventDate") FROM {legacy}')).one()
+    if lo is not None:
+        month = lo.date().replace(day=1)
+        while month <= hi.date():
+            end = _add_months(month, 1)
+            db.session.execute(text('SELECT create_event_partition(:fact, :month)'), {'fact': fact, 'month': month})
+            count = db.session.execute(text(move.format(where='"EventDate" >= :lo AND "EventDate" < :hi')),
+                                       {'lo': month, 'hi': end}).rowcount
+            db.session.commit()
+            print(f"{table}: {month:%Y-%m} {count} rows")
+            moved += count
+            month = end
+
+    # Rows without an EventDate go to the default partition; then swap the
+    # view over to the partitioned table alone and drop the legacy table.
+    moved += db.session.execute(text(move.format(where='"EventDate" IS NULL'))).rowcount
+    db.session.execute(text('SELECT define_event_view(:t, false)'), {'t': table})
+    db.session.execute(text(f'DROP TABLE {legacy}'))
+    db.session.commit()
+    return moved
+
+
+def retain(keep_months, archive_schema=None):
+    """Detach every monthly partition that ends before the retention window.
+
+    Detached partitions are moved to archive_schema, or dropped when it is
+    None. DETACH briefly locks the parent; lock_timeout makes the call give
+    up (and the next run retry) instead of queueing behind long queries.
+    Rows still in a legacy table are not touched until migrate has run.
+    """
+    cutoff = _add_months(date.today().replace(day=1), -keep_months)
+    removed = []
+    if archive_schema:
+        db.session.execute(text(f'CREATE SCHEMA IF NOT EXISTS {archive_schema}'))
+        db.session.commit()
+    for table in TABLES:
+        fact = f'{table}_fact'
+        for name, month, _ in partitions(fact):
+            if month is None or _add_months(month, 1) > cutoff:
+                continue
+            db.session.execute(text("SET LOCAL lock_timeout = '5s'"))
+            db.session.execute(text(f'ALTER TABLE {fact} DETACH PARTITION {name}'))
+            if archive_schema:
+                db.session.execute(text(f'ALTER TABLE {name} SET SCHEMA {archive_schema}'))
+            else:
+                db.session.execute(text(f'DROP TABLE {name}'))
+            db.session.commit()
+            removed.append(name)
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the monthly event partitions.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_ensure = sub.add_parser('ensure')
+    p_ensure.add_argument('--months-ahead', type=int)
+    p_migrate = sub.add_parser('migrate')
+    p_migrate.add_argument('--table', choices=TABLES)
+    p_retain = sub.add_parser('retain')
+    p_retain.add_argument('--keep-months', type=int)
+    p_retain.add_argument('--drop', action='store_true', help='drop old partitions instead of archiving them')
+    sub.add_parser('status')
+    args = parser.parse_args()
+
+    from app import app
+    with app.app_context():
+        config = current_app.config
+        if args.command == 'ensure':
+            months = args.months_ahead if args.months_ahead is not None else config['PARTITION_MONTHS_AHEAD']
+            created = ensure(months)
+            print(f"{len(created)} partitions created" + (f": {', '.join(created)}" if created else ""))
+        elif args.command == 'migrate':
+            for table in [args.table] if args.table else TABLES:
+                print(f"{table}: {migrate_legacy(table)} rows moved")
+        elif args.command == 'retain':
+            keep = args.keep_months if args.keep_months is not None else config['EVENT_RETENTION_MONTHS']
+            if not keep:
+                raise SystemExit("No retention window: pass --keep-months or set EVENT_RETENTION_MONTHS")
+            removed = retain(keep, None if args.drop else config['EVENT_ARCHIVE_SCHEMA'])
+            print(f"{len(removed)} partitions {'dropped' if args.drop else 'archived'}"
+                  + (f": {', '.join(removed)}" if removed else ""))
+        elif args.command == 'status':
+            for table in TABLES:
+                legacy = f'{table}_fact_legacy'
+                if _exists(legacy):
+                    print(f"{legacy}: awaiting `partitions.py migrate`")
+                for name, month, estimate in partitions(f'{table}_fact'):
+                    print(f"{name:32s} {month or 'default'!s:10s} ~{estimate} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""Compact chart / table payloads and fast serialization for the JSON endpoints.
+
+table() turns a list of same-shaped dicts (chart points, table rows)
+into one columnar object:
+
+    {"__table__": {"n": 3,
+                   "columns": {"y": [5, 3, 1], "event_type": [0, 1, 0]},
+                   "lookups": {"event_type": ["Overspeeding", "Harsh Braking"]},
+                   "constants": {"owner": "Unitrans Kathu"},
+                   "urls": {"url": "/vehicle/events/{asset_name}?event_type={event_type}"}}}
+
+so keys are written once, repeated strings once per distinct value and
+per-point URLs not at all: they come from a template made with one
+url_for call (url_template / field) and are filled in by the browser.
+static/js/panels.js unpacks every "__table__" back into the list of dicts
+before a renderer sees it; unpack() here does the same in Python.
+
+JSONProvider makes jsonify() use orjson when it is installed; respond()
+also answers "Accept: application/msgpack" with MessagePack when msgpack
+is installed.
+"""
+import json
+import re
+from decimal import Decimal
+from urllib.parse import quote, quote_plus
+
+from flask import Response, current_app, jsonify, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional: JSON only
+    msgpack = None
+
+MSGPACK_MIMETYPE = 'application/msgpack'
+_FIELD = '\x1f{}\x1f'
+_FIELD_PATTERN = re.compile(r'%1F(\w+)%1F')
+_TEMPLATE_PATTERN = re.compile(r'\{(\w+)\}')
+
+
+# --------------------------------------------------------------------
+# COLUMNAR TABLES
+# --------------------------------------------------------------------
+def field(name):
+    """Placeholder for a per-row value in a url_for() call; see url_template()."""
+    return _FIELD.format(name)
+
+
+def url_template(url):
+    """url_for() output with its field() placeholders turned into {name} slots."""
+    return _FIELD_PATTERN.sub(r'{\1}', url)
+
+
+def table(rows, urls=None):
+    """Columnar form of a list of dicts that share their keys.
+
+    urls: {key: url_template(...)} added to every row on unpacking, with
+    each {name} slot filled from the row's own value of name.
+    """
+    columns, lookups, constants = {}, {}, {}
+    for key in (rows[0] if rows else ()):
+        values = [row[key] for row in rows]
+        first = values[0]
+        if all(v == first for v in values):
+            constants[key] = first
+            continue
+        if all(isinstance(v, str) or v is None for v in values):
+            distinct = list(dict.fromkeys(values))
+            if len(distinct) * 2 <= len(values):
+                index = {v: i for i, v in enumerate(distinct)}
+                lookups[key] = distinct
+                values = [index[v] for v in values]
+        columns[key] = values
+    packed = {'n': len(rows), 'columns': columns}
+    if lookups:
+        packed['lookups'] = lookups
+    if constants:
+        packed['constants'] = constants
+    if urls:
+        packed['urls'] = urls
+    return {'__table__': packed}
+
+
+def _fill(template, row):
+    """template filled from row. As with url_for, a None value drops its
+    query argument; a None path segment makes the whole URL None."""
+    def fill(part, quote=quote):
+        return _TEMPLATE_PATTERN.sub(lambda m: quote(str(row[m.group(1)]), safe=''), part)
+
+    def has_none(part):
+        return any(row[name] is None for name in _TEMPLATE_PATTERN.findall(part))
+
+    path, _, query = template.partition('?')
+    if has_none(path):
+        return None
+    args = [fill(arg, quote_plus) for arg in query.split('&') if arg and not has_none(arg)]
+    return fill(path) + ('?' + '&'.join(args) if args else '')
+
+
+def unpack(value):
+    """value with every table() expanded back into a list of dicts."""
+    if isinstance(value, list):
+        return [unpack(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    if '__table__' not in value:
+        return {k: unpack(v) for k, v in value.items()}
+    packed = value['__table__']
+    lookups = packed.get('lookups', {})
+    rows = []
+    for i in range(packed['n']):
+        row = dict(packed.get('constants', {}))
+        for key, values in packed['columns'].items():
+            row[key] = lookups[key][values[i]] if key in lookups else values[i]
+        row = {k: unpack(v) for k, v in row.items()}
+        for key, template in packed.get('urls', {}).items():
+            row[key] = _fill(template, row)
+        rows.append(row)
+    return rows
+
+
+# --------------------------------------------------------------------
+# SERIALIZATION
+# --------------------------------------------------------------------
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, tuple):  # namedtuples
+        return list(obj)
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    raise TypeError(f'{type(obj).__name__} is not JSON serializable')
+
+
+class JSONProvider(DefaultJSONProvider):
+    """jsonify() through orjson, when installed. Dates come out as ISO 8601."""
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        return current_app.response_class(body, mimetype=self.mimetype)
+
+
+def dumps(obj):
+    """Compact JSON bytes (orjson when installed)."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, separators=(',', ':')).encode()
+
+
+def respond(obj):
+    """jsonify(obj), or MessagePack if the client asks for it and msgpack is installed."""
+    if msgpack is not None and request.accept_mimetypes.best_match(
+            ['application/json', MSGPACK_MIMETYPE]) == MSGPACK_MIMETYPE:
+        response = Response(msgpack.packb(obj, default=_default), mimetype=MSGPACK_MIMETYPE)
+    else:
+        response = jsonify(obj)
+    response.vary.add('Accept')
+    return response
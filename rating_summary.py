@@ -0,0 +1,106 @@
+"""Daily per-asset driver_rating totals and score (PostgreSQL).
+
+migrations/0006 creates driver_rating_daily and the triggers that queue
+every day touched in driver_rating in driver_rating_dirty_days. refresh()
+recomputes only the queued days, with one GROUP BY per batch of days, so
+its cost follows the new rows rather than the table's history.
+
+Takes a SQLAlchemy engine, so the Streamlit report (run.py, at most
+once per SUMMARY_REFRESH_SECONDS) and the Flask app can both call it.
+Schedule `refresh` (cron) to keep the summary current between views.
+
+Usage:
+    python rating_summary.py refresh
+    python rating_summary.py rebuild [--start 2025-06-01 --end 2025-07-01]
+"""
+import argparse
+from datetime import datetime
+
+from sqlalchemy import text
+
+# Summed per (assetName, day); score = distance / cost
+METRICS = ['distance', 'cost', '100kmh', 'excessivei', 'speedingtr', 'brake', 'accel', 'corner', 'gforce']
+
+# Claim a batch of queued days; SKIP LOCKED lets concurrent refreshers split the
+# queue and leaves the days of uncommitted writes (locked by the triggers) queued
+CLAIM = """
+    DELETE FROM driver_rating_dirty_days
+    WHERE day IN (SELECT day FROM driver_rating_dirty_days ORDER BY day LIMIT :n FOR UPDATE SKIP LOCKED)
+    RETURNING day
+"""
+
+# Day ranges (not "dateStart"::date) so each day is an index range scan
+RECOMPUTE = """
+    INSERT INTO driver_rating_daily ("assetName", date, {cols}, score)
+    SELECT r."assetName", d.day, {sums},
+           CASE WHEN coalesce(sum(r.cost), 0) <> 0
+                THEN coalesce(sum(r.distance), 0)::double precision / sum(r.cost) ELSE 0 END
+    FROM unnest(CAST(:days AS date[])) AS d(day)
+    JOIN driver_rating r ON r."dateStart" >= d.day AND r."dateStart" < d.day + 1
+    WHERE r."assetName" IS NOT NULL
+    GROUP BY r."assetName", d.day
+""".format(
+    cols=', '.join(f'"{m}"' for m in METRICS),
+    sums=', '.join(f'coalesce(sum(r."{m}"), 0)' for m in METRICS),
+)
+
+
+def refresh(engine, days_per_batch=31):
+    """Recompute every queued day; returns the number of days refreshed."""
+    refreshed = 0
+    while True:
+        with engine.begin() as conn:
+            days = conn.execute(text(CLAIM), {'n': days_per_batch}).scalars().all()
+            if not days:
+                return refreshed
+            conn.execute(text('DELETE FROM driver_rating_daily WHERE date = ANY(:days)'), {'days': days})
+            conn.execute(text(RECOMPUTE), {'days': days})
+        refreshed += len(days)
+
+
+def queue_days(engine, start=None, end=None):
+    """Queue the days of driver_rating in [start, end) (all days by default)."""
+    where, params = ['"dateStart" IS NOT NULL'], {}
+    if start:
+        where.append('"dateStart" >= :start')
+        params['start'] = start
+    if end:
+        where.append('"dateStart" < :end')
+        params['end'] = end
+    with engine.begin() as conn:
+        return conn.execute(text(
+            f'INSERT INTO driver_rating_dirty_days (day) SELECT DISTINCT "dateStart"::date FROM driver_rating '
+            f'WHERE {" AND ".join(where)} ON CONFLICT DO NOTHING'
+        ), params).rowcount
+
+
+def daily_totals(engine, start, end):
+    """Summary rows with start <= date <= end, as a DataFrame."""
+    import pandas as pd
+
+    query = text('SELECT * FROM driver_rating_daily WHERE date >= :start AND date <= :end '
+                 'ORDER BY "assetName", date')
+    return pd.read_sql(query, engine, params={'start': start, 'end': end})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the daily driver_rating summary.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('refresh')
+    p_rebuild = sub.add_parser('rebuild', help='queue a date range (default: every day) and refresh')
+    p_rebuild.add_argument('--start', help='YYYY-MM-DD')
+    p_rebuild.add_argument('--end', help='YYYY-MM-DD (exclusive)')
+    args = parser.parse_args()
+
+    from app import app
+    from models import db
+    with app.app_context():
+        if args.command == 'rebuild':
+            start = datetime.strptime(args.start, "%Y-%m-%d") if args.start else None
+            end = datetime.strptime(args.end, "%Y-%m-%d") if args.end else None
+            print(f"{queue_days(db.engine, start, end)} days queued")
+        print(f"{refresh(db.engine)} days refreshed")
+
+
+if __name__ == "__main__":
+    main()
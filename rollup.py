@@ -0,0 +1,245 @@
+"""Hourly rollup cube for the vehicles and drivers tables.
+
+Usage:
+    python rollup.py init
+    python rollup.py refresh [--table vehicles|drivers] [--rescan 10000]
+    python rollup.py backfill --start 2025-01-01 --end 2025-07-01 [--chunk-days 7] [--workers 4]
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import case, func, insert, inspect, or_, text
+from models import (db, DimAlertName, DriverEvent, VehicleEvent, DriverEventHourly, VehicleEventHourly,
+                    RollupWatermark)
+
+BATTERY_DISCONNECT = 'Battery Disconnect'
+
+ROLLUPS = {
+    VehicleEvent: VehicleEventHourly,
+    DriverEvent: DriverEventHourly,
+}
+
+TABLES = {model.__tablename__: model for model in ROLLUPS}
+
+HOUR = timedelta(hours=1)
+
+# Claim the buckets migrations/0007's triggers queued for table; SKIP
+# LOCKED leaves those of edits not yet committed for the next refresh
+CLAIM = """
+    DELETE FROM rollup_dirty_buckets
+    WHERE table_name = :t AND bucket IN (
+        SELECT bucket FROM rollup_dirty_buckets WHERE table_name = :t FOR UPDATE SKIP LOCKED)
+    RETURNING bucket
+"""
+
+
+def is_rollup(model):
+    return model in ROLLUPS.values()
+
+
+def source_for(model):
+    """Table the dashboard aggregates should read from.
+
+    The cube carries the same dimension keys as the raw rows, so every
+    filters.py predicate (including the owner substring search, which
+    resolves to a set of owner keys) works against either.
+    """
+    if not current_app.config.get('ROLLUP_ENABLED'):
+        return model
+    return ROLLUPS[model]
+
+
+def _alert_group(model):
+    # Imported here: routes.vehicle imports this module at load time.
+    from routes.vehicle import BATTERY_DISCONNECT_ALERTS
+    return case((model.alert_name_id.in_(DimAlertName.keys_of(BATTERY_DISCONNECT_ALERTS)), BATTERY_DISCONNECT),
+                else_=None)
+
+
+# --------------------------------------------------------------------
+# MAINTENANCE
+# --------------------------------------------------------------------
+def physical_table(model):
+    """<table>_fact once migrations/0002 has turned <table> into a view."""
+    fact = f'{model.__tablename__}_fact'
+    return fact if inspect(db.engine).has_table(fact) else model.__tablename__
+
+
+def init_tables():
+    """Create the rollup tables and the index the refresher scans."""
+    tables = [r.__table__ for r in ROLLUPS.values()] + [RollupWatermark.__table__]
+    db.metadata.create_all(db.engine, tables=tables)
+    for model in ROLLUPS:
+        db.session.execute(text(
+            f'CREATE INDEX IF NOT EXISTS ix_{model.__tablename__}_ModifiedDate '
+            f'ON {physical_table(model)} ("ModifiedDate")'
+        ))
+    db.session.commit()
+
+
+def rebuild_range(model, start, end):
+    """Recompute every hour bucket in [start, end) from raw rows."""
+    rollup = ROLLUPS[model]
+    bucket = func.date_trunc('hour', model.EventDate, type_=db.DateTime)
+    alert_group = _alert_group(model)
+    dims = [bucket, model.owner_id, model.asset_id, model.driver_id, model.event_type_id,
+            model.class_id, alert_group]
+
+    source = (
+        db.session.query(*dims, func.count(model.id))
+        .filter(model.EventDate >= start, model.EventDate < end)
+        .group_by(*dims)
+    )
+    db.session.query(rollup).filter(rollup.EventDate >= start, rollup.EventDate < end)\
+        .delete(synchronize_session=False)
+    db.session.execute(insert(rollup).from_select(
+        [rollup.EventDate, rollup.owner_id, rollup.asset_id, rollup.driver_id, rollup.event_type_id,
+         rollup.class_id, rollup.AlertGroup, rollup.event_count],
+        source.statement
+    ))
+
+
+def _bucket_ranges(buckets):
+    """Collapse sorted hour buckets into contiguous [start, end) ranges."""
+    ranges = []
+    for b in sorted(buckets):
+        if ranges and ranges[-1][1] == b:
+            ranges[-1][1] = b + HOUR
+        else:
+            ranges.append([b, b + HOUR])
+    return ranges
+
+
+def _advance_watermark(model, last_id, last_modified):
+    wm = db.session.get(RollupWatermark, model.__tablename__)
+    if wm is None:
+        wm = RollupWatermark(table_name=model.__tablename__, last_id=0)
+        db.session.add(wm)
+    wm.last_id = max(wm.last_id or 0, last_id or 0)
+    if last_modified and (wm.last_modified is None or last_modified > wm.last_modified):
+        wm.last_modified = last_modified
+    wm.refreshed_at = datetime.utcnow()
+
+
+def _claim_edited(model):
+    """Buckets queued by updates and deletes since the last refresh."""
+    if not inspect(db.engine).has_table('rollup_dirty_buckets'):
+        return []
+    return db.session.execute(text(CLAIM), {'t': model.__tablename__}).scalars().all()
+
+
+def refresh(model, rescan=0):
+    """Apply rows added or modified since the stored watermark.
+
+    Only the hour buckets those rows fall in are recomputed, so the cost
+    follows the number of new rows rather than table size. Ids are handed
+    out before their rows commit, so a row can become visible below a
+    watermark that has already passed it: the buckets of the last
+    `rescan` ids under the watermark are rebuilt again (rebuilding is
+    idempotent). The buckets that updates and deletes left stale (both
+    the old and the new hour of a moved EventDate) come from the queue
+    migrations/0007 keeps. Returns the number of buckets rebuilt, or None
+    if another refresher holds the lock.
+    """
+    got_lock = db.session.execute(
+        text('SELECT pg_try_advisory_xact_lock(hashtext(:t))'), {'t': model.__tablename__}
+    ).scalar()
+    if not got_lock:
+        db.session.rollback()
+        return None
+
+    wm = db.session.get(RollupWatermark, model.__tablename__)
+    last_id = wm.last_id if wm else 0
+    last_modified = wm.last_modified if wm else None
+    max_id, max_modified = db.session.query(func.max(model.id), func.max(model.ModifiedDate)).one()
+
+    changed = model.id > max(last_id - rescan, 0)
+    if last_modified is not None:
+        changed = or_(changed, model.ModifiedDate > last_modified)
+    buckets = {b for b, in db.session.query(func.date_trunc('hour', model.EventDate, type_=db.DateTime))
+               .filter(changed, model.EventDate.isnot(None)).distinct()}
+    buckets.update(_claim_edited(model))
+
+    for start, end in _bucket_ranges(buckets):
+        rebuild_range(model, start, end)
+    _advance_watermark(model, max_id, max_modified)
+    db.session.commit()
+    return len(buckets)
+
+
+def _init_backfill_worker():
+    # The parent has used the pool (the watermark query) before forking:
+    # drop the inherited connections without closing them, as they are
+    # still the parent's, so each worker opens its own.
+    from app import app
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def _backfill_chunk(table_name, start, end):
+    from app import app
+    with app.app_context():
+        rebuild_range(TABLES[table_name], start, end)
+        db.session.commit()
+    return start, end
+
+
+def backfill(model, start, end, chunk_days=7, workers=4):
+    """Rebuild [start, end) in parallel date chunks, one transaction each."""
+    max_id, max_modified = db.session.query(func.max(model.id), func.max(model.ModifiedDate)).one()
+    db.session.commit()
+
+    chunks = []
+    cursor = start
+    while cursor < end:
+        chunks.append((cursor, min(cursor + timedelta(days=chunk_days), end)))
+        cursor = chunks[-1][1]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_backfill_worker) as pool:
+        futures = [pool.submit(_backfill_chunk, model.__tablename__, s, e) for s, e in chunks]
+        for f in futures:
+            s, e = f.result()
+            print(f"{model.__tablename__}: rebuilt {s:%Y-%m-%d} -> {e:%Y-%m-%d}")
+
+    # Rows that arrive during the backfill sit above this watermark and
+    # are picked up by the next refresh.
+    _advance_watermark(model, max_id, max_modified)
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the hourly event rollups.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('init')
+    p_refresh = sub.add_parser('refresh')
+    p_refresh.add_argument('--table', choices=sorted(TABLES))
+    p_refresh.add_argument('--rescan', type=int, help='ids re-scanned below the watermark '
+                                                     '(default ROLLUP_RESCAN_IDS)')
+    p_backfill = sub.add_parser('backfill')
+    p_backfill.add_argument('--table', choices=sorted(TABLES))
+    p_backfill.add_argument('--start', required=True, help='YYYY-MM-DD')
+    p_backfill.add_argument('--end', required=True, help='YYYY-MM-DD (exclusive)')
+    p_backfill.add_argument('--chunk-days', type=int, default=7)
+    p_backfill.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    from app import app
+    with app.app_context():
+        models = [TABLES[args.table]] if getattr(args, 'table', None) else list(ROLLUPS)
+        if args.command == 'init':
+            init_tables()
+        elif args.command == 'refresh':
+            rescan = current_app.config['ROLLUP_RESCAN_IDS'] if args.rescan is None else args.rescan
+            for model in models:
+                print(f"{model.__tablename__}: {refresh(model, rescan)} buckets rebuilt")
+        elif args.command == 'backfill':
+            start = datetime.strptime(args.start, "%Y-%m-%d")
+            end = datetime.strptime(args.end, "%Y-%m-%d")
+            for model in models:
+                backfill(model, start, end, args.chunk_days, args.workers)
+
+
+if __name__ == "__main__":
+    main()
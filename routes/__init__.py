@@ -1,3 +1,4 @@
 # Just import blueprints
 from .driver import driver_bp
 from .vehicle import vehicle_bp
+from .admin import admin_bp
@@ -0,0 +1,33 @@
+from flask import Blueprint, abort, current_app, jsonify, render_template
+from flask_login import login_required
+import slow_queries
+
+admin_bp = Blueprint('admin', __name__)
+
+
+@admin_bp.before_request
+def require_slow_query_log():
+    # Captured statements carry filter values; only expose them when the log is switched on
+    if not current_app.config.get('SLOW_QUERY_ENABLED'):
+        abort(404)
+
+
+@admin_bp.before_request
+def require_login():
+    # SQL text, bound values and plans are for signed-in users only; without
+    # a LoginManager nobody can sign in, so refuse rather than fail open
+    if not hasattr(current_app, 'login_manager'):
+        abort(403)
+    return login_required(lambda: None)()
+
+
+@admin_bp.route('/slow-queries')
+def slow_query_log():
+    return render_template('admin_slow_queries.html', entries=slow_queries.entries(),
+                           threshold_ms=current_app.config['SLOW_QUERY_MS'])
+
+
+@admin_bp.route('/api/slow-queries')
+def slow_query_log_api():
+    """The slow-query log as JSON, newest first."""
+    return jsonify([dict(e, captured_at=e['captured_at'].isoformat()) for e in slow_queries.entries()])
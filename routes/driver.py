@@ -1,300 +1,488 @@
-from flask import Blueprint, render_template, request, url_for, jsonify
-from models import DriverEvent, db
+from flask import Blueprint, abort, current_app, render_template, request, url_for, jsonify
+from models import DimAsset, DimClass, DimDriver, DimEventType, DimOwner, DriverEvent, db
+import aggregations
+import cache
+import dimensions
+import export
+import filters
+import pagination
+import payloads
+import rollup
+import score_snapshots
+import scoring
+import sections
 from datetime import datetime, timedelta
+from functools import partial
 from sqlalchemy import func
-from functools import lru_cache
 
 driver_bp = Blueprint('driver', __name__)
 
-# --------------------------------------------------------------------
-# EVENT SCORING CONFIG
-# --------------------------------------------------------------------
-EVENT_SCORING = {
-    'Excessive Idling': {'penalty': 10, 'max_penalty': 100, 'cost': 10},
-    'Harsh Acceleration': {'penalty': 1, 'max_penalty': 100, 'cost': 1},
-    'Harsh Braking': {'penalty': 1, 'max_penalty': 100, 'cost': 1},
-    'Harsh Cornering': {'penalty': 1, 'max_penalty': 100, 'cost': 1},
-    'Overspeeding': {'penalty': 1, 'max_penalty': 100, 'cost': 1},
-}
-
 # --------------------------------------------------------------------
 # FILTERING
 # --------------------------------------------------------------------
-def apply_filters(query, start_date, end_date, owner=None, driver_name=None, event_type=None):
-    if start_date:
-        query = query.filter(DriverEvent.EventDate >= datetime.strptime(start_date, "%Y-%m-%d"))
-    if end_date:
-        query = query.filter(DriverEvent.EventDate <= datetime.strptime(end_date, "%Y-%m-%d"))
+def apply_filters(query, start_date, end_date, owner=None, driver_name=None, event_type=None, model=DriverEvent):
+    query = filters.filter_dates(query, model.EventDate, start_date, end_date)
     if owner:
-        query = query.filter(DriverEvent.OwnerName == owner)
+        query = query.filter(model.owner_id == DimOwner.key_of(owner))
     if driver_name:
-        query = query.filter(DriverEvent.LinkedName_1 == driver_name)
+        query = query.filter(model.driver_id == DimDriver.key_of(driver_name))
     if event_type:
-        query = query.filter(DriverEvent.EventTypes == event_type)
+        query = query.filter(model.event_type_id == DimEventType.key_of(event_type))
     return query
 
 # --------------------------------------------------------------------
-# SCORING
+# DROPDOWNS
 # --------------------------------------------------------------------
-def compute_driver_score(events, selected_event_type=None):
-    score = 100
-    details = {}
-    type_counts = {}
-    for e in events:
-        et = e.EventTypes
-        if et:
-            type_counts[et] = type_counts.get(et, 0) + 1
-    for etype, cfg in EVENT_SCORING.items():
-        cnt = type_counts.get(etype, 0)
-        pen = min(cfg['penalty'] * cnt, cfg['max_penalty'])
-        if not selected_event_type or selected_event_type == etype:
-            score -= pen
-        details[etype] = {'count': cnt, 'penalty': pen}
-    return max(score, 0), details
+def get_dropdown_data():
+    dims = dimensions.get_dimensions(DriverEvent)
+    return dims.owners, dims.drivers, dims.event_types
 
 # --------------------------------------------------------------------
-# CACHED DROPDOWNS
+# PANEL BUILDERS
 # --------------------------------------------------------------------
-@lru_cache(maxsize=1)
-def get_dropdown_data():
-    owners = [o for o, in db.session.query(DriverEvent.OwnerName).distinct().order_by(DriverEvent.OwnerName)]
-    drivers = [d for d, in db.session.query(DriverEvent.LinkedName_1)
-               .filter(DriverEvent.Class=='Driver').distinct().order_by(DriverEvent.LinkedName_1)]
-    event_types = [et for et, in db.session.query(DriverEvent.EventTypes).distinct().order_by(DriverEvent.EventTypes)]
-    return owners, drivers, event_types
+# Builders take SliceRow tuples from aggregations.fetch_slice(). The slice
+# is filtered by date, owner and event type only; the driver filter and
+# Class=='Driver' are applied here because some drilldowns ignore them.
+
+def _is_driver(r):
+    return r.event_class == 'Driver'
+
+
+def build_weekly_chart(rows, f):
+    """Top 10 drivers; weeks and event types load through the drilldown endpoint."""
+    totals = aggregations.count_by(
+        rows, lambda r: r.driver,
+        where=lambda r: _is_driver(r) and (not f.subject or r.driver == f.subject)
+    )
+    # IN (...) never matched NULL, so a null driver gets no weekly drilldown
+    return payloads.table([{'name': drv, 'y': total, 'drilldown': drv,
+                            'drilldown_url': drilldown_url(f, 'driver_week', name=drv) if drv is not None else None}
+                           for drv, total in aggregations.top(totals, 10)])
+
+
+def build_hourly_chart(bucket_rows, f):
+    """Hourly stacked columns; the top drivers per bucket load on drilldown.
+
+    Takes HourBucketRow tuples from aggregations.fetch_top_per_hour().
+    """
+    hour_totals = {(r.hour, r.event_type): r.bucket_total for r in bucket_rows}
+    hours = sorted({h for h, _ in hour_totals})
+    types = sorted({et for _, et in hour_totals})
+    return [
+        {'name': et, 'data': payloads.table(
+            [{'y': hour_totals.get((hr, et), 0), 'drilldown': f'{hr}_{et}', 'hour': hr} for hr in hours],
+            urls={'drilldown_url': drilldown_url(f, 'hour_etype', hour=payloads.field('hour'), etype=et)})}
+        for et in types
+    ]
+
+
+def build_owner_pie(rows, f):
+    """Owner totals; event types and top drivers load on drilldown."""
+    owner_totals = aggregations.count_by(
+        rows, lambda r: r.owner,
+        where=lambda r: _is_driver(r) and (not f.subject or r.driver == f.subject)
+    )
+    return payloads.table([{'name': own, 'y': cnt, 'drilldown': own} for own, cnt in owner_totals.items()],
+                          urls={'drilldown_url': drilldown_url(f, 'owner', of_owner=payloads.field('name'))})
+
+
+def build_driver_table(rows, driver_name):
+    """Top 10 assets with a per event type breakdown."""
+    def tagged(r):
+        return _is_driver(r) and r.event_type != 'Non Tagging'
+
+    totals = aggregations.count_by(
+        rows, lambda r: r.asset,
+        where=lambda r: tagged(r) and r.asset is not None and (not driver_name or r.driver == driver_name)
+    )
+    breakdowns = aggregations.nested_count_by(rows, lambda r: r.asset, lambda r: r.event_type, where=tagged)
+
+    return payloads.table([{
+        "asset": asset,
+        "total": total,
+        "breakdown": payloads.table(
+            [{"type": et, "count": c} for et, c in breakdowns[asset].items()],
+            urls={"url": events_url(driver_name=asset, event_type=payloads.field('type'), asset=asset)}),
+    } for asset, total in aggregations.top(totals, 10)], urls={"url": events_url(asset=payloads.field('asset'))})
+
+
+def build_event_type_totals(rows, f):
+    """Event type totals for the cards; the per-driver lists load on click."""
+    totals = aggregations.count_by(rows, lambda r: r.event_type, where=lambda r: r.event_type != 'Non Tagging')
+    return payloads.table([{'type': et, 'total': total} for et, total in totals.items() if total > 0],
+                          urls={'drilldown_url': drilldown_url(f, 'event_type', etype=payloads.field('type'))})
+
+# --------------------------------------------------------------------
+# DRILLDOWN SERIES
+# --------------------------------------------------------------------
+# One series per Highcharts drilldown click, built from the cached slice.
+# Keys arrive as query arguments next to the dashboard filters:
+# name (driver), of_owner, week, hour and etype. Drilldown levels ignore
+# the driver filter, as they always have.
+def series_driver_week(f, args):
+    drv = args.get('name')
+    weekly = aggregations.count_by(dashboard_rows(f), lambda r: r.week, where=lambda r: r.driver == drv)
+    return {'id': drv, 'name': f'Weekly events for {drv}', 'data': payloads.table(
+        [{'name': wk, 'y': cnt, 'drilldown': f'{drv}_{wk}'} for wk, cnt in sorted(weekly.items())],
+        urls={'drilldown_url': drilldown_url(f, 'week_etype', name=drv, week=payloads.field('name'))}
+    )}
+
+
+def series_week_etype(f, args):
+    drv, wk = args.get('name'), args.get('week')
+    etypes = aggregations.count_by(dashboard_rows(f), lambda r: r.event_type,
+                                   where=lambda r: r.driver == drv and r.week == wk)
+    return {'id': f'{drv}_{wk}', 'name': f'Event Types for {drv} - {wk}', 'data': payloads.table(
+        [{'name': et, 'y': c} for et, c in etypes.items()],
+        urls={'url': events_url(driver_name=drv, week=wk, event_type=payloads.field('name'))}
+    )}
+
+
+def series_hour_etype(f, args):
+    hr, et = args.get('hour', type=int), args.get('etype')
+    return {'id': f'{hr}_{et}', 'name': f'Top Drivers for Hour {hr} - {et}', 'data': payloads.table(
+        [{'name': r.name, 'y': r.count} for r in dashboard_hour_buckets(f) if r.hour == hr and r.event_type == et],
+        urls={'url': events_url(driver_name=payloads.field('name'), event_type=et)}
+    )}
+
+
+def series_owner(f, args):
+    own = args.get('of_owner')
+    etypes = aggregations.count_by(dashboard_rows(f), lambda r: r.event_type,
+                                   where=lambda r: _is_driver(r) and r.owner == own)
+    return {'id': own, 'name': f'Event Types in {own}', 'data': payloads.table(
+        [{'name': et, 'y': ec, 'drilldown': f'{own}_{et}'} for et, ec in etypes.items()],
+        urls={'drilldown_url': drilldown_url(f, 'owner_etype', of_owner=own, etype=payloads.field('name'))}
+    )}
+
+
+def series_owner_etype(f, args):
+    own, et = args.get('of_owner'), args.get('etype')
+    drivers = aggregations.count_by(dashboard_rows(f), lambda r: r.driver,
+                                    where=lambda r: _is_driver(r) and r.owner == own and r.event_type == et)
+    # Top drivers per owner and event type
+    return {'id': f'{own}_{et}', 'name': f'Top Drivers for {et} in {own}', 'data': payloads.table(
+        [{'name': d, 'y': c} for d, c in aggregations.top(drivers, 10)],
+        urls={'url': events_url(driver_name=payloads.field('name'), event_type=et)}
+    )}
+
+
+def series_event_type(f, args):
+    """Drivers for one event type card (rows for the modal table)."""
+    et = args.get('etype')
+    driver_counts = aggregations.count_by(
+        dashboard_rows(f), lambda r: r.driver,
+        where=lambda r: _is_driver(r) and (not f.subject or r.driver == f.subject)
+                        and r.event_type == et and r.driver is not None
+    )
+    return {'id': et, 'name': f'Driver Event Type: {et}', 'data': payloads.table(
+        [{"driver": d, "count": c} for d, c in aggregations.top(driver_counts) if c > 0],
+        urls={"url": events_url(driver_name=payloads.field('driver'), event_type=et)}
+    )}
+
+
+DRILLDOWNS = {
+    'driver_week': series_driver_week,
+    'week_etype': series_week_etype,
+    'hour_etype': series_hour_etype,
+    'owner': series_owner,
+    'owner_etype': series_owner_etype,
+    'event_type': series_event_type,
+}
+
+
+def filter_params(f):
+    """Query-string arguments that reproduce filter set f."""
+    return {k: v for k, v in [('start_date', f.start_date), ('end_date', f.end_date), ('owner', f.owner),
+                              ('driver_name', f.subject), ('event_type', f.event_type)] if v}
+
+
+def drilldown_url(f, series, **keys):
+    return payloads.url_template(url_for('driver.drilldown', series=series, **filter_params(f), **keys))
+
+
+def events_url(**kwargs):
+    return payloads.url_template(url_for('driver.driver_events', **kwargs))
+
+# --------------------------------------------------------------------
+# CACHED PANEL INPUTS
+# --------------------------------------------------------------------
+# Panels share one slice per filter set (the driver filter is applied by
+# the builders); the hourly chart has its own ranked query.
+def dashboard_rows(f):
+    """Slice rows for a filter set, cached and shared by every panel."""
+    def compute():
+        source = rollup.source_for(DriverEvent)
+        query = apply_filters(aggregations.slice_query(source), f.start_date, f.end_date, f.owner, None,
+                              f.event_type, model=source)
+        return aggregations.fetch_slice(query)
+
+    key = cache.make_key('driver:slice', f.start_date, f.end_date, f.owner, None, f.event_type)
+    return cache.get_cache().get_or_compute(key, DriverEvent, compute)
+
+
+def dashboard_hour_buckets(f):
+    """Top 10 drivers per (hour, event type), cached per filter set."""
+    def compute():
+        source = rollup.source_for(DriverEvent)
+        query = aggregations.hour_bucket_query(source, source.driver_id)\
+            .filter(source.class_id == DimClass.key_of('Driver'))
+        query = apply_filters(query, f.start_date, f.end_date, f.owner, f.subject, f.event_type, model=source)
+        return aggregations.fetch_top_per_hour(query, DimDriver)
+
+    return cache.get_cache().get_or_compute(cache.make_key('driver:hourly', *f), DriverEvent, compute)
+
+# --------------------------------------------------------------------
+# PANELS
+# --------------------------------------------------------------------
+# One function per dashboard widget, each returning a JSON-ready dict.
+EVENT_COLUMNS = ['id', 'EventDate', 'OwnerName', 'AssetName', 'LinkedName_1', 'EventTypes', 'AlertName',
+                 'LocationAddress', 'Latitude', 'Longitude', 'LimitValue', 'CurrentValue', 'IdleCounter',
+                 'BatteryVoltage', 'PowerVoltage']
+
+
+def panel_events(f):
+    query = apply_filters(DriverEvent.query.with_entities(DriverEvent.rows(EVENT_COLUMNS))
+                          .filter(DriverEvent.class_id == DimClass.key_of('Driver')),
+                          f.start_date, f.end_date, f.owner, f.subject, f.event_type)
+    events = query.order_by(DriverEvent.EventDate.desc()).limit(1000).all()
+    return {'events': [e.as_dict(EVENT_COLUMNS) for e in events]}
+
+
+def panel_table(f):
+    return {'driver_table': build_driver_table(dashboard_rows(f), f.subject)}
+
+
+def panel_event_types(f):
+    driver_rows = [r for r in dashboard_rows(f) if _is_driver(r) and (not f.subject or r.driver == f.subject)]
+    return {'event_types': build_event_type_totals(driver_rows, f)}
+
+
+def panel_weekly(f):
+    return {'chart_data_weekly': build_weekly_chart(dashboard_rows(f), f)}
+
+
+def panel_hourly(f):
+    return {'hourly_series': build_hourly_chart(dashboard_hour_buckets(f), f)}
+
+
+def panel_owner(f):
+    return {'chart_data_owner': build_owner_pie(dashboard_rows(f), f)}
+
+
+PANELS = {
+    'events': panel_events,
+    'table': panel_table,
+    'event-types': panel_event_types,
+    'weekly': panel_weekly,
+    'hourly': panel_hourly,
+    'owner': panel_owner,
+}
+
+
+def dashboard_aggregates(f):
+    """Every chart and table on the dashboard for one filter set.
+
+    Panels are independent; with SECTION_EXECUTOR_ENABLED they run
+    concurrently (see sections.py).
+    """
+    results = sections.run_sections({name: partial(panel, f) for name, panel in PANELS.items() if name != 'events'})
+    data = {}
+    for result in results.values():
+        data.update(result)
+    return data
+
+
+def read_filters():
+    """Dashboard filters from the query string, with the default date range."""
+    return aggregations.DashboardFilters(
+        start_date=request.args.get('start_date', (datetime.utcnow() - timedelta(days=1)).strftime("%Y-%m-%d")),
+        end_date=request.args.get('end_date', datetime.utcnow().strftime("%Y-%m-%d")),
+        owner=request.args.get('owner'),
+        subject=request.args.get('driver_name'),
+        event_type=request.args.get('event_type'),
+    )
 
 # --------------------------------------------------------------------
 # DASHBOARD VIEW
 # --------------------------------------------------------------------
 @driver_bp.route('/dashboard')
 def driver_dashboard():
-    start_date = request.args.get('start_date', (datetime.utcnow() - timedelta(days=1)).strftime("%Y-%m-%d"))
-    end_date = request.args.get('end_date', datetime.utcnow().strftime("%Y-%m-%d"))
-    owner = request.args.get('owner')
-    driver_name = request.args.get('driver_name')
-    event_type = request.args.get('event_type')
-
-    # ---------------- BASE EVENTS ----------------
-    base_query = apply_filters(DriverEvent.query.filter(DriverEvent.Class=='Driver'),
-                               start_date, end_date, owner, driver_name, event_type)
-    events = base_query.order_by(DriverEvent.EventDate.desc()).limit(1000).all()
+    # Only the filter form is rendered here; the browser fetches every
+    # panel from /api/panels/<panel> concurrently.
+    f = read_filters()
 
     # ---------------- DROPDOWN DATA ----------------
     owners_list, drivers_list, event_types_list = get_dropdown_data()
 
-    # ---------------- TOP DRIVERS WEEKLY ----------------
-    top_drivers_query = (
-        db.session.query(DriverEvent.LinkedName_1, func.count(DriverEvent.id))
-        .filter(DriverEvent.Class=='Driver')
-        .group_by(DriverEvent.LinkedName_1)
-    )
-    top_drivers_query = apply_filters(top_drivers_query, start_date, end_date, owner, driver_name, event_type)
-    top_drivers = top_drivers_query.order_by(func.count(DriverEvent.id).desc()).limit(10).all()
-
-    driver_names = [d[0] for d in top_drivers]
-
-    weekly_counts_query = (
-        db.session.query(
-            DriverEvent.LinkedName_1,
-            func.to_char(DriverEvent.EventDate, 'IYYY-IW').label('week'),
-            func.count(DriverEvent.id)
-        )
-        .filter(DriverEvent.LinkedName_1.in_(driver_names))
-        .group_by(DriverEvent.LinkedName_1, 'week')
-    )
-    weekly_counts_query = apply_filters(weekly_counts_query, start_date, end_date, owner, None, event_type)
-    weekly_counts = weekly_counts_query.all()
-
-    weekly_dict = {}
-    for drv, week, cnt in weekly_counts:
-        weekly_dict.setdefault(drv, {})[week] = cnt
-
-    chart_data_weekly = []
-    drilldown_series_weekly = []
-    for drv, total in top_drivers:
-        chart_data_weekly.append({'name': drv, 'y': total, 'drilldown': drv})
-        week_drilldown = {'id': drv, 'name': f'Weekly events for {drv}', 'data': []}
-        for wk, cnt in weekly_dict.get(drv, {}).items():
-            week_drilldown['data'].append({'name': wk, 'y': cnt, 'drilldown': f'{drv}_{wk}'})
-
-            # Event type drilldown per week
-            event_type_counts_query = (
-                db.session.query(DriverEvent.EventTypes, func.count(DriverEvent.id))
-                .filter(DriverEvent.LinkedName_1==drv,
-                        func.to_char(DriverEvent.EventDate, 'IYYY-IW')==wk)
-                .group_by(DriverEvent.EventTypes)
-            )
-            event_type_counts_query = apply_filters(event_type_counts_query, start_date, end_date, owner, None, event_type)
-            event_type_counts = event_type_counts_query.all()
-            drilldown_series_weekly.append({
-                'id': f'{drv}_{wk}',
-                'name': f'Event Types for {drv} - {wk}',
-                'data': [{'name': et, 'y': c,
-                          'url': url_for('driver.driver_events', driver_name=drv, week=wk, event_type=et)}
-                         for et, c in event_type_counts]
-            })
-        drilldown_series_weekly.append(week_drilldown)
-
-    # ---------------- HOURLY STACKED COLUMN ----------------
-    hourly_query = (
-        db.session.query(
-            func.extract('hour', DriverEvent.EventDate).label('hour'),
-            DriverEvent.EventTypes.label('etype'),
-            func.count(DriverEvent.id)
-        )
-        .filter(DriverEvent.Class=='Driver')
-        .group_by('hour', DriverEvent.EventTypes)
-    )
-    hourly_query = apply_filters(hourly_query, start_date, end_date, owner, driver_name, event_type)
-    hourly_raw = [(int(h), et.strip(), c) for h, et, c in hourly_query.all()]
-
-    hours = sorted({h for h, _, _ in hourly_raw})
-    types = sorted({et for _, et, _ in hourly_raw})
-    hourly_series = [
-        {'name': et, 'data': [{'y': sum(c for h, e, c in hourly_raw if h==hr and e==et),
-                               'drilldown': f'{hr}_{et}'} for hr in hours]}
-        for et in types
-    ]
-
-    # Hour drilldown
-    hour_drilldown_series = []
-    for hr in hours:
-        for et in types:
-            q = DriverEvent.query.filter(
-                DriverEvent.Class=='Driver',
-                func.extract('hour', DriverEvent.EventDate)==hr,
-                DriverEvent.EventTypes==et
-            )
-            q = apply_filters(q, start_date, end_date, owner, driver_name, event_type)
-            tops = q.with_entities(DriverEvent.LinkedName_1, func.count(DriverEvent.id))\
-                    .group_by(DriverEvent.LinkedName_1)\
-                    .order_by(func.count(DriverEvent.id).desc())\
-                    .limit(10).all()
-            hour_drilldown_series.append({
-                'id': f'{hr}_{et}',
-                'name': f'Top Drivers for Hour {hr} - {et}',
-                'data': [{'name': d, 'y': c,
-                          'url': url_for('driver.driver_events', driver_name=d, event_type=et)} for d, c in tops]
-            })
-
-    # ---------------- OWNER PIE CHART ----------------
-    owner_totals_query = db.session.query(DriverEvent.OwnerName, func.count(DriverEvent.id))\
-        .filter(DriverEvent.Class=='Driver').group_by(DriverEvent.OwnerName)
-    owner_totals_query = apply_filters(owner_totals_query, start_date, end_date, owner, driver_name, event_type)
-    owner_totals = owner_totals_query.all()
-
-    chart_data_owner, drilldown_series_owner = [], []
-    for own, cnt in owner_totals:
-        chart_data_owner.append({'name': own, 'y': cnt, 'drilldown': own})
-
-        # Event types per owner
-        event_type_counts_query = (
-            db.session.query(DriverEvent.EventTypes, func.count(DriverEvent.id))
-            .filter(DriverEvent.OwnerName==own, DriverEvent.Class=='Driver')
-            .group_by(DriverEvent.EventTypes)
-        )
-        event_type_counts_query = apply_filters(event_type_counts_query, start_date, end_date, None, None, event_type)
-        event_type_counts = event_type_counts_query.all()
-
-        et_data = []
-        for et, ec in event_type_counts:
-            # Top drivers per owner and event type
-            tops = (
-                db.session.query(DriverEvent.LinkedName_1, func.count(DriverEvent.id))
-                .filter(DriverEvent.OwnerName==own, DriverEvent.EventTypes==et, DriverEvent.Class=='Driver')
-                .group_by(DriverEvent.LinkedName_1)
-                .order_by(func.count(DriverEvent.id).desc())
-                .limit(10).all()
-            )
-            drilldown_series_owner.append({
-                'id': f'{own}_{et}',
-                'name': f'Top Drivers for {et} in {own}',
-                'data': [{'name': d, 'y': c,
-                          'url': url_for('driver.driver_events', driver_name=d, event_type=et)} for d, c in tops]
-            })
-            et_data.append({'name': et, 'y': ec, 'drilldown': f'{own}_{et}'})
-        drilldown_series_owner.append({'id': own, 'name': f'Event Types in {own}', 'data': et_data})
-
-    # ---------------- TOP ASSETS ----------------
-    top_assets_query = db.session.query(DriverEvent.AssetName, func.count(DriverEvent.id))\
-        .filter(DriverEvent.Class=='Driver',
-                DriverEvent.AssetName.isnot(None),
-                DriverEvent.EventTypes!='Non Tagging')\
-        .group_by(DriverEvent.AssetName)
-    top_assets_query = apply_filters(top_assets_query, start_date, end_date, owner, driver_name, event_type)
-    top_assets = top_assets_query.order_by(func.count(DriverEvent.id).desc()).limit(10).all()
-
-    driver_table = []
-    for asset, total in top_assets:
-        breakdown_query = db.session.query(DriverEvent.EventTypes, func.count(DriverEvent.id))\
-            .filter(DriverEvent.AssetName==asset, DriverEvent.Class=='Driver', DriverEvent.EventTypes!='Non Tagging')\
-            .group_by(DriverEvent.EventTypes)
-        breakdown_query = apply_filters(breakdown_query, start_date, end_date, owner, None, event_type)
-        breakdown = breakdown_query.all()
-        driver_table.append({
-            "asset": asset,
-            "total": total,
-            "breakdown": [{"type": et, "count": c} for et, c in breakdown],
-            "url": url_for('driver.driver_events', asset=asset)
-        })
-
-    # ---------------- EVENT TYPE TOTALS ----------------
-    event_type_totals_query = (
-        db.session.query(DriverEvent.EventTypes, func.count(DriverEvent.id))
-        .filter(DriverEvent.Class=='Driver', DriverEvent.EventTypes!='Non Tagging')
-        .group_by(DriverEvent.EventTypes)
-    )
-    event_type_totals_query = apply_filters(event_type_totals_query, start_date, end_date, owner, driver_name, event_type)
-    event_type_totals = event_type_totals_query.all()
-
-    event_type_drilldown = {}
-    for et, total in event_type_totals:
-        driver_counts_query = (
-            db.session.query(DriverEvent.LinkedName_1, func.count(DriverEvent.id))
-            .filter(DriverEvent.EventTypes==et, DriverEvent.Class=='Driver', DriverEvent.LinkedName_1.isnot(None))
-            .group_by(DriverEvent.LinkedName_1)
-            .order_by(func.count(DriverEvent.id).desc())
-        )
-        driver_counts_query = apply_filters(driver_counts_query, start_date, end_date, owner, driver_name, event_type)
-        driver_counts = driver_counts_query.all()
-        event_type_drilldown[et] = [{"driver": d, "count": c,
-                                      "url": url_for('driver.driver_events', driver_name=d, event_type=et)}
-                                     for d, c in driver_counts if c>0]
+    panel_urls = {name: url_for('driver.dashboard_panel', panel=name, **filter_params(f)) for name in PANELS}
 
     # ---------------- HTML RENDER ----------------
     return render_template(
         'driver.html',
-        events=events,
         owners=owners_list,
         drivers=drivers_list,
         event_types=event_types_list,
-        selected_owner=owner,
-        selected_driver=driver_name,
-        selected_event_type=event_type,
-        start_date=start_date,
-        end_date=end_date,
-        chart_data_weekly=chart_data_weekly,
-        drilldown_series_weekly=drilldown_series_weekly,
-        hourly_series=hourly_series,
-        hour_drilldown_series=hour_drilldown_series,
-        chart_data_owner=chart_data_owner,
-        drilldown_series_owner=drilldown_series_owner,
-        driver_table=driver_table,
-        event_type_totals=event_type_totals,
-        event_type_drilldown=event_type_drilldown
+        selected_owner=f.owner,
+        selected_driver=f.subject,
+        selected_event_type=f.event_type,
+        start_date=f.start_date,
+        end_date=f.end_date,
+        panel_urls=panel_urls
     )
 
 # --------------------------------------------------------------------
-# JSON API ENDPOINT
+# JSON API ENDPOINTS
 # --------------------------------------------------------------------
+@driver_bp.route('/api/panels/<panel>')
+def dashboard_panel(panel):
+    if panel not in PANELS:
+        abort(404)
+    return payloads.respond(sections.run_sections({panel: partial(PANELS[panel], read_filters())})[panel])
+
+
+@driver_bp.route('/api/drilldown/<series>')
+def drilldown(series):
+    """One drilldown series, fetched when a chart point is clicked."""
+    if series not in DRILLDOWNS:
+        abort(404)
+    f = read_filters()
+    max_age = current_app.config.get('DRILLDOWN_CACHE_SECONDS', 60)
+    keys = sorted((k, request.args.get(k)) for k in ('name', 'of_owner', 'week', 'hour', 'etype'))
+    key = cache.make_key(f'driver:drilldown:{series}:{keys}', *f)
+    data = cache.get_cache().get_or_compute(key, DriverEvent, lambda: DRILLDOWNS[series](f, request.args),
+                                            max_age=max_age)
+    response = payloads.respond(data)
+    response.cache_control.private = True
+    response.cache_control.max_age = max_age
+    return response
+
+
+@driver_bp.route('/export.<fmt>')
+def export_events(fmt):
+    """Stream every event matching the dashboard filters as csv or parquet."""
+    if fmt not in export.FORMATS:
+        abort(404)
+    if fmt == 'parquet' and not export.parquet_available():
+        abort(501, description='Parquet export needs pyarrow installed')
+    f = read_filters()
+    query = apply_filters(DriverEvent.query.filter(DriverEvent.class_id == DimClass.key_of('Driver')), f.start_date, f.end_date, f.owner, f.subject, f.event_type)
+    return export.export_response(query, DriverEvent, fmt, 'driver_events')
+
+
 @driver_bp.route('/api/dashboard-data')
 def dashboard_data_api():
-    # In production, you may factor out logic into a helper returning dict
-    return jsonify({"status": "success", "data": "Dashboard JSON output would go here"})
+    return payloads.respond(dashboard_aggregates(read_filters()))
+
+# --------------------------------------------------------------------
+# FLEET LEADERBOARD
+# --------------------------------------------------------------------
+def leaderboard_args():
+    """(filters, sort, order, page, page_size) from the query string."""
+    sort = request.args.get('sort', 'score')
+    if sort not in scoring.SORTS:
+        abort(400, description='Invalid sort')
+    order = request.args.get('order', 'asc' if sort == 'driver' else 'desc')
+    if order not in ('asc', 'desc'):
+        abort(400, description='Invalid order')
+    page = max(request.args.get('page', 1, type=int) or 1, 1)
+    return read_filters(), sort, order, page, pagination.page_size_arg(request.args)
+
+
+def fleet_leaderboard(f, sort, order, page, page_size):
+    """Every driver's score for the date and owner filters, one sorted page."""
+    def compute():
+        source = rollup.source_for(DriverEvent)
+        query = apply_filters(scoring.leaderboard_query(source), f.start_date, f.end_date, f.owner, model=source)
+        return scoring.leaderboard_page(query, sort, order == 'desc', page, page_size)
+
+    key = cache.make_key(f'driver:leaderboard:{sort}:{order}:{page}:{page_size}', f.start_date, f.end_date, f.owner)
+    return cache.get_cache().get_or_compute(key, DriverEvent, compute)
+
+
+def _leaderboard_url(endpoint, f, **kwargs):
+    return url_for(endpoint, start_date=f.start_date, end_date=f.end_date, owner=f.owner, **kwargs)
+
+
+@driver_bp.route('/leaderboard')
+def leaderboard():
+    f, sort, order, page, page_size = leaderboard_args()
+    board = fleet_leaderboard(f, sort, order, page, page_size)
+    owners, _, _ = get_dropdown_data()
+
+    def page_url(n):
+        return _leaderboard_url('driver.leaderboard', f, sort=sort, order=order, page=n, page_size=page_size)
+
+    def sort_url(column):
+        # Clicking the current sort column flips its order
+        flipped = 'asc' if order == 'desc' else 'desc'
+        return _leaderboard_url('driver.leaderboard', f, sort=column, page_size=page_size,
+                                order=flipped if column == sort else None)
+
+    return render_template(
+        'driver_leaderboard.html',
+        board=board,
+        event_types=list(scoring.EVENT_SCORING),
+        owners=owners,
+        selected_owner=f.owner,
+        start_date=f.start_date,
+        end_date=f.end_date,
+        sort=sort,
+        order=order,
+        sort_url=sort_url,
+        prev_url=page_url(page - 1) if page > 1 else None,
+        next_url=page_url(page + 1) if page * page_size < board.total else None,
+    )
+
+
+@driver_bp.route('/api/leaderboard')
+def leaderboard_api():
+    """JSON page of the fleet leaderboard."""
+    f, sort, order, page, page_size = leaderboard_args()
+    board = fleet_leaderboard(f, sort, order, page, page_size)
+    return jsonify({
+        'drivers': [row._asdict() for row in board.rows],
+        'total': board.total,
+        'page': page,
+        'page_size': page_size,
+        'sort': sort,
+        'order': order,
+        'next_url': (_leaderboard_url('driver.leaderboard_api', f, sort=sort, order=order, page=page + 1,
+                                      page_size=page_size) if page * page_size < board.total else None),
+    })
 
 # --------------------------------------------------------------------
 # DRIVER EVENTS PAGE
 # --------------------------------------------------------------------
+def driver_events_query(driver_name=None, asset=None, week=None, event_type=None):
+    """Events behind the driver_events page."""
+    q = DriverEvent.query.filter(DriverEvent.class_id == DimClass.key_of('Driver'))
+    if asset:
+        q = q.filter(DriverEvent.asset_id == DimAsset.key_of(asset))
+    elif driver_name:
+        q = q.filter(DriverEvent.driver_id == DimDriver.key_of(driver_name))
+    if week:
+        try:
+            week_start, week_end = filters.week_range(week)
+        except ValueError:
+            abort(400, description='Invalid week')
+        q = filters.filter_range(q, DriverEvent.EventDate, week_start, week_end)
+    if event_type:
+        q = q.filter(DriverEvent.event_type_id == DimEventType.key_of(event_type))
+    return q
+
+
+EVENT_PAGE_COLUMNS = ['id', 'EventTypes', 'EventDate', 'LocationAddress', 'InputId', 'InputName', 'LimitValue',
+                      'CurrentValue', 'IdleCounter', 'BatteryVoltage', 'PowerVoltage', 'Latitude', 'Longitude']
+
+
+def _next_page_url(driver_name, asset, week, event_type, page):
+    if not page.next_cursor:
+        return None
+    return url_for('driver.driver_events_api', driver_name=driver_name, asset=asset, week=week,
+                   event_type=event_type, page_size=page.page_size, cursor=page.next_cursor)
+
+
 @driver_bp.route('/events/')
 @driver_bp.route('/events/<driver_name>')
 def driver_events(driver_name=None):
@@ -302,22 +490,63 @@ def driver_events(driver_name=None):
     event_type = request.args.get('event_type')
     asset = request.args.get('asset')
 
-    q = DriverEvent.query.filter(DriverEvent.Class=='Driver')
-    if asset:
-        q = q.filter(DriverEvent.AssetName==asset)
-    elif driver_name:
-        q = q.filter(DriverEvent.LinkedName_1==driver_name)
-    if week:
-        q = q.filter(func.to_char(DriverEvent.EventDate, 'IYYY-IW')==week)
-    if event_type:
-        q = q.filter(DriverEvent.EventTypes==event_type)
+    q = driver_events_query(driver_name, asset, week, event_type)
+    # First page only; further pages come from driver_events_api as the table scrolls.
+    page = pagination.page_from_request(q.with_entities(DriverEvent.rows(EVENT_PAGE_COLUMNS)), DriverEvent)
 
-    events = q.order_by(DriverEvent.EventDate.desc()).limit(1000).all()
-    score, det = compute_driver_score(events)
+    # Score over every matching event, not just the rows on this page
+    type_counts = {et: cnt for et, cnt in q.with_entities(DimEventType.name_of(DriverEvent.event_type_id),
+                                                          func.count(DriverEvent.id))
+                   .group_by(DriverEvent.event_type_id) if et}
+    score, det = scoring.score_from_counts(type_counts)
     return render_template('driver_events.html',
                            driver_name=driver_name or asset,
                            asset=asset,
-                           events=events,
+                           events=page.rows,
                            event_type=event_type,
+                           total=page.total,
+                           total_is_estimate=page.total_is_estimate,
+                           next_url=_next_page_url(driver_name, asset, week, event_type, page),
                            driver_score=score,
-                           score_details=det)
+                           score_details=det,
+                           trend_url=url_for('driver.score_trend_api', driver_name=driver_name)
+                           if driver_name and not asset else None)
+
+
+@driver_bp.route('/api/score-trend/<driver_name>')
+def score_trend_api(driver_name):
+    """Daily scores of one driver from the score snapshots (score_snapshots.py).
+
+    Defaults to the last SCORE_TREND_DAYS days; end_date is inclusive.
+    """
+    try:
+        start, end = filters.date_range(request.args.get('start_date'), request.args.get('end_date'))
+    except ValueError:
+        abort(400, description='Invalid date')
+    end = end or datetime.combine(datetime.now().date() + timedelta(days=1), datetime.min.time())
+    start = start or end - timedelta(days=current_app.config['SCORE_TREND_DAYS'])
+    rows = score_snapshots.trend(driver_name, start.date(), end.date())
+    return jsonify({
+        'driver': driver_name,
+        'config_version': scoring.CONFIG_VERSION,
+        'days': [{'day': r.day.isoformat(), 'score': r.score, 'penalty': r.penalty, 'events': r.events,
+                  'counts': r.counts} for r in rows],
+    })
+
+
+@driver_bp.route('/api/events/')
+@driver_bp.route('/api/events/<driver_name>')
+def driver_events_api(driver_name=None):
+    """JSON page of driver_events for infinite scroll."""
+    week = request.args.get('week')
+    event_type = request.args.get('event_type')
+    asset = request.args.get('asset')
+    q = driver_events_query(driver_name, asset, week, event_type)
+    page = pagination.page_from_request(q.with_entities(DriverEvent.rows(EVENT_PAGE_COLUMNS)), DriverEvent)
+    return jsonify({
+        'events': [e.as_dict(EVENT_PAGE_COLUMNS) for e in page.rows],
+        'next_cursor': page.next_cursor,
+        'next_url': _next_page_url(driver_name, asset, week, event_type, page),
+        'total': page.total,
+        'total_is_estimate': page.total_is_estimate,
+    })
@@ -1,6 +1,16 @@
-from flask import Blueprint, render_template, request, url_for
-from models import VehicleEvent, db
+from flask import Blueprint, abort, current_app, jsonify, render_template, request, url_for
+from models import DimAsset, DimClass, DimDriver, DimEventType, DimOwner, VehicleEvent, db
+import aggregations
+import cache
+import dimensions
+import export
+import filters
+import pagination
+import payloads
+import rollup
+import sections
 from datetime import datetime, timedelta
+from functools import partial
 from sqlalchemy import func, or_
 
 vehicle_bp = Blueprint('vehicle', __name__)
@@ -16,371 +26,484 @@ BATTERY_DISCONNECT_ALERTS = [
     "1E - Battery Disconnect"
 ]
 
-def apply_filters(query, start_date, end_date, owner, asset_name, event_type):
-    """Reusable filter function for table and chart queries."""
-    if start_date:
-        query = query.filter(VehicleEvent.EventDate >= datetime.strptime(start_date, "%Y-%m-%d"))
-    if end_date:
-        query = query.filter(VehicleEvent.EventDate <= datetime.strptime(end_date, "%Y-%m-%d"))
+def apply_filters(query, start_date, end_date, owner, asset_name, event_type, model=VehicleEvent):
+    """Reusable filter function for table and chart queries.
+
+    `model` may be VehicleEventHourly when reading from the rollup cube.
+    """
+    query = filters.filter_dates(query, model.EventDate, start_date, end_date)
     if owner:
-        query = query.filter(VehicleEvent.OwnerName.ilike(f"%{owner}%"))
+        query = query.filter(filters.owner_clause(model.owner_id, owner, exact=is_known_owner(owner)))
     if asset_name:
-        query = query.filter(VehicleEvent.AssetName == asset_name)
+        query = query.filter(model.asset_id == DimAsset.key_of(asset_name))
     if event_type:
-        query = query.filter(VehicleEvent.EventTypes == event_type)
+        query = query.filter(model.event_type_id == DimEventType.key_of(event_type))
     return query
 
-@vehicle_bp.route('/dashboard')
-def vehicle_dashboard():
-    # --- Filters ---
-    start_date = request.args.get(
-        'start_date', (datetime.utcnow() - timedelta(days=2)).strftime("%Y-%m-%d")
-    )
-    end_date = request.args.get('end_date', datetime.utcnow().strftime("%Y-%m-%d"))
-    owner = request.args.get('owner')
-    asset_name = request.args.get('asset_name')
-    event_type = request.args.get('event_type')
-
-    # --- Base table query ---
-    table_query = VehicleEvent.query
-    table_query = apply_filters(table_query, start_date, end_date, owner, asset_name, event_type)
-    events = table_query.order_by(VehicleEvent.EventDate.desc()).limit(500).all()
 
+def is_known_owner(owner):
+    """True when owner is an exact owner name rather than a search fragment."""
+    return bool(owner) and dimensions.get_dimensions(VehicleEvent).has_owner(owner)
 
-    # --- Dropdowns ---
-    # --- Dropdowns ---
-    owners = [row[0] for row in db.session.query(VehicleEvent.OwnerName)
-            .distinct().order_by(VehicleEvent.OwnerName).all()]
+# ================= Panel Builders =================
+# Each builder takes the SliceRow tuples from aggregations.fetch_slice().
+# The slice is filtered by date, owner and event type only; the asset
+# filter is applied here because some drilldowns deliberately ignore it.
 
-    # Filter assets based on selected owner
-    if owner:
-        assets = [row[0] for row in db.session.query(VehicleEvent.AssetName)
-                .filter(VehicleEvent.OwnerName.ilike(f"%{owner}%"))
-                .distinct().order_by(VehicleEvent.AssetName).all()]
-    else:
-        assets = [row[0] for row in db.session.query(VehicleEvent.AssetName)
-                .distinct().order_by(VehicleEvent.AssetName).all()]
-
-    event_types = [row[0] for row in db.session.query(VehicleEvent.EventTypes)
-                .distinct().order_by(VehicleEvent.EventTypes).all()]
-
-
-    # ================= Top 10 Drivers Table =================
-    # ================= Top 10 Drivers Table =================
-    top_driver_query = db.session.query(
-        VehicleEvent.LinkedName_1,  # Driver names
-        func.count(VehicleEvent.id).label("total_events")
-    )
+def _is_driver_event(r):
+    return r.driver is not None and r.event_class in ("Driver", "Duty") and r.event_type != "Non Tagging"
 
-    # Apply filters first
-    top_driver_query = apply_filters(top_driver_query, start_date, end_date, owner, asset_name, event_type)
 
-    # Filter only Driver/Duty events, non-null LinkedName_1, and exclude Non Tagging events
-    top_driver_query = top_driver_query.filter(
-        VehicleEvent.LinkedName_1.isnot(None),
-        VehicleEvent.Class.in_(["Driver", "Duty"]),
-        VehicleEvent.EventTypes != "Non Tagging"
+def build_vehicle_table(rows, asset_name):
+    """Top 10 drivers with a per event type breakdown."""
+    totals = aggregations.count_by(
+        rows, lambda r: r.driver,
+        where=lambda r: _is_driver_event(r) and (not asset_name or r.asset == asset_name)
     )
-
-    # Group by LinkedName_1 and get top 10
-    top_drivers = (
-        top_driver_query
-        .group_by(VehicleEvent.LinkedName_1)
-        .order_by(func.count(VehicleEvent.id).desc())
-        .limit(10)
-        .all()
-    )
-
-    vehicle_table = []
-    for driver_name, total in top_drivers:
-        # Breakdown per event type for this driver
-        breakdown_query = db.session.query(
-            VehicleEvent.EventTypes,
-            func.count(VehicleEvent.id)
-        ).filter(VehicleEvent.LinkedName_1 == driver_name)
-
-        breakdown_query = apply_filters(breakdown_query, start_date, end_date, owner, None, event_type)
-        breakdown_query = breakdown_query.filter(
-            VehicleEvent.LinkedName_1.isnot(None),
-            VehicleEvent.Class.in_(["Driver", "Duty"]),
-            VehicleEvent.EventTypes != "Non Tagging"  # Exclude Non Tagging events
-        )
-
-        breakdown = breakdown_query.group_by(VehicleEvent.EventTypes).all()
-
-        vehicle_table.append({
-            "asset": driver_name,  # Show driver names
-            "total": total,
-            "breakdown": [{"type": etype, "count": cnt} for etype, cnt in breakdown]
-        })
-
-
-    # ================= Event Type Totals for Cards =================
-    event_type_totals_query = db.session.query(
-        VehicleEvent.EventTypes,
-        func.count(VehicleEvent.id)
-    )
-    event_type_totals_query = apply_filters(event_type_totals_query, start_date, end_date, owner, asset_name, event_type)
-    event_type_totals = event_type_totals_query.group_by(VehicleEvent.EventTypes).all()
-
-    # Prepare drilldown data: for each Event Type, list of assets contributing to total
-    event_type_drilldown = {}
-    for etype, total in event_type_totals:
-        asset_counts_query = db.session.query(
-            VehicleEvent.AssetName,
-            func.count(VehicleEvent.id)
-        ).filter(VehicleEvent.EventTypes == etype)
-        asset_counts_query = apply_filters(asset_counts_query, start_date, end_date, owner, asset_name, event_type)
-        asset_counts = asset_counts_query.group_by(VehicleEvent.AssetName).order_by(func.count(VehicleEvent.id).desc()).all()
-        
-        # Only include assets with non-zero counts
-        event_type_drilldown[etype] = [
-            {"asset": asset, "count": cnt,
-            "url": url_for('vehicle.vehicle_events', asset_name=asset, event_type=etype)}
-            for asset, cnt in asset_counts if cnt > 0
-        ]
-
-
-    # ================= Existing Charts Logic =================
-    # Weekly Asset Drilldown
-    chart_query = db.session.query(VehicleEvent.AssetName, VehicleEvent.OwnerName, func.count(VehicleEvent.id))
-    chart_query = apply_filters(chart_query, start_date, end_date, owner, asset_name, event_type)
-    top_assets = chart_query.group_by(VehicleEvent.AssetName, VehicleEvent.OwnerName).order_by(func.count(VehicleEvent.id).desc()).limit(10).all()
-
-    chart_data_weekly, drilldown_series_weekly = [], []
-    for asset, owner_name, count in top_assets:
-        weekly_query = db.session.query(
-            func.to_char(VehicleEvent.EventDate, 'IYYY-IW').label('week'),
-            func.count(VehicleEvent.id)
-        ).filter(VehicleEvent.AssetName == asset, VehicleEvent.OwnerName == owner_name)
-        weekly_query = apply_filters(weekly_query, start_date, end_date, owner, None, event_type)
-        weekly_data = weekly_query.group_by('week').order_by('week').all()
-
-        chart_data_weekly.append({
-            'name': asset,
-            'y': count,
-            'drilldown': asset,
-            'asset_name': asset,
-            'owner': owner_name
-        })
-
-        week_drilldown = {'id': asset, 'name': f'Weekly events for {asset}', 'data': []}
-        for week_str, week_count in weekly_data:
-            week_drilldown['data'].append({
-                'name': week_str,
-                'y': week_count,
-                'drilldown': f'{asset}_{week_str}',
-                'asset_name': asset,
-                'owner': owner_name
-            })
-
-            event_type_query = db.session.query(VehicleEvent.EventTypes, func.count(VehicleEvent.id))\
-                .filter(VehicleEvent.AssetName == asset, VehicleEvent.OwnerName == owner_name, func.to_char(VehicleEvent.EventDate, 'IYYY-IW') == week_str)
-            event_type_query = apply_filters(event_type_query, start_date, end_date, owner, None, event_type)
-            event_type_counts = event_type_query.group_by(VehicleEvent.EventTypes).all()
-
-            drilldown_series_weekly.extend([{
-                'id': f'{asset}_{week_str}',
-                'name': f'Event Types for {asset} - {week_str}',
-                'data': [ {
-                    'name': etype,
-                    'y': etype_count,
-                    'asset_name': asset,
-                    'owner': owner_name,
-                    'event_type': etype,
-                    'url': url_for('vehicle.vehicle_events', asset_name=asset, week=week_str, event_type=etype)
-                } for etype, etype_count in event_type_counts]
-            }])
-
-        drilldown_series_weekly.append(week_drilldown)
-
-    # Hourly Stacked Column Chart
-    hourly_query = db.session.query(
-        func.extract('hour', VehicleEvent.EventDate).label('EventHour'),
-        VehicleEvent.EventTypes.label('EventType'),
-        VehicleEvent.AssetName,
-        VehicleEvent.OwnerName,
-        func.count(VehicleEvent.id).label('EventCount')
-    )
-    hourly_query = apply_filters(hourly_query, start_date, end_date, owner, asset_name, event_type)
-    hourly_data_raw = [
-        (int(hr), et.strip(), asset, owner_name, cnt)
-        for hr, et, asset, owner_name, cnt in
-        hourly_query.group_by('EventHour', VehicleEvent.EventTypes, VehicleEvent.AssetName, VehicleEvent.OwnerName).order_by('EventHour').all()
-    ]
-
-    hours = sorted({row[0] for row in hourly_data_raw})
-    event_types_set = sorted({row[1] for row in hourly_data_raw})
-
-    hourly_series, hour_drilldown_series = [], []
-    for etype in event_types_set:
-        hourly_series.append({
-            'name': etype,
-            'data': [{'y': sum(cnt for hr, et, asset, owner_name, cnt in hourly_data_raw if hr == hour and et == etype),
-                      'drilldown': f'{hour}_{etype}'} for hour in hours]
-        })
-
-    for hour in hours:
-        for etype in event_types_set:
-            top_assets_query = db.session.query(
-                VehicleEvent.AssetName,
-                VehicleEvent.OwnerName,
-                func.count(VehicleEvent.id).label('EventCount')
-            ).filter(func.extract('hour', VehicleEvent.EventDate) == hour, VehicleEvent.EventTypes == etype)
-            top_assets_query = apply_filters(top_assets_query, start_date, end_date, owner, asset_name, event_type)
-            top_assets = [
-                (asset.strip(), owner_name, cnt)
-                for asset, owner_name, cnt in top_assets_query.group_by(VehicleEvent.AssetName, VehicleEvent.OwnerName).order_by(func.count(VehicleEvent.id).desc()).limit(10).all()
-            ]
-
-            hour_drilldown_series.append({
-                'id': f'{hour}_{etype}',
-                'name': f'Top Assets for Hour {hour} - {etype}',
-                'data': [ {
-                    'name': asset,
-                    'y': count,
-                    'asset_name': asset,
-                    'owner': owner_name,
-                    'event_type': etype
-                } for asset, owner_name, count in top_assets]
-            })
-
-    # Owner -> EventType -> Top Assets Drilldown Pie Chart
-    chart_data_owner, drilldown_series_owner = [], []
-    owner_totals_query = db.session.query(VehicleEvent.OwnerName, func.count(VehicleEvent.id))
-    owner_totals_query = apply_filters(owner_totals_query, start_date, end_date, owner, asset_name, event_type)
-    owner_totals_query = owner_totals_query.group_by(VehicleEvent.OwnerName).all()
-
-    for owner_name, owner_count in owner_totals_query:
-        chart_data_owner.append({
-            'name': owner_name,
-            'y': owner_count,
-            'drilldown': owner_name,
-            'owner': owner_name
-        })
-
-        event_type_query = db.session.query(VehicleEvent.EventTypes, func.count(VehicleEvent.id))\
-            .filter(VehicleEvent.OwnerName == owner_name)
-        event_type_query = apply_filters(event_type_query, start_date, end_date, owner, asset_name, event_type)
-        event_type_counts = event_type_query.group_by(VehicleEvent.EventTypes).all()
-
-        et_data = []
-        for etype, et_count in event_type_counts:
-            top_assets_query = db.session.query(VehicleEvent.AssetName, func.count(VehicleEvent.id))\
-                .filter(VehicleEvent.OwnerName == owner_name, VehicleEvent.EventTypes == etype)
-            top_assets_query = apply_filters(top_assets_query, start_date, end_date, owner, asset_name, event_type)
-            top_assets = top_assets_query.group_by(VehicleEvent.AssetName).order_by(func.count(VehicleEvent.id).desc()).limit(10).all()
-
-            driver_data = [ {
-                'name': asset,
-                'y': count,
-                'asset_name': asset,
-                'owner': owner_name,
-                'event_type': etype,
-                'url': url_for('vehicle.vehicle_events', asset_name=asset, event_type=etype)
-            } for asset, count in top_assets]
-
-            drilldown_series_owner.append({
-                'id': f'{owner_name}_{etype}',
-                'name': f'Top Assets for {etype} in {owner_name}',
-                'data': driver_data
-            })
-
-            et_data.append({
-                'name': etype,
-                'y': et_count,
-                'drilldown': f'{owner_name}_{etype}'
-            })
-
-        drilldown_series_owner.append({
-            'id': owner_name,
-            'name': f'Event Types in {owner_name}',
-            'data': et_data
-        })
-
-    # ================= Battery Disconnects Chart =================
-    # Total battery disconnects
-    battery_total_query = db.session.query(func.count(VehicleEvent.id))
-    battery_total_query = battery_total_query.filter(VehicleEvent.AlertName.in_(BATTERY_DISCONNECT_ALERTS))
-    battery_total_query = apply_filters(battery_total_query, start_date, end_date, owner, asset_name, event_type)
-    total_battery_disconnects = battery_total_query.scalar() or 0
-
-    battery_drilldown_query = db.session.query(
-        VehicleEvent.AssetName,
-        func.count(VehicleEvent.id)
-    ).filter(VehicleEvent.AlertName.in_(BATTERY_DISCONNECT_ALERTS))
-    battery_drilldown_query = apply_filters(battery_drilldown_query, start_date, end_date, owner, asset_name, event_type)
-    battery_drilldown_query = battery_drilldown_query.group_by(VehicleEvent.AssetName).all()
-
-
-
-    battery_chart_data = [{
+    breakdowns = aggregations.nested_count_by(rows, lambda r: r.driver, lambda r: r.event_type, where=_is_driver_event)
+
+    return payloads.table([{
+        "asset": driver_name,  # Show driver names
+        "total": total,
+        "breakdown": payloads.table(
+            [{"type": etype, "count": cnt} for etype, cnt in breakdowns[driver_name].items()],
+            urls={"url": events_url(driver_name, event_type=payloads.field('type'))})
+    } for driver_name, total in aggregations.top(totals, 10)])
+
+
+def build_event_type_totals(rows, f):
+    """Event type totals for the cards; the per-asset lists load on click."""
+    totals = aggregations.count_by(rows, lambda r: r.event_type)
+    return payloads.table([{'type': etype, 'total': total} for etype, total in totals.items() if total > 0],
+                          urls={'drilldown_url': drilldown_url(f, 'event_type', etype=payloads.field('type'))})
+
+
+def build_weekly_chart(rows, f):
+    """Top 10 assets; weeks and event types load through the drilldown endpoint."""
+    filtered = [r for r in rows if not f.subject or r.asset == f.subject]
+    asset_totals = aggregations.count_by(filtered, lambda r: (r.asset, r.owner))
+    return payloads.table([{
+        'name': asset,
+        'y': count,
+        'drilldown': asset,
+        'asset_name': asset,
+        'owner': owner_name,
+    } for (asset, owner_name), count in aggregations.top(asset_totals, 10)], urls={
+        'drilldown_url': drilldown_url(f, 'asset_week', name=payloads.field('asset_name'),
+                                       of_owner=payloads.field('owner'))
+    })
+
+
+def build_hourly_chart(bucket_rows, f):
+    """Hourly stacked columns; the top assets per bucket load on drilldown.
+
+    Takes HourBucketRow tuples from aggregations.fetch_top_per_hour().
+    """
+    hour_totals = {(r.hour, r.event_type): r.bucket_total for r in bucket_rows}
+    hours = sorted({hr for hr, _ in hour_totals})
+    event_types_set = sorted({et for _, et in hour_totals})
+
+    return [{
+        'name': etype,
+        'data': payloads.table([{'y': hour_totals.get((hour, etype), 0),
+                                 'drilldown': f'{hour}_{etype}',
+                                 'hour': hour} for hour in hours],
+                               urls={'drilldown_url': drilldown_url(f, 'hour_etype', hour=payloads.field('hour'),
+                                                                    etype=etype)})
+    } for etype in event_types_set]
+
+
+def build_owner_pie(rows, f):
+    """Owner totals; event types and top assets load on drilldown."""
+    return payloads.table([{
+        'name': owner_name,
+        'y': owner_count,
+        'drilldown': owner_name,
+        'owner': owner_name,
+    } for owner_name, owner_count in aggregations.count_by(rows, lambda r: r.owner).items()],
+        urls={'drilldown_url': drilldown_url(f, 'owner', of_owner=payloads.field('owner'))})
+
+
+def build_battery_chart(rows, f):
+    """Battery disconnect total; the per-asset counts load on drilldown."""
+    return [{
         "name": "Battery Disconnects",
-        "y": total_battery_disconnects,
-        "drilldown": "battery_disconnects"
+        "y": sum(r.count for r in rows if r.battery),
+        "drilldown": "battery_disconnects",
+        "drilldown_url": drilldown_url(f, 'battery')
     }]
 
-    battery_drilldown_series = [{
+# ================= Drilldown Series =================
+# One series per Highcharts drilldown click, built from the cached slice.
+# Keys arrive as query arguments next to the dashboard filters:
+# name/of_owner (asset and its owner), week, hour and etype.
+
+def series_asset_week(f, args):
+    asset, owner_name = args.get('name'), args.get('of_owner')
+    weekly = aggregations.count_by(dashboard_rows(f), lambda r: r.week,
+                                   where=lambda r: r.asset == asset and r.owner == owner_name)
+    return {'id': asset, 'name': f'Weekly events for {asset}', 'data': payloads.table([{
+        'name': week_str,
+        'y': week_count,
+        'drilldown': f'{asset}_{week_str}',
+        'asset_name': asset,
+        'owner': owner_name,
+    } for week_str, week_count in sorted(weekly.items())], urls={
+        'drilldown_url': drilldown_url(f, 'week_etype', name=asset, of_owner=owner_name,
+                                       week=payloads.field('name'))
+    })}
+
+
+def series_week_etype(f, args):
+    asset, owner_name, week_str = args.get('name'), args.get('of_owner'), args.get('week')
+    etypes = aggregations.count_by(
+        dashboard_rows(f), lambda r: r.event_type,
+        where=lambda r: r.asset == asset and r.owner == owner_name and r.week == week_str
+    )
+    return {'id': f'{asset}_{week_str}', 'name': f'Event Types for {asset} - {week_str}', 'data': payloads.table([{
+        'name': etype,
+        'y': etype_count,
+        'asset_name': asset,
+        'owner': owner_name,
+        'event_type': etype,
+    } for etype, etype_count in etypes.items()], urls={
+        'url': events_url(asset, week=week_str, event_type=payloads.field('event_type'))
+    })}
+
+
+def series_hour_etype(f, args):
+    hour, etype = args.get('hour', type=int), args.get('etype')
+    return {'id': f'{hour}_{etype}', 'name': f'Top Assets for Hour {hour} - {etype}', 'data': payloads.table([{
+        'name': r.name,
+        'y': r.count,
+        'asset_name': r.name,
+        'owner': r.owner,
+        'event_type': etype
+    } for r in dashboard_hour_buckets(f) if r.hour == hour and r.event_type == etype])}
+
+
+def series_owner(f, args):
+    owner_name = args.get('of_owner')
+    etypes = aggregations.count_by(_asset_rows(f), lambda r: r.event_type, where=lambda r: r.owner == owner_name)
+    return {'id': owner_name, 'name': f'Event Types in {owner_name}', 'data': payloads.table([{
+        'name': etype,
+        'y': et_count,
+        'drilldown': f'{owner_name}_{etype}',
+    } for etype, et_count in etypes.items()], urls={
+        'drilldown_url': drilldown_url(f, 'owner_etype', of_owner=owner_name, etype=payloads.field('name'))
+    })}
+
+
+def series_owner_etype(f, args):
+    owner_name, etype = args.get('of_owner'), args.get('etype')
+    assets = aggregations.count_by(_asset_rows(f), lambda r: r.asset,
+                                   where=lambda r: r.owner == owner_name and r.event_type == etype)
+    return {'id': f'{owner_name}_{etype}', 'name': f'Top Assets for {etype} in {owner_name}', 'data': payloads.table([{
+        'name': asset,
+        'y': count,
+        'asset_name': asset,
+        'owner': owner_name,
+        'event_type': etype,
+    } for asset, count in aggregations.top(assets, 10)], urls={
+        'url': events_url(payloads.field('asset_name'), event_type=etype)
+    })}
+
+
+def series_battery(f, args):
+    battery_counts = aggregations.count_by(_asset_rows(f), lambda r: r.asset, where=lambda r: r.battery)
+    return {
         "id": "battery_disconnects",
         "name": "Vehicles with Battery Disconnects",
-        "data": [{"name": asset, "y": count, "asset_name": asset} for asset, count in battery_drilldown_query]
-    }]
+        "data": payloads.table([{"name": asset, "y": count, "asset_name": asset}
+                                for asset, count in battery_counts.items()])
+    }
+
+
+def series_event_type(f, args):
+    """Assets for one event type card (rows for the modal table)."""
+    etype = args.get('etype')
+    asset_counts = aggregations.count_by(_asset_rows(f), lambda r: r.asset, where=lambda r: r.event_type == etype)
+    # Only include assets with non-zero counts
+    return {'id': etype, 'name': f'Assets for Event Type: {etype}', 'data': payloads.table(
+        [{"asset": asset, "count": cnt} for asset, cnt in aggregations.top(asset_counts) if cnt > 0],
+        urls={"url": events_url(payloads.field('asset'), event_type=etype)}
+    )}
+
+
+DRILLDOWNS = {
+    'asset_week': series_asset_week,
+    'week_etype': series_week_etype,
+    'hour_etype': series_hour_etype,
+    'owner': series_owner,
+    'owner_etype': series_owner_etype,
+    'battery': series_battery,
+    'event_type': series_event_type,
+}
+
+
+def filter_params(f):
+    """Query-string arguments that reproduce filter set f."""
+    return {k: v for k, v in [('start_date', f.start_date), ('end_date', f.end_date), ('owner', f.owner),
+                              ('asset_name', f.subject), ('event_type', f.event_type)] if v}
+
+
+def drilldown_url(f, series, **keys):
+    return payloads.url_template(url_for('vehicle.drilldown', series=series, **filter_params(f), **keys))
+
+
+def events_url(asset_name, **kwargs):
+    return payloads.url_template(url_for('vehicle.vehicle_events', asset_name=asset_name, **kwargs))
+
+
+# ================= Cached Panel Inputs =================
+# Panels share one slice per filter set (the asset filter is applied by
+# the builders) and the hourly chart has its own ranked query, so the
+# hourly panel never waits on the slice and vice versa.
+
+def dashboard_rows(f):
+    """Slice rows for a filter set, cached and shared by every panel."""
+    def compute():
+        source = rollup.source_for(VehicleEvent)
+        query = aggregations.slice_query(source, BATTERY_DISCONNECT_ALERTS)
+        query = apply_filters(query, f.start_date, f.end_date, f.owner, None, f.event_type, model=source)
+        return aggregations.fetch_slice(query)
+
+    key = cache.make_key('vehicle:slice', f.start_date, f.end_date, f.owner, None, f.event_type)
+    return cache.get_cache().get_or_compute(key, VehicleEvent, compute)
+
+
+def dashboard_hour_buckets(f):
+    """Top 10 assets per (hour, event type), cached per filter set."""
+    def compute():
+        source = rollup.source_for(VehicleEvent)
+        query = aggregations.hour_bucket_query(source, source.asset_id, source.owner_id)
+        query = apply_filters(query, f.start_date, f.end_date, f.owner, f.subject, f.event_type, model=source)
+        return aggregations.fetch_top_per_hour(query, DimAsset, DimOwner)
+
+    return cache.get_cache().get_or_compute(cache.make_key('vehicle:hourly', *f), VehicleEvent, compute)
+
+
+def _asset_rows(f):
+    return [r for r in dashboard_rows(f) if not f.subject or r.asset == f.subject]
+
+# ================= Panels =================
+# One function per dashboard widget, each returning a JSON-ready dict.
+# Served individually by /api/panels/<panel> and together by
+# dashboard_aggregates().
+
+EVENT_COLUMNS = ['id', 'EventDate', 'OwnerName', 'AssetName', 'LinkedName_1', 'EventTypes', 'AlertName',
+                 'LocationAddress', 'Latitude', 'Longitude', 'BatteryVoltage', 'PowerVoltage']
+
+
+def panel_events(f):
+    query = apply_filters(VehicleEvent.query.with_entities(VehicleEvent.rows(EVENT_COLUMNS)),
+                          f.start_date, f.end_date, f.owner, f.subject, f.event_type)
+    events = query.order_by(VehicleEvent.EventDate.desc()).limit(500).all()
+    return {'events': [e.as_dict(EVENT_COLUMNS) for e in events]}
+
+
+def panel_table(f):
+    return {'vehicle_table': build_vehicle_table(dashboard_rows(f), f.subject)}
+
+
+def panel_event_types(f):
+    return {'event_types': build_event_type_totals(_asset_rows(f), f)}
+
+
+def panel_weekly(f):
+    return {'chart_data_weekly': build_weekly_chart(dashboard_rows(f), f)}
+
+
+def panel_hourly(f):
+    return {'hourly_series': build_hourly_chart(dashboard_hour_buckets(f), f)}
+
+
+def panel_owner(f):
+    return {'chart_data_owner': build_owner_pie(_asset_rows(f), f)}
+
+
+def panel_battery(f):
+    return {'battery_chart_data': build_battery_chart(_asset_rows(f), f)}
+
+
+PANELS = {
+    'events': panel_events,
+    'table': panel_table,
+    'event-types': panel_event_types,
+    'weekly': panel_weekly,
+    'hourly': panel_hourly,
+    'owner': panel_owner,
+    'battery': panel_battery,
+}
+
+
+def dashboard_aggregates(f):
+    """Every chart and table on the dashboard for one filter set.
+
+    Panels are independent; with SECTION_EXECUTOR_ENABLED they run
+    concurrently (see sections.py).
+    """
+    results = sections.run_sections({name: partial(panel, f) for name, panel in PANELS.items() if name != 'events'})
+    data = {}
+    for result in results.values():
+        data.update(result)
+    return data
+
+
+def read_filters():
+    """Dashboard filters from the query string, with the default date range."""
+    return aggregations.DashboardFilters(
+        start_date=request.args.get('start_date', (datetime.utcnow() - timedelta(days=2)).strftime("%Y-%m-%d")),
+        end_date=request.args.get('end_date', datetime.utcnow().strftime("%Y-%m-%d")),
+        owner=request.args.get('owner'),
+        subject=request.args.get('asset_name'),
+        event_type=request.args.get('event_type'),
+    )
+
+
+@vehicle_bp.route('/dashboard')
+def vehicle_dashboard():
+    # Only the filter form is rendered here; the browser fetches every
+    # panel from /api/panels/<panel> concurrently.
+    f = read_filters()
+
+    # --- Dropdowns (served from the dimension snapshot) ---
+    dims = dimensions.get_dimensions(VehicleEvent)
+    owners = dims.owners
+    # Filter assets based on selected owner
+    assets = dims.assets_for(f.owner)
+    event_types = dims.event_types
+
+    panel_urls = {name: url_for('vehicle.dashboard_panel', panel=name, **filter_params(f)) for name in PANELS}
 
     return render_template(
         'vehicle.html',
-        events=events,
         owners=owners,
         assets=assets,
         event_types=event_types,
-        selected_owner=owner,
-        selected_asset=asset_name,
-        selected_event_type=event_type,
-        start_date=start_date,
-        end_date=end_date,
-        vehicle_table=vehicle_table,
-        event_type_totals=event_type_totals,
-        event_type_drilldown=event_type_drilldown,  # <-- Add this
-        chart_data_weekly=chart_data_weekly,
-        drilldown_series_weekly=drilldown_series_weekly,
-        hourly_series=hourly_series,
-        hour_drilldown_series=hour_drilldown_series,
-        chart_data_owner=chart_data_owner,
-        drilldown_series_owner=drilldown_series_owner,
-        battery_chart_data=battery_chart_data,
-        battery_drilldown_series=battery_drilldown_series
+        selected_owner=f.owner,
+        selected_asset=f.subject,
+        selected_event_type=f.event_type,
+        start_date=f.start_date,
+        end_date=f.end_date,
+        panel_urls=panel_urls
     )
 
 
-@vehicle_bp.route('/events/<asset_name>')
-def vehicle_events(asset_name):
-    week = request.args.get('week', None)
-    event_type = request.args.get('event_type', None)
-
-    # If asset_name is actually a driver, filter by LinkedName_1 instead of AssetName
+@vehicle_bp.route('/api/panels/<panel>')
+def dashboard_panel(panel):
+    if panel not in PANELS:
+        abort(404)
+    return payloads.respond(sections.run_sections({panel: partial(PANELS[panel], read_filters())})[panel])
+
+
+@vehicle_bp.route('/api/drilldown/<series>')
+def drilldown(series):
+    """One drilldown series, fetched when a chart point is clicked."""
+    if series not in DRILLDOWNS:
+        abort(404)
+    f = read_filters()
+    max_age = current_app.config.get('DRILLDOWN_CACHE_SECONDS', 60)
+    keys = sorted((k, request.args.get(k)) for k in ('name', 'of_owner', 'week', 'hour', 'etype'))
+    key = cache.make_key(f'vehicle:drilldown:{series}:{keys}', *f)
+    data = cache.get_cache().get_or_compute(key, VehicleEvent, lambda: DRILLDOWNS[series](f, request.args),
+                                            max_age=max_age)
+    response = payloads.respond(data)
+    response.cache_control.private = True
+    response.cache_control.max_age = max_age
+    return response
+
+
+@vehicle_bp.route('/export.<fmt>')
+def export_events(fmt):
+    """Stream every event matching the dashboard filters as csv or parquet."""
+    if fmt not in export.FORMATS:
+        abort(404)
+    if fmt == 'parquet' and not export.parquet_available():
+        abort(501, description='Parquet export needs pyarrow installed')
+    f = read_filters()
+    query = apply_filters(VehicleEvent.query, f.start_date, f.end_date, f.owner, f.subject, f.event_type)
+    return export.export_response(query, VehicleEvent, fmt, 'vehicle_events')
+
+
+@vehicle_bp.route('/api/dashboard-data')
+def dashboard_data_api():
+    return payloads.respond(dashboard_aggregates(read_filters()))
+
+
+def asset_events_query(asset_name, week=None, event_type=None):
+    """Events behind the vehicle_events page for an asset (or driver) name."""
+    # If asset_name is actually a driver, filter by the driver instead of the asset
+    asset_key = DimAsset.key_of(asset_name)
     query = VehicleEvent.query.filter(
-        (VehicleEvent.AssetName == asset_name) | (VehicleEvent.LinkedName_1 == asset_name)
+        (VehicleEvent.asset_id == asset_key) | (VehicleEvent.driver_id == DimDriver.key_of(asset_name))
     )
 
     # Only include driver/duty events if asset_name is a driver
     query = query.filter(
-        (VehicleEvent.Class.in_(["Driver", "Duty"])) | (VehicleEvent.AssetName == asset_name)
+        (VehicleEvent.class_id.in_(DimClass.keys_of(["Driver", "Duty"]))) | (VehicleEvent.asset_id == asset_key)
     )
 
     if week:
-        query = query.filter(func.to_char(VehicleEvent.EventDate, 'IYYY-IW') == week)
+        try:
+            week_start, week_end = filters.week_range(week)
+        except ValueError:
+            abort(400, description='Invalid week')
+        query = filters.filter_range(query, VehicleEvent.EventDate, week_start, week_end)
     if event_type:
-        query = query.filter(VehicleEvent.EventTypes == event_type)
+        query = query.filter(VehicleEvent.event_type_id == DimEventType.key_of(event_type))
+    return query
+
+
+EVENT_PAGE_COLUMNS = ['id', 'EventTypes', 'EventDate', 'LocationAddress', 'BatteryVoltage', 'PowerVoltage',
+                      'Latitude', 'Longitude']
+
+
+def asset_events_page_query(asset_name, week=None, event_type=None):
+    """asset_events_query() projected to the columns the page shows."""
+    return asset_events_query(asset_name, week, event_type).with_entities(VehicleEvent.rows(EVENT_PAGE_COLUMNS))
+
+
+def _next_page_url(asset_name, week, event_type, page):
+    if not page.next_cursor:
+        return None
+    return url_for('vehicle.vehicle_events_api', asset_name=asset_name, week=week, event_type=event_type,
+                   page_size=page.page_size, cursor=page.next_cursor)
 
-    events = query.order_by(VehicleEvent.EventDate.desc()).all()
+
+@vehicle_bp.route('/events/<asset_name>')
+def vehicle_events(asset_name):
+    week = request.args.get('week', None)
+    event_type = request.args.get('event_type', None)
+
+    # First page only; further pages come from vehicle_events_api as the table scrolls.
+    page = pagination.page_from_request(asset_events_page_query(asset_name, week, event_type), VehicleEvent)
 
     return render_template(
         'vehicle_events.html',
         asset_name=asset_name,
-        events=events,
-        event_type=event_type
+        events=page.rows,
+        event_type=event_type,
+        total=page.total,
+        total_is_estimate=page.total_is_estimate,
+        next_url=_next_page_url(asset_name, week, event_type, page)
     )
 
 
+@vehicle_bp.route('/api/events/<asset_name>')
+def vehicle_events_api(asset_name):
+    """JSON page of vehicle_events for infinite scroll."""
+    week = request.args.get('week', None)
+    event_type = request.args.get('event_type', None)
+    page = pagination.page_from_request(asset_events_page_query(asset_name, week, event_type), VehicleEvent)
+    return jsonify({
+        'events': [e.as_dict(EVENT_PAGE_COLUMNS) for e in page.rows],
+        'next_cursor': page.next_cursor,
+        'next_url': _next_page_url(asset_name, week, event_type, page),
+        'total': page.total,
+        'total_is_estimate': page.total_is_estimate,
+    })
+
 
 from flask import Blueprint, render_template, request
 from models import VehicleEvent, DriverEvent, db
@@ -392,47 +515,48 @@ trip_bp = Blueprint('trip', __name__)
 @trip_bp.route('/trip_events')
 def trip_events():
     """
-    Show vehicle and driver events linked to trips based on AssetName and EventDate.
+    Show vehicle events linked to trips based on AssetName and EventDate.
+
+    Reads the precomputed trip_event_link table (migrations/0005, kept
+    current by trip_links.py) in EventDate order, so the latest 500 links
+    come straight off an index.
     """
     # Filter params (optional)
     asset_name = request.args.get('asset_name')
     owner = request.args.get('owner')
 
-    base_query = text("""
-        SELECT 
+    where_clauses = []
+    params = {}
+    if asset_name:
+        where_clauses.append('l.asset = :asset_name')
+        params['asset_name'] = asset_name
+    if owner:
+        where_clauses.append('v.owner_id IN (SELECT id FROM dim_owner WHERE name ILIKE :owner)')
+        params['owner'] = f"%{owner}%"
+    where = f"WHERE {' AND '.join(where_clauses)}" if where_clauses else ""
+
+    # EventDate in the join lets the planner prune the event partitions.
+    query = text(f"""
+        SELECT
             v.id AS vehicle_event_id,
             v."OwnerName",
             v."AssetName",
             v."EventDate",
-            v."EventTypes",
+            v."Event Types" AS "EventTypes",
             t.id AS trip_id,
             t.start,
             t."end",
             t.distance,
             t.start_coords,
             t.end_coords
-        FROM vehicles v
-        JOIN trips_data t
-            ON v."AssetName" = t.asset
-           AND v."EventDate" BETWEEN t.start::timestamp AND t."end"::timestamp
-        {where_clause}
-        ORDER BY v."EventDate" DESC
+        FROM trip_event_link l
+        JOIN vehicles v ON v.id = l.event_id AND v."EventDate" = l."EventDate"
+        JOIN trips_data t ON t.id = l.trip_id
+        {where}
+        ORDER BY l."EventDate" DESC, l.event_id DESC
         LIMIT 500
     """)
 
-    where_clauses = []
-    params = {}
-    if asset_name:
-        where_clauses.append('AND v."AssetName" = :asset_name')
-        params['asset_name'] = asset_name
-    if owner:
-        where_clauses.append('AND v."OwnerName" ILIKE :owner')
-        params['owner'] = f"%{owner}%"
-
-    final_query = base_query.bindparams(**params).columns().text.replace(
-        "{where_clause}", "WHERE 1=1 " + " ".join(where_clauses)
-    )
-
-    results = db.session.execute(text(final_query), params).fetchall()
+    results = db.session.execute(query, params).fetchall()
 
     return render_template("trip_events.html", events=results)
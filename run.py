@@ -1,7 +1,10 @@
+from datetime import date, timedelta
+
 import streamlit as st
-import pandas as pd
 from sqlalchemy import create_engine
 
+import rating_summary
+
 # ---- Database connection ----
 DB_USER = "postgres"
 DB_PASSWORD = "Nicolaas24"
@@ -9,26 +12,37 @@ DB_HOST = "localhost"
 DB_PORT = "5432"
 DB_NAME = "Unitrans_Dashboard"
 
-engine = create_engine(f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}")
+# Seconds between summary refreshes; schedule `python rating_summary.py refresh`
+# (cron) to keep it current between page views
+SUMMARY_REFRESH_SECONDS = 300
+
+
+@st.cache_resource
+def get_engine():
+    # One engine (and connection pool) per server process, not per rerun
+    return create_engine(f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}")
+
+
+@st.cache_data(ttl=SUMMARY_REFRESH_SECONDS, show_spinner=False)
+def refresh_summary():
+    # Streamlit reruns this script on every widget change; the cache makes
+    # that at most one refresh per SUMMARY_REFRESH_SECONDS for all sessions
+    return rating_summary.refresh(get_engine())
 
-# ---- Load driver_rating table ----
-query = "SELECT * FROM driver_rating"
-df = pd.read_sql(query, engine)
 
-# ---- Keep only required columns ----
-columns = ['assetName', 'driverName', 'dateStart', 'cost', 'distance', '100kmh', 'excessivei', 
-           'speedingtr', 'brake', 'accel', 'corner', 'gforce']
-df = df[columns]
+engine = get_engine()
 
-# Convert dateStart to date only
-df['date'] = pd.to_datetime(df['dateStart']).dt.date
+# ---- Bring the daily summary up to date (only days with new rows; see rating_summary.py) ----
+refresh_summary()
 
-# ---- Aggregate totals per asset per day ----
-daily_totals = df.groupby(['assetName', 'date']).sum(numeric_only=True).reset_index()
+# ---- Date range ----
+today = date.today()
+picked = st.date_input("Date range", value=(today - timedelta(days=30), today))
+if len(picked) != 2:
+    st.stop()  # second date not chosen yet
 
-# ---- Compute score per asset per day ----
-# score = total distance / total cost (avoid division by zero)
-daily_totals['score'] = daily_totals.apply(lambda x: x['distance'] / x['cost'] if x['cost'] else 0, axis=1)
+# ---- Load the daily totals and score per asset for the range ----
+daily_totals = rating_summary.daily_totals(engine, *picked)
 
 # ---- Reorder columns for display ----
 display_columns = ['assetName', 'date', 'distance', 'cost', '100kmh', 'excessivei', 
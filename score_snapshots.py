@@ -0,0 +1,140 @@
+"""Daily per-driver score snapshots (driver_score_daily).
+
+Each snapshot row is one driver's scored event counts, penalty and score
+for one day, tagged with scoring.CONFIG_VERSION. Trend charts read these
+rows instead of rescoring months of raw events.
+
+    init      create the table
+    refresh   score the days since the latest snapshot of the current
+              config, re-scoring the last SCORE_RECHECK_DAYS complete days
+              for late events (nightly; idempotent)
+    backfill  rescore a date range in a process pool, one day per task,
+              e.g. after EVENT_SCORING changed
+    status    config versions and the days they cover
+
+Usage:
+    python score_snapshots.py init
+    python score_snapshots.py refresh
+    python score_snapshots.py backfill --start 2025-01-01 --end 2025-04-01 [--workers 4]
+    python score_snapshots.py status
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func, insert
+from models import db, DriverEvent, DriverScoreDaily
+import filters
+import rollup
+import scoring
+
+DAY = timedelta(days=1)
+
+
+def init_table():
+    DriverScoreDaily.__table__.create(db.engine, checkfirst=True)
+
+
+def snapshot_day(day):
+    """Replace day's snapshot rows for the current config. Returns drivers scored."""
+    source = rollup.source_for(DriverEvent)
+    start = datetime.combine(day, datetime.min.time())
+    rows = scoring.leaderboard_rows(filters.filter_range(scoring.leaderboard_query(source), source.EventDate,
+                                                         start, start + DAY))
+    db.session.query(DriverScoreDaily).filter_by(config_version=scoring.CONFIG_VERSION, day=day)\
+        .delete(synchronize_session=False)
+    if rows:
+        now = datetime.utcnow()
+        db.session.execute(insert(DriverScoreDaily), [
+            {'config_version': scoring.CONFIG_VERSION, 'day': day, 'driver': r.driver, 'events': r.events,
+             'penalty': r.penalty, 'score': r.score, 'counts': r.counts, 'computed_at': now}
+            for r in rows
+        ])
+    return len(rows)
+
+
+def refresh(recheck_days=1):
+    """Snapshot every complete day not yet covered, plus the last recheck_days."""
+    last = db.session.query(func.max(DriverScoreDaily.day))\
+        .filter(DriverScoreDaily.config_version == scoring.CONFIG_VERSION).scalar()
+    yesterday = date.today() - DAY
+    day = yesterday - (recheck_days - 1) * DAY
+    if last is not None:
+        day = min(day, last + DAY)
+    done = []
+    while day <= yesterday:
+        drivers = snapshot_day(day)
+        db.session.commit()
+        done.append((day, drivers))
+        day += DAY
+    return done
+
+
+def _backfill_day(day):
+    from app import app
+    with app.app_context():
+        drivers = snapshot_day(day)
+        db.session.commit()
+    return day, drivers
+
+
+def backfill(start, end, workers=4):
+    """Rescore every day in [start, end), sharded across a process pool."""
+    days = []
+    day = start
+    while day < end:
+        days.append(day)
+        day += DAY
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for day, drivers in pool.map(_backfill_day, days):
+            print(f"{day:%Y-%m-%d}: {drivers} drivers")
+
+
+def trend(driver, start=None, end=None, version=None):
+    """Snapshot rows of one driver with start <= day < end, oldest first."""
+    query = DriverScoreDaily.query.filter_by(config_version=version or scoring.CONFIG_VERSION, driver=driver)
+    return filters.filter_range(query, DriverScoreDaily.day, start, end).order_by(DriverScoreDaily.day).all()
+
+
+def versions():
+    """[(config_version, first day, last day, rows)]"""
+    return db.session.query(
+        DriverScoreDaily.config_version, func.min(DriverScoreDaily.day), func.max(DriverScoreDaily.day),
+        func.count(DriverScoreDaily.id)
+    ).group_by(DriverScoreDaily.config_version).all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the daily driver score snapshots.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('init')
+    p_refresh = sub.add_parser('refresh')
+    p_refresh.add_argument('--recheck-days', type=int, help='override SCORE_RECHECK_DAYS')
+    p_backfill = sub.add_parser('backfill')
+    p_backfill.add_argument('--start', required=True, help='YYYY-MM-DD')
+    p_backfill.add_argument('--end', required=True, help='YYYY-MM-DD (exclusive)')
+    p_backfill.add_argument('--workers', type=int, default=4)
+    sub.add_parser('status')
+    args = parser.parse_args()
+
+    from app import app
+    with app.app_context():
+        if args.command == 'init':
+            init_table()
+        elif args.command == 'refresh':
+            recheck = args.recheck_days if args.recheck_days is not None else current_app.config['SCORE_RECHECK_DAYS']
+            for day, drivers in refresh(max(recheck, 1)):
+                print(f"{day:%Y-%m-%d}: {drivers} drivers")
+        elif args.command == 'backfill':
+            start = datetime.strptime(args.start, "%Y-%m-%d").date()
+            end = datetime.strptime(args.end, "%Y-%m-%d").date()
+            backfill(start, end, args.workers)
+        elif args.command == 'status':
+            print(f"current config: {scoring.CONFIG_VERSION}")
+            for version, first, last, rows in versions():
+                print(f"{version}  {first} -> {last}  {rows} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Driver scores from EVENT_SCORING, for one driver or the whole fleet.
+
+    score = max(100 - sum over scored types of min(penalty * count, max_penalty), 0)
+
+score_from_counts() scores one driver from {event type: count}.
+leaderboard_query() expresses the same arithmetic as aggregates, so one
+GROUP BY driver_id over the raw events (or the hourly rollup) scores
+every driver in a single statement; leaderboard_page() sorts and pages
+it, with the number of drivers from a window count in the same query.
+
+CONFIG_VERSION identifies the EVENT_SCORING values that enter the score
+(penalty, max_penalty); the daily score snapshots (score_snapshots.py)
+are tagged with it, so editing a cost keeps the existing trend.
+"""
+import hashlib
+import json
+from collections import namedtuple
+from functools import reduce
+from operator import add
+
+from sqlalchemy import case, func
+from models import db, DimClass, DimDriver, DimEventType
+import aggregations
+import cache
+
+# --------------------------------------------------------------------
+# EVENT SCORING CONFIG
+# --------------------------------------------------------------------
+# Only these keys change a score (and CONFIG_VERSION)
+SCORED_KEYS = ('penalty', 'max_penalty')
+EVENT_SCORING = {
+    'Excessive Idling': {'penalty': 10, 'max_penalty': 100, 'cost': 10},
+    'Harsh Acceleration': {'penalty': 1, 'max_penalty': 100, 'cost': 1},
+    'Harsh Braking': {'penalty': 1, 'max_penalty': 100, 'cost': 1},
+    'Harsh Cornering': {'penalty': 1, 'max_penalty': 100, 'cost': 1},
+    'Overspeeding': {'penalty': 1, 'max_penalty': 100, 'cost': 1},
+}
+
+
+def config_version(config=None):
+    """Short hash of a scoring config's SCORED_KEYS; other values (cost) leave it."""
+    scored = {etype: {key: cfg[key] for key in SCORED_KEYS} for etype, cfg in (config or EVENT_SCORING).items()}
+    payload = json.dumps(scored, sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()[:12]
+
+
+CONFIG_VERSION = config_version()
+
+# counts: {event type: count} for the EVENT_SCORING types
+LeaderboardRow = cache.register(namedtuple('LeaderboardRow', ['driver', 'score', 'penalty', 'events', 'counts']))
+LeaderboardPage = cache.register(namedtuple(
+    'LeaderboardPage', ['rows', 'total', 'page', 'page_size', 'sort', 'descending']))
+
+SORTS = ('score', 'driver', 'events', 'penalty')
+
+
+def score_from_counts(type_counts, selected_event_type=None):
+    """Score from {event type: count}, e.g. a GROUP BY instead of loaded rows."""
+    score = 100
+    details = {}
+    for etype, cfg in EVENT_SCORING.items():
+        cnt = type_counts.get(etype, 0)
+        pen = min(cfg['penalty'] * cnt, cfg['max_penalty'])
+        if not selected_event_type or selected_event_type == etype:
+            score -= pen
+        details[etype] = {'count': cnt, 'penalty': pen}
+    return max(score, 0), details
+
+
+def _capped_penalty(count, cfg):
+    penalty = count * cfg['penalty']
+    return case((penalty > cfg['max_penalty'], cfg['max_penalty']), else_=penalty)
+
+
+def leaderboard_query(model):
+    """Per-driver scored counts, penalty and score over model's rows.
+
+    Returns an unordered grouped query; apply filters on model to it as
+    to any other query. Drivers with no scored events score 100.
+    """
+    counts = [func.coalesce(aggregations.event_count(model)
+                            .filter(model.event_type_id == DimEventType.key_of(etype)), 0)
+              for etype in EVENT_SCORING]
+    penalty = reduce(add, [_capped_penalty(c, cfg) for c, cfg in zip(counts, EVENT_SCORING.values())])
+    return (
+        db.session.query(
+            DimDriver.name_of(model.driver_id).label('driver'),
+            case((penalty >= 100, 0), else_=100 - penalty).label('score'),
+            penalty.label('penalty'),
+            reduce(add, counts).label('events'),
+            *[c.label(f'count_{i}') for i, c in enumerate(counts)],
+            func.count().over().label('total'),
+        )
+        .filter(model.class_id == DimClass.key_of('Driver'), model.driver_id.isnot(None))
+        .group_by(model.driver_id)
+    )
+
+
+def leaderboard_rows(query):
+    """LeaderboardRow for every row of a (filtered, maybe paged) leaderboard_query()."""
+    return [
+        LeaderboardRow(row.driver, int(row.score), int(row.penalty), int(row.events),
+                       {etype: int(getattr(row, f'count_{i}')) for i, etype in enumerate(EVENT_SCORING)})
+        for row in query
+    ]
+
+
+def leaderboard_page(query, sort='score', descending=True, page=1, page_size=50):
+    """One LeaderboardPage of a leaderboard_query(), ties broken by driver name."""
+    columns = {c['name']: c['expr'] for c in query.column_descriptions}
+    order = columns[sort].desc() if descending else columns[sort].asc()
+    rows = query.order_by(order, columns['driver']).limit(page_size).offset((page - 1) * page_size).all()
+    if rows:
+        total = rows[0].total
+    else:
+        total = query.order_by(None).count() if page > 1 else 0
+    return LeaderboardPage(leaderboard_rows(rows), int(total), page, page_size, sort, descending)
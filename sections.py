@@ -0,0 +1,71 @@
+"""Run independent dashboard sections concurrently.
+
+Each section is a callable returning a dict. With SECTION_EXECUTOR_ENABLED
+on, sections run on a shared, bounded thread pool, with at most
+SECTION_MAX_PER_REQUEST of one request's sections in flight at a time.
+Each thread gets its own copy of the request context, so it also gets its
+own app context, db.session and pooled connection. Keep
+SECTION_POOL_SIZE within the engine's pool_size + max_overflow.
+
+Per-section wall-clock timings (ms) are logged and left on
+flask.g.section_timings; the SQL each section runs is attributed to it
+by instrumentation.py.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import copy_current_request_context, current_app, g
+
+import instrumentation
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool(size):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=size, thread_name_prefix='dashboard-section')
+        return _pool
+
+
+def _timed(name, fn, timings):
+    start = time.perf_counter()
+    try:
+        with instrumentation.section(name):
+            return fn()
+    finally:
+        timings[name] = (time.perf_counter() - start) * 1000
+
+
+def run_sections(sections):
+    """Run {name: callable} and return {name: result}.
+
+    Sequential in the calling thread unless SECTION_EXECUTOR_ENABLED.
+    The first exception raised by a section propagates.
+    """
+    config = current_app.config
+    timings = {}
+    results = {}
+
+    if not config.get('SECTION_EXECUTOR_ENABLED') or len(sections) < 2:
+        for name, fn in sections.items():
+            results[name] = _timed(name, fn, timings)
+    else:
+        pool = _get_pool(config.get('SECTION_POOL_SIZE', 8))
+        cap = threading.BoundedSemaphore(config.get('SECTION_MAX_PER_REQUEST', 4))
+        futures = {}
+        for name, fn in sections.items():
+            cap.acquire()
+            future = pool.submit(copy_current_request_context(_timed), name, fn, timings)
+            future.add_done_callback(lambda _: cap.release())
+            futures[name] = future
+        for name, future in futures.items():
+            results[name] = future.result()
+
+    g.section_timings = timings
+    current_app.logger.info('dashboard sections (ms): %s',
+                            ', '.join(f'{name}={ms:.1f}' for name, ms in timings.items()))
+    return results
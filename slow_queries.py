@@ -0,0 +1,168 @@
+"""Opt-in slow-query log with captured plans.
+
+With SLOW_QUERY_ENABLED, every statement a driver / vehicle blueprint
+request spends more than SLOW_QUERY_MS on is captured with its bound
+parameters (through the instrumentation.py cursor hooks). A background
+thread EXPLAINs it and keeps the newest SLOW_QUERY_LOG_SIZE entries in
+memory; /admin/slow-queries shows them to signed-in users (flask_login).
+
+The plain EXPLAIN only plans the statement. With SLOW_QUERY_ANALYZE it
+runs EXPLAIN (ANALYZE, BUFFERS) instead, which executes the statement a
+second time: against SLOW_QUERY_EXPLAIN_URL (a replica) when set, or
+else for a SLOW_QUERY_ANALYZE_SAMPLE fraction of the captures, inside a
+rolled-back transaction with a statement timeout.
+
+Each entry is flagged with the full scans of the event tables in its
+plan and the filter expressions that keep an index from being used
+(to_char, extract, date_trunc, ILIKE on a column).
+"""
+import json
+import queue
+import random
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from flask import current_app, request
+from sqlalchemy import create_engine
+
+import instrumentation
+from models import db
+
+BLUEPRINTS = ('driver', 'vehicle')
+EVENT_TABLES = ('vehicles', 'drivers', 'vehicles_fact', 'drivers_fact')
+SUSPECT_FILTERS = [
+    ('to_char', re.compile(r'\bto_char\s*\(', re.I)),
+    ('extract', re.compile(r'\bextract\s*\(', re.I)),
+    ('date_trunc', re.compile(r'\bdate_trunc\s*\(', re.I)),
+    ('ilike', re.compile(r'\bilike\b', re.I)),
+]
+
+_entries = deque(maxlen=100)
+_entries_lock = threading.Lock()
+_queue = queue.Queue(maxsize=100)
+_recent = {}  # statement text: time last queued
+_worker = None
+_replica = None
+
+
+def entries():
+    """Captured slow statements, newest first."""
+    with _entries_lock:
+        return list(reversed(_entries))
+
+
+def _jsonable(parameters):
+    if isinstance(parameters, dict):
+        return {k: _jsonable(v) for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_jsonable(v) for v in parameters]
+    if parameters is None or isinstance(parameters, (str, int, float, bool)):
+        return parameters
+    return str(parameters)
+
+
+# --------------------------------------------------------------------
+# CAPTURE (request thread)
+# --------------------------------------------------------------------
+def _on_statement(seconds, statement, parameters, section):
+    config = current_app.config
+    if seconds * 1000 < config['SLOW_QUERY_MS'] or request.blueprint not in BLUEPRINTS:
+        return
+    if not statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return  # only reads are safe to EXPLAIN ANALYZE
+    # A slow dashboard statement repeats on every request; one plan a minute is enough
+    now = time.monotonic()
+    if now - _recent.get(statement, -1e9) < config['SLOW_QUERY_REPEAT_SECONDS']:
+        return
+    _recent[statement] = now
+    if len(_recent) > 1000:
+        _recent.clear()
+    try:
+        _queue.put_nowait({
+            'captured_at': datetime.utcnow(),
+            'duration_ms': round(seconds * 1000, 1),
+            'endpoint': request.endpoint,
+            'url': request.full_path,
+            'section': section,
+            'statement': statement,
+            'parameters': parameters,
+        })
+    except queue.Full:
+        pass  # the explainer is behind; drop rather than slow the request
+
+
+# --------------------------------------------------------------------
+# EXPLAIN (background thread)
+# --------------------------------------------------------------------
+def _explain_engine(config):
+    global _replica
+    url = config.get('SLOW_QUERY_EXPLAIN_URL')
+    if not url:
+        return db.engine, False
+    if _replica is None:
+        _replica = create_engine(url, pool_size=1, max_overflow=0)
+    return _replica, True
+
+
+def explain(entry, config):
+    """(options, plan text) for one captured statement."""
+    engine, on_replica = _explain_engine(config)
+    if engine.dialect.name != 'postgresql':
+        options = 'QUERY PLAN'
+        with engine.connect() as conn:
+            rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {entry['statement']}", entry['parameters'])
+            return options, '\n'.join(str(row[-1]) for row in rows)
+
+    analyze = config['SLOW_QUERY_ANALYZE'] and (on_replica or random.random() < config['SLOW_QUERY_ANALYZE_SAMPLE'])
+    options = 'ANALYZE, BUFFERS' if analyze else 'COSTS'
+    with engine.connect() as conn:
+        with conn.begin() as transaction:
+            conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(config['SLOW_QUERY_EXPLAIN_TIMEOUT_MS'])}")
+            rows = conn.exec_driver_sql(f"EXPLAIN ({options}) {entry['statement']}", entry['parameters'])
+            plan = '\n'.join(row[0] for row in rows)
+            transaction.rollback()  # ANALYZE executed the statement
+    return options, plan
+
+
+def flags(statement, plan):
+    """Plan and filter smells: full scans of the event tables, unsargable filters."""
+    found = [f'seq scan on {table}' for table in EVENT_TABLES
+             if re.search(rf'\bSeq Scan on {table}\b|\bSCAN {table}\b', plan)]
+    # The first WHERE clause, up to its GROUP BY / ORDER BY / LIMIT
+    where = re.split(r'\bWHERE\b', statement, maxsplit=1, flags=re.I)[1:]
+    where = re.split(r'\b(?:GROUP BY|ORDER BY|HAVING|LIMIT)\b', where[0], maxsplit=1, flags=re.I)[0] if where else ''
+    found += [name for name, pattern in SUSPECT_FILTERS if pattern.search(where)]
+    return found
+
+
+def _run(app):
+    while True:
+        entry = _queue.get()
+        with app.app_context():
+            config = app.config
+            try:
+                entry['explain'], entry['plan'] = explain(entry, config)
+            except Exception as exc:  # the statement may no longer plan, e.g. a temp table
+                entry['explain'], entry['plan'] = 'failed', f'{type(exc).__name__}: {exc}'
+            finally:
+                db.session.remove()
+        entry['flags'] = flags(entry['statement'], entry['plan'])
+        entry['parameters'] = json.dumps(_jsonable(entry['parameters']), default=str)
+        with _entries_lock:
+            _entries.append(entry)
+
+
+def init_app(app):
+    """Start capturing slow blueprint statements (if SLOW_QUERY_ENABLED)."""
+    global _entries, _worker
+    if not app.config.get('SLOW_QUERY_ENABLED'):
+        return
+    with _entries_lock:
+        _entries = deque(_entries, maxlen=app.config.get('SLOW_QUERY_LOG_SIZE', 100))
+    instrumentation.on_statement(_on_statement)
+    if _worker is None:
+        _worker = threading.Thread(target=_run, args=(app,), name='slow-query-explain', daemon=True)
+        _worker.start()
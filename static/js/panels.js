@@ -0,0 +1,133 @@
+// Dashboard panel loader: every panel is fetched concurrently from its
+// JSON endpoint and handed to its renderer as soon as it arrives, so the
+// page shell never waits on the slowest aggregate.
+function loadPanels(urls, renderers) {
+    Object.keys(renderers).forEach(function (name) {
+        fetchJson(urls[name])
+            .then(renderers[name])
+            .catch(function (err) { console.error('Panel "' + name + '" failed to load:', err); });
+    });
+}
+
+function escapeHtml(value) {
+    return String(value === null || value === undefined ? 'None' : value)
+        .replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;')
+        .replace(/"/g, '&quot;').replace(/'/g, '&#39;');
+}
+
+// Rows of a "Top 10" table, plus the hidden breakdown rows the modal reads.
+function renderTopTable(tbody, rows) {
+    if (!rows.length) {
+        tbody.innerHTML = '<tr><td colspan="2" class="no-data">No data</td></tr>';
+        return;
+    }
+    tbody.innerHTML = rows.map(function (row) {
+        const key = escapeHtml(row.asset);
+        return '<tr class="parent-row" data-asset="' + key + '">' +
+                   '<td>' + key + '</td>' +
+                   '<td class="clickable" onclick="toggleDrilldown(this.parentNode.dataset.asset)">' + row.total + '</td>' +
+               '</tr>' +
+               '<tr class="drilldown-row" id="drilldown-' + key + '" style="display:none;"><td colspan="2">' +
+                   '<table class="nested-table table table-striped table-sm">' +
+                       '<thead><tr><th>Event Type</th><th>Count</th></tr></thead><tbody>' +
+                       row.breakdown.map(function (b) {
+                           return '<tr class="nested-link" data-url="' + escapeHtml(b.url) + '" onclick="window.location=this.dataset.url">' +
+                                  '<td>' + escapeHtml(b.type) + '</td><td>' + b.count + '</td></tr>';
+                       }).join('') +
+                   '</tbody></table>' +
+               '</td></tr>';
+    }).join('');
+}
+
+// Event type totals. `onOpen(eventType)` is called when a total is clicked;
+// the per-type list is fetched then, from eventType.drilldown_url.
+function renderEventTypes(tbody, eventTypes, onOpen) {
+    tbody.innerHTML = eventTypes.map(function (et, i) {
+        const key = escapeHtml(et.type);
+        return '<tr class="parent-etype" data-etype="' + key + '">' +
+                   '<td>' + key + '</td>' +
+                   '<td class="clickable" data-index="' + i + '">' + et.total + '</td>' +
+               '</tr>';
+    }).join('');
+    tbody.querySelectorAll('td.clickable').forEach(function (cell) {
+        cell.addEventListener('click', function () { onOpen(eventTypes[cell.dataset.index]); });
+    });
+}
+
+// Nested table markup for a drilldown list of {<nameKey>, count, url} rows.
+function nestedTableHtml(rows, nameKey, nameHeader, countHeader) {
+    const body = rows.map(function (row) {
+        return '<tr data-url="' + escapeHtml(row.url) + '" onclick="window.location=this.dataset.url">' +
+               '<td>' + escapeHtml(row[nameKey]) + '</td><td>' + row.count + '</td></tr>';
+    }).join('') || '<tr><td colspan="2" class="no-data">No data</td></tr>';
+    return '<div class="scrollable-nested"><table class="nested-table table table-striped table-sm">' +
+               '<thead><tr><th>' + nameHeader + '</th><th>' + (countHeader || 'Count') + '</th></tr></thead>' +
+               '<tbody>' + body + '</tbody>' +
+           '</table></div>';
+}
+
+function fetchJson(url) {
+    return fetch(url, { headers: { 'Accept': 'application/json' } }).then(function (res) {
+        if (!res.ok) throw new Error('HTTP ' + res.status);
+        return res.json();
+    }).then(unpackTables);
+}
+
+// Columnar tables (payloads.py table()) back into lists of row objects:
+// lookup indexes resolved, constants copied in, URLs filled from templates.
+function fillTemplate(template, row) {
+    // As with url_for, a null value drops its query argument and a null
+    // path segment leaves the row without a URL.
+    function hasNull(part) {
+        return (part.match(/\{\w+\}/g) || []).some(function (slot) {
+            const v = row[slot.slice(1, -1)];
+            return v === null || v === undefined;
+        });
+    }
+    function fill(part, plus) {
+        return part.replace(/\{(\w+)\}/g, function (_, name) {
+            const v = encodeURIComponent(row[name]);
+            return plus ? v.replace(/%20/g, '+') : v;
+        });
+    }
+    const q = template.indexOf('?');
+    const path = q < 0 ? template : template.slice(0, q);
+    if (hasNull(path)) return null;
+    const args = q < 0 ? [] : template.slice(q + 1).split('&').filter(function (arg) { return arg && !hasNull(arg); });
+    return fill(path, false) + (args.length ? '?' + args.map(function (arg) { return fill(arg, true); }).join('&') : '');
+}
+
+function unpackTables(value) {
+    if (Array.isArray(value)) return value.map(unpackTables);
+    if (value === null || typeof value !== 'object') return value;
+    if (!value.__table__) {
+        Object.keys(value).forEach(function (key) { value[key] = unpackTables(value[key]); });
+        return value;
+    }
+    const t = value.__table__;
+    const lookups = t.lookups || {}, constants = unpackTables(t.constants || {}), urls = t.urls || {};
+    const rows = new Array(t.n);
+    for (let i = 0; i < t.n; i++) {
+        const row = Object.assign({}, constants);
+        Object.keys(t.columns).forEach(function (key) {
+            const v = t.columns[key][i];
+            row[key] = lookups[key] ? lookups[key][v] : unpackTables(v);
+        });
+        Object.keys(urls).forEach(function (key) { row[key] = fillTemplate(urls[key], row); });
+        rows[i] = row;
+    }
+    return rows;
+}
+
+// Highcharts `chart.events.drilldown` handler: points carry a
+// drilldown_url and the series is fetched on the first click.
+function lazyDrilldown(e) {
+    const chart = this;
+    const url = e.point.options.drilldown_url;
+    if (e.seriesOptions || !url) return;
+    chart.showLoading('Loading...');
+    fetchJson(url)
+        .then(function (series) { chart.addSeriesAsDrilldown(e.point, series); })
+        .catch(function (err) { console.error('Drilldown failed to load:', err); })
+        .then(function () { chart.hideLoading(); });
+}
@@ -0,0 +1,74 @@
+"""Shared fixtures: the dashboard app on a throwaway database.
+
+TEST_DATABASE_URL selects a scratch PostgreSQL database (needed by the
+PostgreSQL-only tests, which skip without it); by default the session
+runs on a fresh SQLite file. The tables are created for the session and
+dropped at the end, and the result cache is off. On PostgreSQL every
+migration is applied on top, so the tests see the production layout
+(fact tables behind views, monthly partitions); the database is wiped
+afterwards.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmpdir = tempfile.mkdtemp(prefix='unitrans-tests-')
+os.environ['DATABASE_URL'] = os.environ.get('TEST_DATABASE_URL') or f'sqlite:///{_tmpdir}/test.db'
+os.environ['RESULT_CACHE_BACKEND'] = 'none'
+
+
+# Tables loaded by other systems that migrations/0005 and 0006 alter
+EXTERNAL_TABLES = [
+    """CREATE TABLE trips_data (
+        id serial PRIMARY KEY,
+        asset varchar, driver varchar, trip_type varchar,
+        start timestamp, "end" timestamp,
+        distance double precision, max_speed double precision, idle_time double precision,
+        start_coords varchar, end_coords varchar,
+        start_odometer double precision, end_odometer double precision)""",
+    """CREATE TABLE driver_rating (
+        "assetName" varchar, "dateStart" timestamp,
+        distance double precision, cost double precision, "100kmh" double precision,
+        excessivei double precision, speedingtr double precision, brake double precision,
+        accel double precision, corner double precision, gforce double precision)""",
+]
+
+
+def migrate_postgres(db):
+    import migrate
+
+    for ddl in EXTERNAL_TABLES:
+        db.session.execute(text(ddl))
+    db.session.commit()
+    done = migrate.applied_versions()
+    for filename in migrate.migration_files():
+        if filename not in done:
+            migrate.apply(filename)
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import app as flask_app
+    from models import db
+
+    with flask_app.app_context():
+        db.create_all()
+        if is_postgres(db):
+            migrate_postgres(db)
+        yield flask_app
+        db.session.remove()
+        if is_postgres(db):
+            with db.engine.begin() as conn:
+                conn.execute(text('DROP SCHEMA public CASCADE'))
+                conn.execute(text('CREATE SCHEMA public'))
+        else:
+            db.drop_all()
+
+
+def is_postgres(db):
+    return db.engine.dialect.name == 'postgresql'
@@ -0,0 +1,45 @@
+"""Slow-query pages: switched off by default, and never shown to anonymous users."""
+import pytest
+from flask import Flask
+from flask_login import LoginManager, UserMixin
+
+from routes.admin import admin_bp
+
+
+class Admin(UserMixin):
+    id = 'admin'
+
+
+@pytest.fixture
+def make_client():
+    def make_client(enabled=True, login=True, **config):
+        app = Flask(__name__)
+        app.config.update(SLOW_QUERY_ENABLED=enabled, SLOW_QUERY_MS=500, **config)
+        if login:
+            manager = LoginManager(app)
+            manager.request_loader(lambda request: Admin() if request.headers.get('X-User') == 'admin' else None)
+        app.register_blueprint(admin_bp, url_prefix='/admin')
+        return app.test_client()
+    return make_client
+
+
+def test_not_found_while_switched_off(make_client):
+    assert make_client(enabled=False).get('/admin/api/slow-queries', headers={'X-User': 'admin'}).status_code == 404
+
+
+def test_anonymous_users_are_refused(make_client):
+    assert make_client().get('/admin/api/slow-queries').status_code == 401
+
+
+def test_refused_without_a_login_manager(make_client):
+    assert make_client(login=False).get('/admin/api/slow-queries').status_code == 403
+
+
+def test_signed_in_users_see_the_log(make_client):
+    response = make_client().get('/admin/api/slow-queries', headers={'X-User': 'admin'})
+    assert response.status_code == 200
+    assert isinstance(response.get_json(), list)
+
+
+def test_login_disabled(make_client):
+    assert make_client(LOGIN_DISABLED=True).get('/admin/api/slow-queries').status_code == 200
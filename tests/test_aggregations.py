@@ -0,0 +1,17 @@
+"""In-memory ranking of the slice rows."""
+from collections import Counter
+
+import aggregations
+
+
+def test_top_orders_ties_by_key():
+    forward = Counter({'Truck 3': 2, 'Truck 1': 2, 'Truck 2': 5, 'Truck 4': 2})
+    backward = Counter(dict(reversed(list(forward.items()))))
+    expected = [('Truck 2', 5), ('Truck 1', 2), ('Truck 3', 2)]
+    assert aggregations.top(forward, 3) == aggregations.top(backward, 3) == expected
+
+
+def test_top_sorts_missing_names_last():
+    counts = Counter({('Truck 1', None): 1, (None, 'Depot A'): 1, ('Truck 1', 'Depot A'): 1})
+    assert [key for key, _ in aggregations.top(counts)] == [('Truck 1', 'Depot A'), ('Truck 1', None),
+                                                            (None, 'Depot A')]
@@ -0,0 +1,136 @@
+"""The result cache: the sqlite backend's JSON round trips, file mode and old
+pickles, and what makes an entry stale."""
+import os
+import pickle
+import sqlite3
+import stat
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+import cache
+import dimensions
+import scoring
+from aggregations import HourBucketRow, SliceRow
+from models import db, RollupWatermark, VehicleEvent
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return cache.SQLiteBackend(str(tmp_path / 'cache.sqlite'))
+
+
+def stored(backend, value):
+    backend.set('k', cache.Entry(7, 1.5, value))
+    entry = backend.get('k')
+    assert entry.watermark == 7 and entry.created == 1.5
+    return entry.value
+
+
+@pytest.mark.parametrize('value', [
+    [SliceRow('Depot A', 'Truck 1', None, 'Overspeeding', 'Asset', True, '2025-23', 4)],
+    [HourBucketRow(3, 'Harsh Braking', 'Driver 1', None, 2, 9)],
+    scoring.LeaderboardPage([scoring.LeaderboardRow('Driver 1', 80, 20, 4, {'Overspeeding': 4})],
+                            1, 1, 50, 'score', True),
+    {'series': [{'name': 'x', 'y': 3}], 'by_owner': {None: 1, 'Depot A': 2}, 'total': Decimal('1.5')},
+    {'days': (date(2025, 6, 2), datetime(2025, 6, 2, 13, 5)), 'names': {'a', 'b'}},
+])
+def test_round_trip(backend, value):
+    assert stored(backend, value) == value
+
+
+def test_dimension_snapshot_round_trip(app, backend):
+    db.session.add_all([VehicleEvent(OwnerName=owner, AssetName=asset, EventTypes='Overspeeding',
+                                     Class='Asset', EventDate=datetime(2025, 6, 2))
+                        for owner, asset in [('Depot A', 'Truck 1'), ('Depot A', 'Truck 2'), (None, 'Truck 3')]])
+    db.session.commit()
+    try:
+        snapshot = dimensions.load(VehicleEvent)
+        copy = stored(backend, snapshot)
+    finally:
+        db.session.query(VehicleEvent).delete()
+        db.session.commit()
+    assert isinstance(copy, dimensions.DimensionSnapshot)
+    assert (copy.owners, copy.assets, copy.event_types) == (snapshot.owners, snapshot.assets, snapshot.event_types)
+    assert copy.assets_for('depot') == ['Truck 1', 'Truck 2']
+    assert copy.watermark == snapshot.watermark
+
+
+def test_unregistered_type_is_refused(backend):
+    with pytest.raises(TypeError):
+        backend.set('k', cache.Entry(1, 1.0, object()))
+
+
+UNPICKLED = []
+
+
+def unpickled(marker):
+    UNPICKLED.append(marker)
+
+
+class Payload:
+    def __reduce__(self):
+        return (unpickled, ('ran',))
+
+
+def test_pickled_entries_are_misses_not_loaded(backend):
+    with sqlite3.connect(backend.path) as conn:
+        conn.execute('INSERT INTO entries VALUES (?, ?, ?, ?, ?)', ('k', 1, 1.0, 1.0, pickle.dumps(Payload())))
+    assert backend.get('k') is None
+    assert not UNPICKLED
+
+
+def test_file_is_owner_only(backend):
+    assert stat.S_IMODE(os.stat(backend.path).st_mode) == 0o600
+
+
+def test_default_path_is_in_instance_folder(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'instance_path', str(tmp_path / 'instance'))
+    monkeypatch.setitem(app.config, 'RESULT_CACHE_BACKEND', 'sqlite')
+    monkeypatch.setitem(app.config, 'RESULT_CACHE_PATH', None)
+    monkeypatch.delitem(app.extensions, 'result_cache', raising=False)
+    try:
+        assert cache.get_cache().backend.path == str(tmp_path / 'instance' / 'dashboard_cache.sqlite')
+    finally:
+        app.extensions.pop('result_cache', None)
+
+
+@pytest.fixture
+def result_cache(app):
+    # max_stale=0: a stale entry is recomputed in the call, not in the background
+    with app.test_request_context():
+        yield cache.ResultCache(cache.LRUBackend(), max_stale=0, watermark_ttl=0, max_age=600)
+
+
+def counting():
+    calls = []
+    return calls, lambda: calls.append(1) or len(calls)
+
+
+def test_rollup_refresh_invalidates(app, result_cache, monkeypatch):
+    monkeypatch.setitem(app.config, 'ROLLUP_ENABLED', True)
+    db.session.add(RollupWatermark(table_name='vehicles', last_id=10, refreshed_at=datetime(2025, 6, 2, 8)))
+    db.session.commit()
+    try:
+        calls, compute = counting()
+        assert result_cache.get_or_compute('k', VehicleEvent, compute) == 1
+        assert result_cache.get_or_compute('k', VehicleEvent, compute) == 1
+
+        # A refresh that found nothing new: max(id) and last_id stay put
+        db.session.query(RollupWatermark).update({'refreshed_at': datetime(2025, 6, 2, 8, 5)})
+        db.session.commit()
+        assert result_cache.get_or_compute('k', VehicleEvent, compute) == 2
+    finally:
+        db.session.query(RollupWatermark).delete()
+        db.session.commit()
+
+
+def test_entries_expire_after_max_age(result_cache):
+    calls, compute = counting()
+    version = result_cache.version(VehicleEvent)
+    result_cache.backend.set('fresh', cache.Entry(version, time.time() - 60, 'cached'))
+    result_cache.backend.set('old', cache.Entry(version, time.time() - 601, 'cached'))
+    assert result_cache.get_or_compute('fresh', VehicleEvent, compute) == 'cached'
+    assert result_cache.get_or_compute('old', VehicleEvent, compute) == 1
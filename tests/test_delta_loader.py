@@ -0,0 +1,98 @@
+"""DeltaFrame: incremental refreshes match a fresh load of the table."""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, text
+
+pd = pytest.importorskip('pandas')
+from delta_loader import DeltaFrame  # noqa: E402
+
+INSERT = text('INSERT INTO events (id, "ModifiedDate", name, "EventDate") VALUES (:id, :m, :name, :d)')
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path}/events.db')
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE events (id INTEGER PRIMARY KEY, "ModifiedDate" TIMESTAMP, '
+                          'name VARCHAR, "EventDate" TIMESTAMP)'))
+    return engine
+
+
+def add(engine, event_id, name, minute=0):
+    with engine.begin() as conn:
+        conn.execute(INSERT, {'id': event_id, 'name': name, 'm': datetime(2025, 6, 2, 8, minute),
+                              'd': datetime(2025, 6, 2, 8, minute)})
+
+
+def loader(engine, rescan=100):
+    return DeltaFrame(engine, 'events', columns=['name', 'EventDate'], categorical=['name'], dates=['EventDate'],
+                      dropna=['name'], rescan=rescan)
+
+
+def rows(frame):
+    return sorted(zip(frame.index, frame['name'].astype(object)))
+
+
+def test_new_and_edited_rows(engine):
+    add(engine, 1, 'Driver 1')
+    add(engine, 2, 'Driver 2')
+    events = loader(engine)
+    assert events.refresh() == 2
+
+    add(engine, 3, 'Driver 3')
+    with engine.begin() as conn:
+        conn.execute(text('UPDATE events SET name = :n, "ModifiedDate" = :m WHERE id = 1'),
+                     {'n': 'Driver 9', 'm': datetime(2025, 6, 2, 9)})
+    assert events.refresh() == 2
+    assert rows(events.frame) == [(1, 'Driver 9'), (2, 'Driver 2'), (3, 'Driver 3')]
+    assert isinstance(events.frame['name'].dtype, pd.CategoricalDtype)
+
+
+@pytest.mark.parametrize('rescan, expected', [(0, [200]), (100, [150, 200])])
+def test_late_commit_below_last_id(engine, rescan, expected):
+    add(engine, 200, 'Driver 1')
+    events = loader(engine, rescan)
+    events.refresh()
+
+    add(engine, 150, 'Driver 2')  # id handed out before 200's, committed after the refresh
+    events.refresh()
+    assert sorted(events.frame.index) == expected
+
+
+def test_rescanned_rows_already_held_are_not_applied_again(engine):
+    for i in range(1, 6):
+        add(engine, i, f'Driver {i}')
+    events = loader(engine)
+    events.refresh()
+    assert events.refresh() == 0
+    assert list(events.frame.index) == [1, 2, 3, 4, 5]
+
+
+def test_chunks_are_folded_once_when_read(engine):
+    add(engine, 1, 'Driver 1')
+    events = loader(engine)
+    events.refresh()
+    first = events.frame
+
+    add(engine, 2, 'Driver 2')
+    events.refresh()
+    add(engine, 3, None)  # dropped by dropna
+    add(engine, 4, 'Driver 2')
+    events.refresh()
+    assert len(events._pending) == 2
+    assert rows(events.frame) == [(1, 'Driver 1'), (2, 'Driver 2'), (4, 'Driver 2')]
+    assert events.frame is events.frame
+    assert list(events.frame['name'].cat.categories) == ['Driver 1', 'Driver 2']
+    assert len(first) == 1  # earlier reads are not changed in place
+
+
+def test_edit_failing_dropna_removes_the_old_copy(engine):
+    add(engine, 1, 'Driver 1')
+    events = loader(engine)
+    events.refresh()
+    with engine.begin() as conn:
+        conn.execute(text('UPDATE events SET name = NULL, "ModifiedDate" = :m WHERE id = 1'),
+                     {'m': datetime(2025, 6, 2, 9)})
+    events.refresh()
+    assert events.frame.empty
@@ -0,0 +1,122 @@
+"""The filter queries must stay sargable: served by the event indexes.
+
+The dashboard and event-page queries are built through the same route
+helpers the app uses. On PostgreSQL each is EXPLAINed with enable_seqscan
+off, which shows whether an index *can* serve its predicates regardless
+of table size and statistics: a sequential scan, or an index walked
+without an index condition, on any vehicles / drivers table or
+partition fails the test. The WHERE-clause check runs on any database.
+"""
+import json
+import re
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func
+
+import aggregations
+from conftest import is_postgres
+from models import db, DriverEvent, VehicleEvent
+from routes import driver, vehicle
+
+START, END = '2025-06-02', '2025-06-08'
+WEEK = '2025-23'
+EVENT_TABLE = re.compile(r'^(vehicles|drivers)(_fact\w*)?$')
+# Wrapping EventDate in any of these hides it from every index
+UNSARGABLE = re.compile(r'\b(to_char|extract|date_trunc|date_part)\s*\(', re.IGNORECASE)
+
+
+@pytest.fixture(scope='module')
+def request_context(app):
+    # One known owner, so both owner_clause() forms are exercised
+    for model in (VehicleEvent, DriverEvent):
+        db.session.add(model(OwnerName='Depot A', AssetName='Truck 1', LinkedName_1='Driver 1', Class='Driver',
+                             EventTypes='Harsh Braking', EventDate=datetime(2025, 6, 3, 8)))
+    db.session.commit()
+    with app.test_request_context():
+        yield
+    for model in (VehicleEvent, DriverEvent):
+        db.session.query(model).delete()
+    db.session.commit()
+
+
+def keyset(query, model):
+    return query.order_by(model.EventDate.desc().nulls_first(), model.id.desc()).limit(101)
+
+
+CASES = {
+    'vehicle slice, date range': lambda: vehicle.apply_filters(
+        aggregations.slice_query(VehicleEvent), START, END, None, None, None),
+    'vehicle slice, exact owner + event type': lambda: vehicle.apply_filters(
+        aggregations.slice_query(VehicleEvent), START, END, 'Depot A', None, 'Harsh Braking'),
+    'vehicle slice, owner search': lambda: vehicle.apply_filters(
+        aggregations.slice_query(VehicleEvent), START, END, 'depot', None, None),
+    'vehicle hour buckets, asset': lambda: vehicle.apply_filters(
+        aggregations.hour_bucket_query(VehicleEvent, VehicleEvent.asset_id, VehicleEvent.owner_id),
+        START, END, None, 'Truck 1', None),
+    'driver slice, date range + owner': lambda: driver.apply_filters(
+        aggregations.slice_query(DriverEvent), START, END, 'Depot A', None, None),
+    'vehicle events page, asset + week': lambda: keyset(
+        vehicle.asset_events_query('Truck 1', WEEK), VehicleEvent),
+    'driver events page, driver + week': lambda: keyset(
+        driver.driver_events_query('Driver 1', None, WEEK), DriverEvent),
+    'driver events page, asset + week': lambda: keyset(
+        driver.driver_events_query(None, 'Truck 1', WEEK), DriverEvent),
+}
+
+
+def _plan_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from _plan_nodes(child)
+
+
+def explain(query):
+    """Plan nodes of query, with sequential scans disabled."""
+    compiled = query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'render_postcompile': True})
+    conn = db.session.connection()
+    conn.exec_driver_sql('SET LOCAL enable_seqscan = off')
+    plan = conn.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + str(compiled), compiled.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return list(_plan_nodes(plan[0]['Plan']))
+
+
+def full_scans(nodes):
+    """Event table accesses that read every row: Seq Scans, and index
+    scans without an index condition (a whole-index walk)."""
+    return [f"{node['Node Type']} on {node['Relation Name']}" for node in nodes
+            if EVENT_TABLE.match(node.get('Relation Name', ''))
+            and (node['Node Type'] == 'Seq Scan' or ('Index Name' in node and 'Index Cond' not in node))]
+
+
+@pytest.fixture
+def postgres(app):
+    if not is_postgres(db):
+        pytest.skip('needs TEST_DATABASE_URL (PostgreSQL)')
+    yield
+    db.session.rollback()  # ends SET LOCAL
+
+
+@pytest.mark.parametrize('case', CASES)
+def test_where_clause_compares_bare_columns(request_context, case):
+    where = str(CASES[case]().statement.whereclause)
+    assert not UNSARGABLE.search(where), where
+
+
+@pytest.mark.parametrize('case', CASES)
+def test_served_by_an_index(request_context, postgres, case):
+    nodes = explain(CASES[case]())
+    assert any(EVENT_TABLE.match(n.get('Relation Name', '')) for n in nodes), 'no event table in the plan'
+    assert not full_scans(nodes)
+
+
+def test_function_wrapped_filters_are_caught(request_context, postgres):
+    # The predicates filters.py replaced; the check must flag them
+    week = func.to_char(VehicleEvent.EventDate, 'IYYY-IW') == WEEK
+    hour = func.extract('hour', VehicleEvent.EventDate) == 8
+    for predicate in (week, hour):
+        query = keyset(db.session.query(VehicleEvent.id).filter(predicate), VehicleEvent)
+        assert full_scans(explain(query))
+        assert UNSARGABLE.search(str(query.statement.whereclause))
+        db.session.rollback()
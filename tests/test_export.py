@@ -0,0 +1,22 @@
+"""CSV export: the names, not the dimension keys behind them."""
+import csv
+import io
+from datetime import datetime
+
+from models import db, ENCODED, VehicleEvent
+
+
+def test_csv_has_names_and_no_dimension_keys(app):
+    db.session.add(VehicleEvent(AlertId='a1', OwnerName='Depot A', AssetName='Truck 1', EventTypes='Overspeeding',
+                                EventDate=datetime(2025, 6, 2, 8)))
+    db.session.commit()
+    try:
+        response = app.test_client().get('/vehicle/export.csv?start_date=2025-06-01&end_date=2025-06-30')
+        rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    finally:
+        db.session.query(VehicleEvent).delete()
+        db.session.commit()
+    assert response.status_code == 200
+    assert not set(rows[0]) & {key_attr for _, key_attr, _ in ENCODED}
+    assert (rows[0]['OwnerName'], rows[0]['AssetName'], rows[0]['EventTypes']) == ('Depot A', 'Truck 1',
+                                                                                   'Overspeeding')
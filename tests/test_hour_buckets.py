@@ -0,0 +1,113 @@
+"""fetch_top_per_hour() against the per-bucket, name-grouped queries it replaced."""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func
+
+import aggregations
+from aggregations import HourBucketRow
+from models import db, DimAsset, DimClass, DimDriver, DimOwner, DriverEvent, VehicleEvent
+
+OWNERS = ['Depot A', 'Depot B', 'Kathu Ops']
+EVENT_TYPES = ['Overspeeding', 'Harsh Braking', 'Excessive Idling']
+START = datetime(2025, 6, 2)
+
+
+@pytest.fixture(scope='module')
+def events(app):
+    # ~40 events per (hour, event type) spread over 30 assets / 25 drivers:
+    # most counts are 1 or 2, so every top 10 cuts through a tie.
+    rng = random.Random(7)
+    for model in (VehicleEvent, DriverEvent):
+        db.session.add_all([model(
+            OwnerName=rng.choice(OWNERS),
+            AssetName=f'Truck {rng.randint(1, 30)}',
+            LinkedName_1=rng.choice([None] + [f'Driver {i}' for i in range(25)]),
+            EventTypes=rng.choice(EVENT_TYPES),
+            Class=rng.choice(['Driver', 'Duty']),
+            EventDate=START + timedelta(minutes=rng.randint(0, 60 * 24 * 6)),
+        ) for _ in range(3000)])
+    db.session.commit()
+    yield
+    for model in (VehicleEvent, DriverEvent):
+        db.session.query(model).delete()
+    db.session.commit()
+
+
+def per_bucket_tops(query, limit):
+    """The statements fetch_top_per_hour() replaced: the bucket totals, then
+    one ORDER BY ... LIMIT query per (hour, event type) bucket. Ties are
+    ordered explicitly, by name then owner, as fetch_top_per_hour() does."""
+    sub = query.subquery()
+    has_owner = 'owner' in sub.c
+    order = [sub.c.event_count.desc(), sub.c.name] + ([sub.c.owner] if has_owner else [])
+    buckets = (db.session.query(sub.c.hour, sub.c.event_type, func.sum(sub.c.event_count))
+               .group_by(sub.c.hour, sub.c.event_type).order_by(sub.c.hour, sub.c.event_type).all())
+    rows = []
+    for hour, etype, total in buckets:
+        top = (db.session.query(sub).filter(sub.c.hour == hour, sub.c.event_type == etype)
+               .order_by(*order).limit(limit))
+        rows += [HourBucketRow(int(hour), etype, r.name, r.owner if has_owner else None,
+                               int(r.event_count), int(total)) for r in top]
+    return rows
+
+
+def name_bucket_query(model, name_col, owner_col=None):
+    """hour_bucket_query() as it was before the dimension keys: grouped on the names."""
+    hour = func.extract('hour', model.EventDate)
+    dims = [hour.label('hour'), model.EventTypes.label('event_type'), name_col.label('name')]
+    if owner_col is not None:
+        dims.append(owner_col.label('owner'))
+    return db.session.query(*dims, func.count(model.id).label('event_count'))\
+        .group_by(*[d.element for d in dims])
+
+
+def vehicle_queries(owner=None):
+    """(keyed query, its dimensions, name-grouped reference query)"""
+    keyed = aggregations.hour_bucket_query(VehicleEvent, VehicleEvent.asset_id, VehicleEvent.owner_id)
+    by_name = name_bucket_query(VehicleEvent, VehicleEvent.AssetName, VehicleEvent.OwnerName)
+    dates = (VehicleEvent.EventDate >= START + timedelta(days=1), VehicleEvent.EventDate < START + timedelta(days=5))
+    keyed, by_name = keyed.filter(*dates), by_name.filter(*dates)
+    if owner:
+        keyed = keyed.filter(VehicleEvent.owner_id == DimOwner.key_of(owner))
+        by_name = by_name.filter(VehicleEvent.OwnerName == owner)
+    return keyed, (DimAsset, DimOwner), by_name
+
+
+def driver_queries(owner=None):
+    keyed = aggregations.hour_bucket_query(DriverEvent, DriverEvent.driver_id)\
+        .filter(DriverEvent.class_id == DimClass.key_of('Driver'))
+    by_name = name_bucket_query(DriverEvent, DriverEvent.LinkedName_1).filter(DriverEvent.Class == 'Driver')
+    if owner:
+        keyed = keyed.filter(DriverEvent.owner_id == DimOwner.key_of(owner))
+        by_name = by_name.filter(DriverEvent.OwnerName == owner)
+    return keyed, (DimDriver,), by_name
+
+
+@pytest.mark.parametrize('limit', [10, 3])
+@pytest.mark.parametrize('owner', [None, 'Depot B'])
+@pytest.mark.parametrize('build', [vehicle_queries, driver_queries])
+def test_matches_per_bucket_queries(events, build, owner, limit):
+    keyed, dims, by_name = build(owner)
+    expected = per_bucket_tops(by_name, limit)
+    assert expected
+    assert aggregations.fetch_top_per_hour(keyed, *dims, limit=limit) == expected
+
+
+def test_unknown_owner_matches_nothing(events):
+    keyed, dims, _ = vehicle_queries('No Such Depot')
+    assert aggregations.fetch_top_per_hour(keyed, *dims) == []
+
+
+def test_ties_at_the_cut_are_ordered_by_name(events):
+    keyed, dims, _ = vehicle_queries()
+    rows = aggregations.fetch_top_per_hour(keyed, *dims, limit=10)
+    by_bucket = {}
+    for r in rows:
+        by_bucket.setdefault((r.hour, r.event_type), []).append(r)
+    tied = 0
+    for bucket in by_bucket.values():
+        assert [(-r.count, r.name, r.owner) for r in bucket] == sorted((-r.count, r.name, r.owner) for r in bucket)
+        tied += any(a.count == b.count for a, b in zip(bucket, bucket[1:]))
+    assert tied, 'the seeded data should produce tied counts'
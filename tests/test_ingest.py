@@ -0,0 +1,87 @@
+"""ingest.py: the .json size limit, value conversion, and the COPY + merge."""
+import json
+
+import pytest
+
+import ingest
+from conftest import is_postgres
+from models import db, DriverEvent, VehicleEvent
+
+RECORDS = [{'AlertId': 'a1', 'OwnerName': 'Depot A'}, {'AlertId': 'a2', 'OwnerName': 'Depot B'}]
+
+
+@pytest.fixture
+def files(tmp_path):
+    as_json = tmp_path / 'export.json'
+    as_json.write_text(json.dumps({'alerts': RECORDS}))
+    as_jsonl = tmp_path / 'export.jsonl'
+    as_jsonl.write_text(''.join(json.dumps(r) + '\n' for r in RECORDS))
+    return str(as_json), str(as_jsonl)
+
+
+def test_json_within_limit_is_read(files):
+    assert list(ingest.read_records(files[0], json_max_bytes=2**20)) == RECORDS
+
+
+def test_json_over_limit_is_refused(files):
+    with pytest.raises(ValueError, match=r'\.jsonl'):
+        list(ingest.read_records(files[0], json_max_bytes=10))
+
+
+def test_jsonl_is_streamed_whatever_its_size(files):
+    assert list(ingest.read_records(files[1], json_max_bytes=10)) == RECORDS
+
+
+def test_ingest_checks_every_file_before_loading(app, files, monkeypatch):
+    monkeypatch.setitem(app.config, 'INGEST_JSON_MAX_MB', 0)
+    loaded = []
+    monkeypatch.setattr(ingest, 'load_batch', lambda model, rows: loaded.append(rows) or len(rows))
+    with pytest.raises(ValueError):
+        ingest.ingest([files[1], files[0]])
+    assert not loaded
+
+
+@pytest.mark.parametrize('value, name', [(1234, '1234'), (True, 'True'), ('  Truck   9 ', 'Truck 9')])
+def test_names_of_any_json_type_are_read(value, name):
+    assert ingest.to_row({'AlertId': 'a1', 'AssetName': value})['AssetName'] == name
+
+
+LOAD = [
+    {'AlertId': 'x1', 'Class': 'Driver', 'AssetName': 1234, 'LinkedName_1': 'Driver 1',
+     'EventDate': '2025-06-02 08:00:00', 'ModifiedDate': '2025-06-02 08:00:00'},
+    {'AlertId': 'x1', 'Class': 'Driver', 'AssetName': 1234, 'LinkedName_1': 'Driver 2',
+     'EventDate': '2025-06-02 08:00:00', 'ModifiedDate': '2025-06-02 09:30:00'},
+    {'AlertId': 'x2', 'Class': 'Asset', 'AssetName': 'Truck 1', 'EventDate': '2025-06-02 10:00:00'},
+    {'AlertId': 'x3', 'Class': 'Asset', 'AssetName': 'Truck 2', 'EventDate': '2025-06-02 11:00:00'},
+    {'AssetName': 'Truck 3'},
+]
+
+
+@pytest.fixture
+def loaded(app, tmp_path):
+    if not is_postgres(db):
+        pytest.skip('needs TEST_DATABASE_URL (PostgreSQL)')
+    db.session.add(VehicleEvent(AlertId='x3', AssetName='Already loaded'))
+    db.session.commit()
+    path = tmp_path / 'alerts.jsonl'
+    path.write_text(''.join(json.dumps(r) + '\n' for r in LOAD))
+    yield ingest.ingest([str(path)])
+    for model in (DriverEvent, VehicleEvent):
+        db.session.query(model).delete()
+    db.session.commit()
+
+
+def test_merge_counts(loaded):
+    assert (loaded['read'], loaded['rejected']) == (5, 1)
+    assert (loaded['inserted_drivers'], loaded['inserted_vehicles'], loaded['duplicates']) == (1, 1, 2)
+
+
+def test_newest_record_per_alert_id_is_kept(loaded):
+    event = DriverEvent.query.filter_by(AlertId='x1').one()
+    assert (event.LinkedName_1, event.AssetName) == ('Driver 2', '1234')
+
+
+def test_rows_are_routed_by_class_and_known_ids_skipped(loaded):
+    assert [e.AlertId for e in DriverEvent.query] == ['x1']
+    vehicles = dict(db.session.query(VehicleEvent.AlertId, VehicleEvent.AssetName))
+    assert vehicles == {'x2': 'Truck 1', 'x3': 'Already loaded'}
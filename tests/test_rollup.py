@@ -0,0 +1,64 @@
+"""rollup.py refresh: late commits below the watermark, edits and deletes."""
+from datetime import datetime
+
+import pytest
+
+import rollup
+from conftest import is_postgres
+from models import db, RollupWatermark, VehicleEvent, VehicleEventHourly
+
+
+@pytest.fixture
+def cube(app):
+    if not is_postgres(db):
+        pytest.skip('needs TEST_DATABASE_URL (PostgreSQL)')
+    yield
+    for table in ('vehicles', 'vehicles_hourly', 'rollup_watermarks', 'rollup_dirty_buckets'):
+        db.session.execute(db.text(f'DELETE FROM {table}'))
+    db.session.commit()
+
+
+def add_event(event_id, hour):
+    db.session.add(VehicleEvent(id=event_id, AssetName='Truck 1', EventTypes='Overspeeding',
+                                EventDate=datetime(2025, 6, 2, hour, 30)))
+    db.session.commit()
+
+
+def counts():
+    """{hour: events} in the cube."""
+    rows = db.session.query(VehicleEventHourly.EventDate, db.func.sum(VehicleEventHourly.event_count))\
+        .group_by(VehicleEventHourly.EventDate)
+    return {bucket.hour: int(n) for bucket, n in rows}
+
+
+@pytest.mark.parametrize('rescan, expected', [(0, {9: 1}), (100, {8: 1, 9: 1})])
+def test_late_commit_below_the_watermark(cube, rescan, expected):
+    add_event(200, 9)
+    rollup.refresh(VehicleEvent, rescan)
+    assert db.session.get(RollupWatermark, 'vehicles').last_id == 200
+
+    add_event(150, 8)  # id handed out before 200's, committed after the refresh
+    rollup.refresh(VehicleEvent, rescan)
+    assert counts() == expected
+
+
+def test_moved_event_date_rebuilds_both_hours(cube):
+    add_event(200, 9)
+    add_event(201, 9)
+    rollup.refresh(VehicleEvent)
+    assert counts() == {9: 2}
+
+    db.session.get(VehicleEvent, 200).EventDate = datetime(2025, 6, 2, 11, 5)
+    db.session.commit()
+    assert rollup.refresh(VehicleEvent) == 2
+    assert counts() == {9: 1, 11: 1}
+
+
+def test_deleted_event_leaves_its_hour(cube):
+    add_event(200, 9)
+    rollup.refresh(VehicleEvent)
+
+    db.session.delete(db.session.get(VehicleEvent, 200))
+    db.session.commit()
+    rollup.refresh(VehicleEvent)
+    assert counts() == {}
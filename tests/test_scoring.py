@@ -0,0 +1,19 @@
+"""CONFIG_VERSION: only the values that enter the score change it."""
+import copy
+
+import scoring
+
+
+def edited(etype, key, value):
+    config = copy.deepcopy(scoring.EVENT_SCORING)
+    config[etype][key] = value
+    return config
+
+
+def test_cost_edit_keeps_the_version():
+    assert scoring.config_version(edited('Overspeeding', 'cost', 25)) == scoring.CONFIG_VERSION
+
+
+def test_penalty_edits_change_the_version():
+    assert scoring.config_version(edited('Overspeeding', 'penalty', 2)) != scoring.CONFIG_VERSION
+    assert scoring.config_version(edited('Overspeeding', 'max_penalty', 50)) != scoring.CONFIG_VERSION
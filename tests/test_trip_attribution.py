@@ -0,0 +1,77 @@
+"""trip_attribution: the same counts as the per-trip filter loop it replaced."""
+import numpy as np
+import pytest
+
+pd = pytest.importorskip('pandas')
+import trip_attribution  # noqa: E402
+from trip_attribution import attribute_events, count_events  # noqa: E402
+
+
+def loop_counts(trips_df, events_df):
+    """The original testing.py loop: one filter of all events per trip."""
+    trips_df = trips_df.copy()
+    for et in events_df['Event Types'].dropna().unique():
+        trips_df[et] = 0
+    for idx, trip in trips_df.iterrows():
+        driver_events = events_df[
+            (events_df['LinkedName_1'] == trip['driver']) &
+            (events_df['EventDate'] >= trip['start']) &
+            (events_df['EventDate'] <= trip['end'])
+        ]
+        for et, count in driver_events['Event Types'].value_counts().items():
+            trips_df.at[idx, et] = count
+    return trips_df
+
+
+def day(n_trips=300, n_events=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    midnight = np.datetime64('2025-06-01T00:00:00', 'ns')
+    drivers = np.array([f'Driver {i}' for i in range(20)] + [None], dtype=object)
+    start = midnight + rng.integers(0, 20 * 3600, n_trips).astype('timedelta64[s]')
+    trips = pd.DataFrame({
+        'driver': drivers[rng.integers(0, len(drivers), n_trips)],
+        'start': start,
+        'end': start + rng.integers(60, 4 * 3600, n_trips).astype('timedelta64[s]'),
+    })
+    events = pd.DataFrame({
+        'Event Types': np.array(['Overspeeding', 'Harsh braking', 'Idling', None],
+                                dtype=object)[rng.integers(0, 4, n_events)],
+        'EventDate': midnight + rng.integers(0, 24 * 3600, n_events).astype('timedelta64[s]'),
+        'LinkedName_1': drivers[rng.integers(0, len(drivers), n_events)],
+    })
+    events.loc[::97, 'EventDate'] = pd.NaT
+    return trips, events
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_matches_the_per_trip_loop(workers):
+    trips, events = day()
+    # Non-ISO strings: the loop compares them as timestamps
+    trips['start'] = trips['start'].astype(object)
+    trips.loc[::10, 'start'] = trips.loc[::10, 'start'].map(lambda t: t.strftime('%Y/%m/%d %H:%M:%S'))
+    types = sorted(events['Event Types'].dropna().unique())
+    expected = loop_counts(trips, events)[types].to_numpy()
+    assert (attribute_events(trips, events, workers=workers)[types].to_numpy() == expected).all()
+
+
+def test_unparseable_times_count_nothing():
+    counts, types = count_events(['Driver 1', 'Driver 1'], ['2025/06/01 08:00:00', 'not a time'],
+                                 ['2025-06-01 09:00', '2025-06-01 09:00'],
+                                 ['Driver 1', 'Driver 1'], ['2025-06-01 08:30', 'garbage'], ['Idling', 'Idling'])
+    assert list(types) == ['Idling']
+    assert counts.tolist() == [[1], [0]]
+
+
+def test_drivers_compare_as_strings():
+    counts, _ = count_events([5, '7'], ['2025-06-01 08:00'] * 2, ['2025-06-01 09:00'] * 2,
+                             ['5', 7, 5], ['2025-06-01 08:30'] * 3, ['Idling'] * 3)
+    assert counts.tolist() == [[2], [1]]
+
+
+def test_without_pandas(monkeypatch):
+    monkeypatch.setattr(trip_attribution, 'pd', None)
+    test_drivers_compare_as_strings()
+    # np.datetime64 reads ISO only: the other trips are skipped, not an error
+    counts, _ = count_events(['Driver 1'] * 3, ['2025-06-01 08:00', '2025/06/01 08:00:00', 'not a time'],
+                             ['2025-06-01 09:00'] * 3, ['Driver 1'], ['2025-06-01 08:30'], ['Idling'])
+    assert counts.tolist() == [[1], [0], [0]]
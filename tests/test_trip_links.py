@@ -0,0 +1,42 @@
+"""trip_links.py refresh: events that commit below the watermark still get linked."""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+import trip_links
+from conftest import is_postgres
+from models import db, RollupWatermark, VehicleEvent
+
+
+@pytest.fixture
+def trip(app):
+    if not is_postgres(db):
+        pytest.skip('needs TEST_DATABASE_URL (PostgreSQL)')
+    db.session.execute(text("INSERT INTO trips_data (asset, start, \"end\") "
+                            "VALUES ('Truck 1', '2025-06-02 06:00', '2025-06-02 18:00')"))
+    db.session.commit()
+    yield
+    for table in ('trip_event_link', 'trips_data', 'vehicles', 'rollup_watermarks'):
+        db.session.execute(text(f'DELETE FROM {table}'))
+    db.session.commit()
+
+
+def add_event(event_id):
+    db.session.add(VehicleEvent(id=event_id, AssetName='Truck 1', EventDate=datetime(2025, 6, 2, 9)))
+    db.session.commit()
+
+
+def linked_events():
+    return sorted(db.session.execute(text('SELECT event_id FROM trip_event_link')).scalars())
+
+
+@pytest.mark.parametrize('rescan, expected', [(0, [200]), (100, [150, 200])])
+def test_late_commit_below_the_watermark(trip, rescan, expected):
+    add_event(200)
+    trip_links.refresh(batch=1000, rescan=rescan)
+    assert db.session.get(RollupWatermark, 'trip_event_link:vehicles').last_id == 200
+
+    add_event(150)  # id handed out before 200's, committed after the refresh
+    trip_links.refresh(batch=1000, rescan=rescan)
+    assert linked_events() == expected
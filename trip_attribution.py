@@ -0,0 +1,148 @@
+"""Count each driver's events inside each trip's time window, vectorized.
+
+A trip gets every event of its driver with start <= EventDate <= end,
+counted per event type. Instead of filtering all events once per trip,
+events are sorted once by (driver, time) and each trip's slice is found
+with two binary searches (np.searchsorted); the trips x event types
+count matrix is then built in one np.bincount over the slices.
+
+    counts, types = count_events(trip_drivers, trip_starts, trip_ends,
+                                 event_drivers, event_times, event_types)
+
+takes plain sequences (query rows, lists, arrays) and needs only NumPy;
+attribute_events() does the same for the pandas frames of the Streamlit
+tool. workers > 1 shards drivers across a process pool.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+try:
+    import pandas as pd
+except ImportError:  # NumPy-only callers (the Flask app)
+    pd = None
+
+# Driver values treated as "no driver" (the trip or event is skipped)
+MISSING_DRIVERS = ('', 'nan', 'None', 'NaT')
+
+
+def _factorize(values, strings=False):
+    """(sorted unique strings, codes); -1 for None / NaN.
+
+    Uses pandas' hash table when available, which is several times faster
+    than sorting the strings with np.unique. strings=True compares the
+    values as strings (5 and '5' get one code); only the uniques are
+    converted.
+    """
+    if pd is not None:
+        codes, uniques = pd.factorize(np.asarray(values, dtype=object), sort=not strings)
+        uniques = np.asarray(uniques).astype(str)
+        if strings:
+            uniques, merged = np.unique(uniques, return_inverse=True)
+            codes = np.where(codes >= 0, merged[codes], -1)
+        return uniques, codes
+    uniques, codes = np.unique(np.asarray(values, dtype=object).astype(str), return_inverse=True)
+    return uniques, codes
+
+
+def _times(values):
+    """int64 nanoseconds; NaT, None and unparseable values become the int64 minimum.
+
+    Strings are parsed one by one (format='mixed'), so '2025/06/01 08:00'
+    is read like an ISO timestamp instead of failing the whole batch.
+    """
+    if pd is not None:
+        times = pd.to_datetime(values, errors='coerce', format='mixed')
+        return np.asarray(times, dtype='datetime64[ns]').astype(np.int64)
+    try:
+        return np.asarray(values, dtype='datetime64[ns]').astype(np.int64)
+    except ValueError:
+        return np.array([_time(value) for value in values], dtype='datetime64[ns]').astype(np.int64)
+
+
+def _time(value):
+    try:
+        return np.datetime64(value, 'ns')
+    except ValueError:
+        return np.datetime64('NaT', 'ns')
+
+
+def _count_shard(trip_d, trip_lo, trip_hi, event_d, event_t, event_c, n_types):
+    """Count matrix for one shard; times are ranks, drivers small ints."""
+    span = int(max(trip_hi.max(initial=0), event_t.max(initial=0))) + 1
+    event_key = event_d * span + event_t
+    order = np.argsort(event_key, kind='stable')
+    event_key, event_c = event_key[order], event_c[order]
+
+    lo = np.searchsorted(event_key, trip_d * span + trip_lo, side='left')
+    hi = np.searchsorted(event_key, trip_d * span + trip_hi, side='right')
+    lengths = np.maximum(hi - lo, 0)
+
+    # Expand every trip's [lo, hi) slice into (trip, event type) pairs
+    n_trips = len(trip_d)
+    offsets = np.repeat(lo - (np.cumsum(lengths) - lengths), lengths)
+    positions = np.arange(lengths.sum()) + offsets
+    cells = np.repeat(np.arange(n_trips), lengths) * n_types + event_c[positions]
+    return np.bincount(cells, minlength=n_trips * n_types).reshape(n_trips, n_types)
+
+
+def count_events(trip_drivers, trip_starts, trip_ends, event_drivers, event_times, event_types, workers=1):
+    """(counts, types): counts[i, j] is the number of events of types[j] in trip i.
+
+    Trips with a missing driver, start or end count nothing; so do events
+    with a missing driver, time or type (unparseable times count as
+    missing). Bounds are inclusive. Drivers are compared as strings, so
+    driver 5 matches '5'.
+    """
+    n_all = len(trip_starts)
+    names, driver_codes = _factorize(np.concatenate([np.asarray(trip_drivers, dtype=object),
+                                                     np.asarray(event_drivers, dtype=object)]), strings=True)
+    known = driver_codes >= 0
+    known[known] = ~np.isin(names, MISSING_DRIVERS)[driver_codes[known]]
+    trip_starts, trip_ends, event_times = _times(trip_starts), _times(trip_ends), _times(event_times)
+    nat = np.iinfo(np.int64).min
+
+    trip_ok = known[:n_all] & (trip_starts != nat) & (trip_ends != nat)
+    event_ok = known[n_all:] & (event_times != nat)
+    types, event_c = _factorize(np.asarray(event_types, dtype=object)[event_ok])
+    event_ok[event_ok] = event_c >= 0
+    event_c = event_c[event_c >= 0]
+    counts = np.zeros((n_all, len(types)), dtype=np.int64)
+    if not trip_ok.any() or not event_ok.any():
+        return counts, types
+
+    # Times ranked over trips and events so that the (driver, time) key
+    # fits an int64 whatever the date range.
+    n_trips = int(trip_ok.sum())
+    trip_d, event_d = driver_codes[:n_all][trip_ok], driver_codes[n_all:][event_ok]
+    _, ranks = np.unique(np.concatenate([trip_starts[trip_ok], trip_ends[trip_ok], event_times[event_ok]]),
+                         return_inverse=True)
+    trip_lo, trip_hi, event_t = ranks[:n_trips], ranks[n_trips:2 * n_trips], ranks[2 * n_trips:]
+    rows = np.flatnonzero(trip_ok)
+
+    if workers <= 1:
+        counts[rows] = _count_shard(trip_d, trip_lo, trip_hi, event_d, event_t, event_c, len(types))
+        return counts, types
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        shards = []
+        for shard in range(workers):
+            trips, events = trip_d % workers == shard, event_d % workers == shard
+            if trips.any():
+                future = pool.submit(_count_shard, trip_d[trips], trip_lo[trips], trip_hi[trips],
+                                     event_d[events], event_t[events], event_c[events], len(types))
+                shards.append((rows[trips], future))
+        for shard_rows, future in shards:
+            counts[shard_rows] = future.result()
+    return counts, types
+
+
+def attribute_events(trips_df, events_df, workers=1, trip_driver='driver', trip_start='start', trip_end='end',
+                     event_driver='LinkedName_1', event_type='Event Types', event_time='EventDate'):
+    """trips_df plus one count column per event type in events_df."""
+    counts, types = count_events(
+        trips_df[trip_driver], trips_df[trip_start], trips_df[trip_end],
+        events_df[event_driver], events_df[event_time], events_df[event_type], workers=workers,
+    )
+    columns = pd.DataFrame(counts, index=trips_df.index, columns=types)
+    return pd.concat([trips_df.drop(columns=[t for t in types if t in trips_df]), columns], axis=1)
@@ -0,0 +1,122 @@
+"""Maintain trip_event_link, the vehicle event -> trip lookup (PostgreSQL).
+
+migrations/0005 creates the table empty. `refresh` links the events and
+the trips added since its last run, TRIP_LINK_BATCH ids per transaction,
+so the first run backfills and later runs only touch new rows. Progress
+is kept as id watermarks in rollup_watermarks. Ids are handed out before
+their rows commit, so a row can become visible below a watermark that
+has already passed it; each run therefore re-scans the last
+TRIP_LINK_RESCAN_IDS ids under the watermark too (linking is
+idempotent). `rebuild` recomputes the links of the events in a date
+range, after trips or events were edited.
+
+Usage:
+    python trip_links.py refresh [--batch 50000] [--rescan 10000]
+    python trip_links.py rebuild --start 2025-06-01 --end 2025-07-01
+"""
+import argparse
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import text
+from models import db, RollupWatermark
+
+# (watermark key, table, predicate selecting an id batch of it)
+SOURCES = [
+    ('trip_event_link:vehicles', 'vehicles', 'v.id > :lo AND v.id <= :hi'),
+    ('trip_event_link:trips_data', 'trips_data', 't.id > :lo AND t.id <= :hi'),
+]
+
+# Trips name their asset; events carry its dim_asset key. The lower /
+# upper bounds repeat the @> test so that the trips side can range-scan
+# the events' (asset_id, EventDate) index.
+LINK = """
+    INSERT INTO trip_event_link (event_id, trip_id, "EventDate", asset)
+    SELECT v.id, t.id, v."EventDate", t.asset
+    FROM vehicles v
+    JOIN dim_asset a ON a.id = v.asset_id
+    JOIN trips_data t
+      ON t.asset = a.name
+     AND t.period @> v."EventDate"
+     AND v."EventDate" >= lower(t.period) AND v."EventDate" <= upper(t.period)
+    WHERE {where}
+    ON CONFLICT DO NOTHING
+"""
+
+
+def _watermark(key):
+    wm = db.session.get(RollupWatermark, key)
+    return wm.last_id if wm else 0
+
+
+def _advance_watermark(key, last_id):
+    wm = db.session.get(RollupWatermark, key)
+    if wm is None:
+        wm = RollupWatermark(table_name=key, last_id=0)
+        db.session.add(wm)
+    wm.last_id = max(wm.last_id or 0, last_id)
+    wm.refreshed_at = datetime.utcnow()
+
+
+def refresh(batch, rescan=0):
+    """Link events and trips above the watermarks, and the last `rescan`
+    ids below them. Returns links added, or None if another refresher
+    holds the lock."""
+    RollupWatermark.__table__.create(db.engine, checkfirst=True)
+    linked = 0
+    for key, table, where in SOURCES:
+        max_id = db.session.execute(text(f'SELECT max(id) FROM {table}')).scalar() or 0
+        lo = max(_watermark(key) - rescan, 0)
+        while lo < max_id:
+            got_lock = db.session.execute(
+                text('SELECT pg_try_advisory_xact_lock(hashtext(:t))'), {'t': 'trip_event_link'}
+            ).scalar()
+            if not got_lock:
+                db.session.rollback()
+                return None
+            hi = min(lo + batch, max_id)
+            linked += db.session.execute(text(LINK.format(where=where)), {'lo': lo, 'hi': hi}).rowcount
+            _advance_watermark(key, hi)
+            db.session.commit()
+            lo = hi
+    return linked
+
+
+def rebuild(start, end):
+    """Recompute the links of events with start <= EventDate < end."""
+    params = {'start': start, 'end': end}
+    db.session.execute(text('SELECT pg_advisory_xact_lock(hashtext(:t))'), {'t': 'trip_event_link'})
+    db.session.execute(text('DELETE FROM trip_event_link WHERE "EventDate" >= :start AND "EventDate" < :end'),
+                       params)
+    linked = db.session.execute(text(LINK.format(where='v."EventDate" >= :start AND v."EventDate" < :end')),
+                                params).rowcount
+    db.session.commit()
+    return linked
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the vehicle event -> trip links.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_refresh = sub.add_parser('refresh')
+    p_refresh.add_argument('--batch', type=int, help='ids per transaction (default TRIP_LINK_BATCH)')
+    p_refresh.add_argument('--rescan', type=int, help='ids re-scanned below the watermark '
+                                                     '(default TRIP_LINK_RESCAN_IDS)')
+    p_rebuild = sub.add_parser('rebuild')
+    p_rebuild.add_argument('--start', required=True, help='YYYY-MM-DD')
+    p_rebuild.add_argument('--end', required=True, help='YYYY-MM-DD (exclusive)')
+    args = parser.parse_args()
+
+    from app import app
+    with app.app_context():
+        if args.command == 'refresh':
+            rescan = current_app.config['TRIP_LINK_RESCAN_IDS'] if args.rescan is None else args.rescan
+            linked = refresh(args.batch or current_app.config['TRIP_LINK_BATCH'], rescan)
+            print("another refresh is running" if linked is None else f"{linked} links added")
+        elif args.command == 'rebuild':
+            start = datetime.strptime(args.start, "%Y-%m-%d")
+            end = datetime.strptime(args.end, "%Y-%m-%d")
+            print(f"{rebuild(start, end)} links rebuilt")
+
+
+if __name__ == "__main__":
+    main()